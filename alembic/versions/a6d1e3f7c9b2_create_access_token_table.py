@@ -0,0 +1,43 @@
+"""Create access token table
+
+Revision ID: a6d1e3f7c9b2
+Revises: f2c9d5a8b3e7
+Create Date: 2021-03-15 11:48:53.029176
+
+"""
+import sqlalchemy as sa
+
+from alembic import op  # type: ignore
+from app.models.user import GUID
+
+# revision identifiers, used by Alembic.
+revision = "a6d1e3f7c9b2"
+down_revision = "f2c9d5a8b3e7"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "accesstoken",
+        sa.Column("id", GUID(), nullable=False),
+        sa.Column("token", sa.String(length=64), nullable=False),
+        sa.Column("user_id", GUID(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("last_seen_at", sa.DateTime(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["usertable.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_accesstoken_token"), "accesstoken", ["token"], unique=True
+    )
+    op.create_index(
+        op.f("ix_accesstoken_user_id"), "accesstoken", ["user_id"], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index(op.f("ix_accesstoken_user_id"), table_name="accesstoken")
+    op.drop_index(op.f("ix_accesstoken_token"), table_name="accesstoken")
+    op.drop_table("accesstoken")
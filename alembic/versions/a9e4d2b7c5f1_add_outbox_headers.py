@@ -0,0 +1,24 @@
+"""Add headers to outbox messages
+
+Revision ID: a9e4d2b7c5f1
+Revises: c3f8a1d6e9b4
+Create Date: 2021-04-02 11:08:27.531904
+
+"""
+import sqlalchemy as sa
+
+from alembic import op  # type: ignore
+
+# revision identifiers, used by Alembic.
+revision = "a9e4d2b7c5f1"
+down_revision = "c3f8a1d6e9b4"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("outboxmessage", sa.Column("headers", sa.Text(), nullable=True))
+
+
+def downgrade():
+    op.drop_column("outboxmessage", "headers")
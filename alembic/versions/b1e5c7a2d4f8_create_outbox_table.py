@@ -0,0 +1,33 @@
+"""Create outbox table
+
+Revision ID: b1e5c7a2d4f8
+Revises: 3ca537d08990
+Create Date: 2021-02-07 14:12:31.204518
+
+"""
+import sqlalchemy as sa
+
+from alembic import op  # type: ignore
+
+# revision identifiers, used by Alembic.
+revision = "b1e5c7a2d4f8"
+down_revision = "3ca537d08990"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "outboxmessage",
+        sa.Column(
+            "id", sa.BigInteger().with_variant(sa.Integer(), "sqlite"), nullable=False
+        ),
+        sa.Column("method", sa.String(length=255), nullable=False),
+        sa.Column("body", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade():
+    op.drop_table("outboxmessage")
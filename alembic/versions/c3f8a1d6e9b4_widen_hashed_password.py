@@ -0,0 +1,36 @@
+"""Widen hashed_password for argon2 hashes
+
+Revision ID: c3f8a1d6e9b4
+Revises: a6d1e3f7c9b2
+Create Date: 2021-03-22 09:17:41.602815
+
+"""
+import sqlalchemy as sa
+
+from alembic import op  # type: ignore
+
+# revision identifiers, used by Alembic.
+revision = "c3f8a1d6e9b4"
+down_revision = "a6d1e3f7c9b2"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.alter_column(
+        "usertable",
+        "hashed_password",
+        existing_type=sa.String(length=72),
+        type_=sa.String(length=255),
+        existing_nullable=False,
+    )
+
+
+def downgrade():
+    op.alter_column(
+        "usertable",
+        "hashed_password",
+        existing_type=sa.String(length=255),
+        type_=sa.String(length=72),
+        existing_nullable=False,
+    )
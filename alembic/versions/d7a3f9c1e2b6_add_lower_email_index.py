@@ -0,0 +1,38 @@
+"""Add lower(email) index
+
+Revision ID: d7a3f9c1e2b6
+Revises: b1e5c7a2d4f8
+Create Date: 2021-02-14 10:41:07.518342
+
+"""
+import sqlalchemy as sa
+
+from alembic import op  # type: ignore
+
+# revision identifiers, used by Alembic.
+revision = "d7a3f9c1e2b6"
+down_revision = "b1e5c7a2d4f8"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Build the index without locking the writes to the table. It can't be
+    # built concurrently in a transaction
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_usertable_email_lower",
+            "usertable",
+            [sa.text("lower(email)")],
+            unique=True,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_usertable_email_lower",
+            table_name="usertable",
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,44 @@
+"""Create refresh token table
+
+Revision ID: e4b8c2f6a1d3
+Revises: d7a3f9c1e2b6
+Create Date: 2021-03-01 10:27:45.618302
+
+"""
+import sqlalchemy as sa
+
+from alembic import op  # type: ignore
+from app.models.user import GUID
+
+# revision identifiers, used by Alembic.
+revision = "e4b8c2f6a1d3"
+down_revision = "d7a3f9c1e2b6"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "refreshtoken",
+        sa.Column("id", sa.String(length=64), nullable=False),
+        sa.Column("family_id", GUID(), nullable=False),
+        sa.Column("user_id", GUID(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.Column("used_at", sa.DateTime(), nullable=True),
+        sa.Column("revoked", sa.Boolean(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["usertable.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_refreshtoken_family_id"), "refreshtoken", ["family_id"], unique=False
+    )
+    op.create_index(
+        op.f("ix_refreshtoken_user_id"), "refreshtoken", ["user_id"], unique=False
+    )
+
+
+def downgrade():
+    op.drop_index(op.f("ix_refreshtoken_user_id"), table_name="refreshtoken")
+    op.drop_index(op.f("ix_refreshtoken_family_id"), table_name="refreshtoken")
+    op.drop_table("refreshtoken")
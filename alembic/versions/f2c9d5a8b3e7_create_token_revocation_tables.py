@@ -0,0 +1,42 @@
+"""Create token revocation tables
+
+Revision ID: f2c9d5a8b3e7
+Revises: e4b8c2f6a1d3
+Create Date: 2021-03-08 16:02:19.371846
+
+"""
+import sqlalchemy as sa
+
+from alembic import op  # type: ignore
+from app.models.user import GUID
+
+# revision identifiers, used by Alembic.
+revision = "f2c9d5a8b3e7"
+down_revision = "e4b8c2f6a1d3"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "revokedtoken",
+        sa.Column("jti", sa.String(length=64), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("jti"),
+    )
+    op.create_index(
+        op.f("ix_revokedtoken_expires_at"), "revokedtoken", ["expires_at"], unique=False
+    )
+    op.create_table(
+        "usertokencutoff",
+        sa.Column("user_id", GUID(), nullable=False),
+        sa.Column("not_before", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["usertable.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+
+
+def downgrade():
+    op.drop_table("usertokencutoff")
+    op.drop_index(op.f("ix_revokedtoken_expires_at"), table_name="revokedtoken")
+    op.drop_table("revokedtoken")
@@ -1,25 +1,103 @@
-from fastapi import APIRouter, Depends, Response
+from typing import Optional
 
+from fastapi import APIRouter, Body, Depends, HTTPException, Response, status
+
+from app.api.routers import get_sessions_router
+from app.api.routers.common import ErrorCode
 from app.api.singleton import FastAPIUsers
+from app.core.auth.cache import DecodedTokenCache
 from app.core.auth.cookie import CookieAuthentication
 from app.core.auth.jwt import JWTAuthentication
-from app.core.tasks import (after_verification_request,
-                            on_after_forgot_password, on_after_register)
+from app.core.auth.keys import KeyRing
+from app.core.ratelimit import (BaseRateLimitStore, LoginRateLimiter,
+                                MemoryRateLimitStore, RedisRateLimitStore,
+                                TokenBucket)
+from app.core.tasks import (after_verification_request, claims_revocations,
+                            database_auth, on_after_delete,
+                            on_after_forgot_password, on_after_register,
+                            on_after_reset_password, on_after_update,
+                            token_revocations)
+from app.models.refresh_token import refresh_tokens
 from app.models.user import user_db
 from app.schemes.user import User, UserCreate, UserDB, UserUpdate
 from config.settings import settings
 
+key_ring = (
+    KeyRing(
+        settings.JWT_KEYS_DIR,
+        algorithm=settings.JWT_KEYS_ALGORITHM,
+        activation_delay_seconds=settings.JWT_KEYS_ACTIVATION_DELAY_SECONDS,
+        overlap_seconds=settings.JWT_KEYS_OVERLAP_SECONDS,
+        reload_interval_seconds=settings.JWT_KEYS_RELOAD_INTERVAL_SECONDS,
+    )
+    if settings.JWT_KEYS_DIR
+    else None
+)
 jwt_auth = JWTAuthentication(
-    secret=settings.SECRET_KEY, lifetime_seconds=3600, tokenUrl="/api/auth/jwt/login"
+    secret=settings.SECRET_KEY,
+    lifetime_seconds=settings.AUTH_TOKEN_LIFETIME_SECONDS,
+    tokenUrl="/api/auth/jwt/login",
+    claims=settings.AUTH_CLAIMS_ENABLED,
+    claims_max_age_seconds=settings.AUTH_CLAIMS_MAX_AGE_SECONDS,
+    claims_revocations=claims_revocations,
+    token_cache=(
+        DecodedTokenCache(settings.AUTH_TOKEN_CACHE_SIZE)
+        if settings.AUTH_TOKEN_CACHE_SIZE
+        else None
+    ),
+    key_ring=key_ring,
+    refresh_tokens=refresh_tokens if settings.REFRESH_TOKENS_ENABLED else None,
+    refresh_lifetime_seconds=settings.REFRESH_TOKEN_LIFETIME_SECONDS,
+)
+cookie_auth = CookieAuthentication(
+    secret=settings.SECRET_KEY,
+    lifetime_seconds=settings.AUTH_TOKEN_LIFETIME_SECONDS,
+    claims=settings.AUTH_CLAIMS_ENABLED,
+    claims_max_age_seconds=settings.AUTH_CLAIMS_MAX_AGE_SECONDS,
+    claims_revocations=claims_revocations,
+    token_cache=(
+        DecodedTokenCache(settings.AUTH_TOKEN_CACHE_SIZE)
+        if settings.AUTH_TOKEN_CACHE_SIZE
+        else None
+    ),
+    key_ring=key_ring,
 )
-cookie_auth = CookieAuthentication(secret=settings.SECRET_KEY, lifetime_seconds=3600)
+login_rate_limiter = None
+if settings.LOGIN_RATE_LIMIT_ENABLED:
+    rate_limit_store: BaseRateLimitStore
+    if settings.LOGIN_RATE_LIMIT_REDIS_URL:
+        from redis import asyncio as aioredis
+
+        rate_limit_store = RedisRateLimitStore(
+            aioredis.from_url(settings.LOGIN_RATE_LIMIT_REDIS_URL)
+        )
+    else:
+        rate_limit_store = MemoryRateLimitStore()
+    login_rate_limiter = LoginRateLimiter(
+        rate_limit_store,
+        window_seconds=settings.LOGIN_RATE_LIMIT_WINDOW_SECONDS,
+        ip_limit=settings.LOGIN_RATE_LIMIT_PER_IP,
+        email_limit=settings.LOGIN_RATE_LIMIT_PER_EMAIL,
+        bucket=TokenBucket(
+            settings.LOGIN_RATE_LIMIT_GLOBAL_RATE,
+            settings.LOGIN_RATE_LIMIT_GLOBAL_BURST,
+        ),
+        trusted_proxies=settings.LOGIN_RATE_LIMIT_TRUSTED_PROXIES or 0,
+        forwarded_header=settings.LOGIN_RATE_LIMIT_FORWARDED_HEADER,
+    )
+auth_backends = [cookie_auth, jwt_auth]
+if settings.DATABASE_AUTH_ENABLED:
+    auth_backends.append(database_auth)
 fastapi_users = FastAPIUsers(
     user_db,
-    [cookie_auth, jwt_auth],
+    auth_backends,
     User,
     UserCreate,
     UserUpdate,
     UserDB,
+    revocations=token_revocations if settings.TOKEN_REVOCATION_ENABLED else None,
+    auth_strategy=settings.AUTH_STRATEGY,
+    login_rate_limiter=login_rate_limiter,
 )
 
 router = APIRouter()
@@ -27,8 +105,22 @@ router = APIRouter()
 
 @router.post("/jwt/refresh", tags=["auth"])
 async def refresh_jwt(
-    response: Response, user=Depends(fastapi_users.get_current_active_user)
+    response: Response,
+    refresh_token: Optional[str] = Body(None, embed=True),
+    user=Depends(fastapi_users.get_optional_current_active_user),
 ):
+    if refresh_token is not None:
+        login_response = await jwt_auth.get_refresh_response(refresh_token, user_db)
+        if login_response is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=ErrorCode.REFRESH_BAD_TOKEN,
+            )
+        return login_response
+
+    # Without refresh tokens, a valid access token is exchanged for a new one
+    if settings.REFRESH_TOKENS_ENABLED or user is None:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
     return await jwt_auth.get_login_response(user, response)
 
 
@@ -38,6 +130,15 @@ router.include_router(
 router.include_router(
     fastapi_users.get_auth_router(cookie_auth), prefix="/cookie", tags=["auth"]
 )
+if settings.DATABASE_AUTH_ENABLED:
+    router.include_router(
+        fastapi_users.get_auth_router(database_auth), prefix="/database", tags=["auth"]
+    )
+    router.include_router(
+        get_sessions_router(database_auth, fastapi_users.authenticator),
+        prefix="/sessions",
+        tags=["auth"],
+    )
 router.include_router(
     fastapi_users.get_register_router(on_after_register), tags=["auth"]  # type: ignore
 )
@@ -45,6 +146,7 @@ router.include_router(
     fastapi_users.get_reset_password_router(
         settings.SECRET_KEY,
         after_forgot_password=on_after_forgot_password,  # type: ignore
+        after_reset_password=on_after_reset_password,  # type: ignore
     ),
     tags=["auth"],
 )
@@ -55,4 +157,11 @@ router.include_router(
     ),
     tags=["auth"],
 )
-router.include_router(fastapi_users.get_users_router(), prefix="/users", tags=["users"])
+router.include_router(
+    fastapi_users.get_users_router(
+        after_update=on_after_update,  # type: ignore
+        after_delete=on_after_delete,  # type: ignore
+    ),
+    prefix="/users",
+    tags=["users"],
+)
@@ -1,8 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, Response, status
+from typing import Optional
+
+from fastapi import (APIRouter, Depends, HTTPException, Request, Response,
+                     status)
 from fastapi.security import OAuth2PasswordRequestForm
 
 from app.api.routers.common import ErrorCode
 from app.core.auth import Authenticator, BaseAuthentication
+from app.core.auth.revocation import TokenRevocationList
+from app.core.ratelimit import LoginRateLimiter
 from app.crud.base import BaseUserDatabase
 from app.schemes import user as models
 
@@ -12,8 +17,17 @@ def get_auth_router(
     user_db: BaseUserDatabase[models.BaseUserDB],
     authenticator: Authenticator,
     requires_verification: bool = False,
+    revocations: Optional[TokenRevocationList] = None,
+    rate_limiter: Optional[LoginRateLimiter] = None,
 ) -> APIRouter:
-    """Generate a router with login/logout routes for an authentication backend."""
+    """
+    Generate a router with login/logout routes for an authentication backend.
+
+    With a revocation list, logging out revokes the token, and backends
+    without a logout process get a logout route too.
+    With a rate limiter, login attempts over the limits are rejected
+    before checking the credentials.
+    """
     router = APIRouter()
     if requires_verification:
         get_current_user = authenticator.get_current_verified_user
@@ -22,8 +36,21 @@ def get_auth_router(
 
     @router.post("/login")
     async def login(
-        response: Response, credentials: OAuth2PasswordRequestForm = Depends()
+        request: Request,
+        response: Response,
+        credentials: OAuth2PasswordRequestForm = Depends(),
     ):
+        if rate_limiter is not None:
+            retry_after = await rate_limiter.check(
+                rate_limiter.get_client_ip(request), credentials.username
+            )
+            if retry_after:
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail=ErrorCode.LOGIN_TOO_MANY_ATTEMPTS,
+                    headers={"Retry-After": str(retry_after)},
+                )
+
         user = await user_db.authenticate(credentials)
 
         if user is None or not user.is_active:
@@ -38,10 +65,19 @@ def get_auth_router(
             )
         return await backend.get_login_response(user, response)
 
-    if backend.logout:
+    if backend.logout or revocations is not None:
 
         @router.post("/logout")
-        async def logout(response: Response, user=Depends(get_current_user)):
-            return await backend.get_logout_response(user, response)
+        async def logout(
+            request: Request, response: Response, user=Depends(get_current_user)
+        ):
+            credentials = await backend.scheme(request)  # type: ignore
+            data = await backend.read_token(credentials) if credentials else None
+            if data is not None:
+                await backend.revoke_token(data)
+                if revocations is not None:
+                    await revocations.revoke_token(data)
+            if backend.logout:
+                return await backend.get_logout_response(user, response)
 
     return router
@@ -1,19 +1,44 @@
 import asyncio
-from typing import Callable
+from typing import Callable, Optional
+
+from app.core.dispatcher import HookDispatcher
+from app.core.tracing import span
 
 
 class ErrorCode:
     REGISTER_USER_ALREADY_EXISTS = "REGISTER_USER_ALREADY_EXISTS"
     LOGIN_BAD_CREDENTIALS = "LOGIN_BAD_CREDENTIALS"
     LOGIN_USER_NOT_VERIFIED = "LOGIN_USER_NOT_VERIFIED"
+    LOGIN_TOO_MANY_ATTEMPTS = "LOGIN_TOO_MANY_ATTEMPTS"
     RESET_PASSWORD_BAD_TOKEN = "RESET_PASSWORD_BAD_TOKEN"
     VERIFY_USER_BAD_TOKEN = "VERIFY_USER_BAD_TOKEN"
     VERIFY_USER_ALREADY_VERIFIED = "VERIFY_USER_ALREADY_VERIFIED"
     VERIFY_USER_TOKEN_EXPIRED = "VERIFY_USER_TOKEN_EXPIRED"
+    LIST_USERS_BAD_CURSOR = "LIST_USERS_BAD_CURSOR"
+    REFRESH_BAD_TOKEN = "REFRESH_BAD_TOKEN"
+
+
+_hook_dispatcher: Optional[HookDispatcher] = None
+
+
+def set_hook_dispatcher(dispatcher: Optional[HookDispatcher]) -> None:
+    """
+    Run the hooks in the background with a dispatcher, or inline if None.
+
+    Hooks marked with `app.core.dispatcher.inline` always run inline.
+    """
+    global _hook_dispatcher
+    _hook_dispatcher = dispatcher
 
 
 async def run_handler(handler: Callable, *args, **kwargs):
-    if asyncio.iscoroutinefunction(handler):
-        await handler(*args, **kwargs)
-    else:
-        handler(*args, **kwargs)
+    name = getattr(handler, "__qualname__", repr(handler))
+    with span("hook", {"hook": name}):
+        if _hook_dispatcher is not None and not getattr(
+            handler, "run_inline", False
+        ):
+            await _hook_dispatcher.submit(handler, *args, **kwargs)
+        elif asyncio.iscoroutinefunction(handler):
+            await handler(*args, **kwargs)
+        else:
+            handler(*args, **kwargs)
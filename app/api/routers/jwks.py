@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Response
+
+from app.core.auth.keys import KeyRing
+
+
+def get_jwks_router(key_ring: KeyRing, max_age_seconds: int = 300) -> APIRouter:
+    """
+    Publish the public keys of a key ring, so that other services can verify
+    the tokens without calling this one.
+
+    :param max_age_seconds: How long clients may cache the key set.
+    It should be shorter than the activation delay of the key ring.
+    """
+    router = APIRouter()
+
+    @router.get("/.well-known/jwks.json")
+    async def jwks(response: Response):
+        response.headers["Cache-Control"] = f"public, max-age={max_age_seconds}"
+        return key_ring.jwks()
+
+    return router
@@ -8,9 +8,10 @@ from httpx_oauth.oauth2 import BaseOAuth2
 
 from app.api.routers.common import ErrorCode, run_handler
 from app.core.auth import Authenticator
+from app.core.tracing import span
 from app.crud.base import BaseUserDatabase
 from app.schemes import user as models
-from app.security import generate_password, get_password_hash
+from app.security import generate_password, password_hasher
 from app.utils import JWT_ALGORITHM, generate_jwt
 
 STATE_TOKEN_AUDIENCE = "fastapi-users:oauth-state"
@@ -95,9 +96,10 @@ def get_oauth_router(
         access_token_state=Depends(oauth2_authorize_callback),
     ):
         token, state = access_token_state
-        account_id, account_email = await oauth_client.get_id_email(
-            token["access_token"]
-        )
+        with span("oauth.get_id_email", {"oauth.name": oauth_client.name}):
+            account_id, account_email = await oauth_client.get_id_email(
+                token["access_token"]
+            )
 
         try:
             state_data = decode_state_token(state, state_secret)
@@ -126,7 +128,7 @@ def get_oauth_router(
                 password = generate_password()
                 user = user_db_model(
                     email=account_email,
-                    hashed_password=get_password_hash(password),
+                    hashed_password=await password_hasher.hash(password),
                     oauth_accounts=[new_oauth_account],
                 )
                 await user_db.create(user)
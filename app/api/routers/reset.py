@@ -6,8 +6,9 @@ from pydantic import UUID4, EmailStr
 
 from app.api.routers.common import ErrorCode, run_handler
 from app.crud.base import BaseUserDatabase
+from app.db.replica import read_primary
 from app.schemes import user
-from app.security import get_password_hash
+from app.security import password_hasher
 from app.utils import JWT_ALGORITHM, generate_jwt
 
 RESET_PASSWORD_TOKEN_AUDIENCE = "fastapi-users:reset"
@@ -67,6 +68,7 @@ def get_reset_password_router(
                     detail=ErrorCode.RESET_PASSWORD_BAD_TOKEN,
                 )
 
+            read_primary()
             user = await user_db.get(user_uiid)
             if user is None or not user.is_active:
                 raise HTTPException(
@@ -74,7 +76,7 @@ def get_reset_password_router(
                     detail=ErrorCode.RESET_PASSWORD_BAD_TOKEN,
                 )
 
-            user.hashed_password = get_password_hash(password)
+            user.hashed_password = await password_hasher.hash(password)
             await user_db.update(user)
             if after_reset_password:
                 await run_handler(after_reset_password, user, request)
@@ -0,0 +1,33 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from pydantic import UUID4
+
+from app.core.auth import Authenticator
+from app.core.auth.database import DatabaseAuthentication
+from app.schemes.session import Session
+
+
+def get_sessions_router(
+    backend: DatabaseAuthentication, authenticator: Authenticator
+) -> APIRouter:
+    """Generate a router to list and close the sessions of the current user."""
+    router = APIRouter()
+    get_current_active_user = authenticator.get_current_active_user
+
+    @router.get("", response_model=List[Session])
+    async def list_sessions(user=Depends(get_current_active_user)):
+        return await backend.get_sessions(user.id)
+
+    @router.delete("", status_code=status.HTTP_204_NO_CONTENT)
+    async def close_sessions(user=Depends(get_current_active_user)):
+        await backend.close_sessions(user.id)
+        return None
+
+    @router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
+    async def close_session(id: UUID4, user=Depends(get_current_active_user)):
+        if not await backend.close_sessions(user.id, id):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+        return None
+
+    return router
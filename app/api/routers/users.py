@@ -1,13 +1,48 @@
-from typing import Any, Callable, Dict, Optional, Type, cast
+import base64
+import binascii
+import json
+from enum import Enum
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Type, cast
 
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import StreamingResponse
 from pydantic import UUID4
 
-from app.api.routers.common import run_handler
-from app.core.auth import Authenticator
+from app.api.routers.common import ErrorCode, run_handler
+from app.core.auth import Authenticator, get_request_user
 from app.crud.base import BaseUserDatabase
+from app.db.replica import read_primary
 from app.schemes import user as models
-from app.security import get_password_hash
+from app.security import password_hasher
+
+LIST_USERS_CHUNK_SIZE = 1000
+
+
+class UsersOrder(str, Enum):
+    id = "id"
+    email = "email"
+
+
+def encode_cursor(value: Any) -> str:
+    return base64.urlsafe_b64encode(json.dumps(str(value)).encode()).decode()
+
+
+def decode_cursor(cursor: str, order_by: UsersOrder) -> Any:
+    try:
+        value = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(value, str):
+            raise ValueError(value)
+        return UUID4(value) if order_by == UsersOrder.id else value
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=ErrorCode.LIST_USERS_BAD_CURSOR,
+        )
+
+
+async def read_primary_dependency() -> None:
+    # Async, to run in the request task: the users it reads are written back
+    read_primary()
 
 
 def get_users_router(
@@ -18,6 +53,7 @@ def get_users_router(
     authenticator: Authenticator,
     after_update: Optional[Callable[[models.UD, Dict[str, Any], Request], None]] = None,
     requires_verification: bool = False,
+    after_delete: Optional[Callable[[models.UD, Request], None]] = None,
 ) -> APIRouter:
     """Generate a router with the authentication routes."""
     router = APIRouter()
@@ -29,7 +65,18 @@ def get_users_router(
         get_current_active_user = authenticator.get_current_active_user
         get_current_superuser = authenticator.get_current_superuser
 
-    async def _get_or_404(id: UUID4) -> models.BaseUserDB:
+    async def _get_or_404(
+        id: UUID4, request: Optional[Request] = None
+    ) -> models.BaseUserDB:
+        if request is not None:
+            # Spare a query when the caller targets themself
+            current_user = get_request_user(request)
+            if (
+                current_user is not None
+                and current_user.id == id
+                and not isinstance(current_user, models.BaseUserClaims)
+            ):
+                return current_user
         user = await user_db.get(id)
         if user is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
@@ -40,7 +87,7 @@ def get_users_router(
     ):
         for field in update_dict:
             if field == "password":
-                hashed_password = get_password_hash(update_dict[field])
+                hashed_password = await password_hasher.hash(update_dict[field])
                 user.hashed_password = hashed_password
             else:
                 setattr(user, field, update_dict[field])
@@ -55,7 +102,11 @@ def get_users_router(
     ):
         return user
 
-    @router.patch("/me", response_model=user_model)
+    @router.patch(
+        "/me",
+        response_model=user_model,
+        dependencies=[Depends(read_primary_dependency)],
+    )
     async def update_me(
         request: Request,
         updated_user: user_update_model,  # type: ignore
@@ -65,6 +116,9 @@ def get_users_router(
             models.BaseUserUpdate,
             updated_user,
         )  # Prevent mypy complain
+        if isinstance(user, models.BaseUserClaims):
+            # Users authenticated from token claims are partial and may be stale
+            user = await _get_or_404(user.id)
         updated_user_data = updated_user.create_update_dict()
         updated_user = await _update_user(
             user, updated_user_data, request
@@ -72,18 +126,74 @@ def get_users_router(
 
         return updated_user
 
+    @router.get("", dependencies=[Depends(get_current_superuser)])
+    async def list_users(
+        limit: Optional[int] = Query(None, ge=1),
+        cursor: Optional[str] = None,
+        order_by: UsersOrder = UsersOrder.id,
+        is_active: Optional[bool] = None,
+        is_verified: Optional[bool] = None,
+        is_superuser: Optional[bool] = None,
+        email_prefix: Optional[str] = None,
+    ):
+        """
+        Stream users as `{"items": [...], "next_cursor": ...}`.
+
+        Without `limit`, every matching user is streamed. Pass `next_cursor`
+        as `cursor` to get the next page; it is null on the last page.
+        """
+        after = decode_cursor(cursor, order_by) if cursor else None
+
+        async def stream() -> AsyncIterator[str]:
+            nonlocal after
+            remaining = limit
+            separator = ""
+            next_cursor = None
+            yield '{"items": ['
+            while remaining is None or remaining > 0:
+                chunk_size = min(
+                    remaining or LIST_USERS_CHUNK_SIZE, LIST_USERS_CHUNK_SIZE
+                )
+                # The last chunk of a page fetches one more user,
+                # telling whether there is a next page
+                last_chunk = remaining == chunk_size
+                users = await user_db.list(
+                    chunk_size + 1 if last_chunk else chunk_size,
+                    after,
+                    order_by=order_by.value,
+                    is_active=is_active,
+                    is_verified=is_verified,
+                    is_superuser=is_superuser,
+                    email_prefix=email_prefix,
+                )
+                for user in users[:chunk_size]:
+                    yield separator + user_model(**user.dict()).json()
+                    separator = ", "
+                if len(users) < chunk_size:
+                    break
+                after = getattr(users[chunk_size - 1], order_by.value)
+                if last_chunk:
+                    if len(users) > chunk_size:
+                        next_cursor = encode_cursor(after)
+                    break
+                if remaining is not None:
+                    remaining -= chunk_size
+            yield f'], "next_cursor": {json.dumps(next_cursor)}}}'
+
+        return StreamingResponse(stream(), media_type="application/json")
+
     @router.get(
         "/{id}",
         response_model=user_model,
         dependencies=[Depends(get_current_superuser)],
     )
-    async def get_user(id: UUID4):
-        return await _get_or_404(id)
+    async def get_user(id: UUID4, request: Request):
+        return await _get_or_404(id, request)
 
     @router.patch(
         "/{id}",
         response_model=user_model,
-        dependencies=[Depends(get_current_superuser)],
+        dependencies=[Depends(read_primary_dependency), Depends(get_current_superuser)],
     )
     async def update_user(
         id: UUID4, updated_user: user_update_model, request: Request  # type: ignore
@@ -92,18 +202,20 @@ def get_users_router(
             models.BaseUserUpdate,
             updated_user,
         )  # Prevent mypy complain
-        user = await _get_or_404(id)
+        user = await _get_or_404(id, request)
         updated_user_data = updated_user.create_update_dict_superuser()
         return await _update_user(user, updated_user_data, request)
 
     @router.delete(
         "/{id}",
         status_code=status.HTTP_204_NO_CONTENT,
-        dependencies=[Depends(get_current_superuser)],
+        dependencies=[Depends(read_primary_dependency), Depends(get_current_superuser)],
     )
-    async def delete_user(id: UUID4):
-        user = await _get_or_404(id)
+    async def delete_user(id: UUID4, request: Request):
+        user = await _get_or_404(id, request)
         await user_db.delete(user)
+        if after_delete:
+            await run_handler(after_delete, user, request)
         return None
 
     return router
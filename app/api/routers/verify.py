@@ -7,6 +7,7 @@ from pydantic import UUID4, EmailStr
 from app.api.routers.common import ErrorCode, run_handler
 from app.core.protocols import (GetUserProtocol, UserAlreadyVerified,
                                 UserNotExists, VerifyUserProtocol)
+from app.db.replica import read_primary
 from app.schemes import user
 from app.utils import JWT_ALGORITHM, generate_jwt
 
@@ -85,6 +86,7 @@ def get_verify_router(
                 detail=ErrorCode.VERIFY_USER_BAD_TOKEN,
             )
 
+        read_primary()
         try:
             user_check = await get_user(email)
         except UserNotExists:
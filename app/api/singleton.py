@@ -6,9 +6,11 @@ from app.api.routers import (get_auth_router, get_register_router,
                              get_reset_password_router, get_users_router,
                              get_verify_router)
 from app.core.auth import Authenticator, BaseAuthentication
+from app.core.auth.revocation import TokenRevocationList
 from app.core.protocols import (CreateUserProtocol, GetUserProtocol,
                                 VerifyUserProtocol, get_create_user,
                                 get_get_user, get_verify_user)
+from app.core.ratelimit import LoginRateLimiter
 from app.crud.base import BaseUserDatabase
 from app.schemes import user
 
@@ -30,6 +32,10 @@ class FastAPIUsers:
     :param user_create_model: Pydantic model for creating a user.
     :param user_update_model: Pydantic model for updating a user.
     :param user_db_model: Pydantic model of a DB representation of a user.
+    :param revocations: Optional revocation list of the tokens.
+    :param auth_strategy: How the authenticator combines the backends,
+    either "first" or "resolve_once".
+    :param login_rate_limiter: Optional rate limiter of the login routes.
 
     :attribute create_user: Helper function to create a user programmatically.
     :attribute get_current_user: Dependency callable to inject authenticated user.
@@ -58,9 +64,16 @@ class FastAPIUsers:
         user_create_model: Type[user.BaseUserCreate],
         user_update_model: Type[user.BaseUserUpdate],
         user_db_model: Type[user.BaseUserDB],
+        revocations: Optional[TokenRevocationList] = None,
+        auth_strategy: str = "first",
+        login_rate_limiter: Optional[LoginRateLimiter] = None,
     ):
         self.db = db
-        self.authenticator = Authenticator(auth_backends, db)
+        self.revocations = revocations
+        self.login_rate_limiter = login_rate_limiter
+        self.authenticator = Authenticator(
+            auth_backends, db, revocations, auth_strategy
+        )
 
         self._user_model = user_model
         self._user_db_model = user_db_model
@@ -179,6 +192,8 @@ class FastAPIUsers:
             self.db,  # type: ignore
             self.authenticator,  # type: ignore
             requires_verification,
+            self.revocations,
+            self.login_rate_limiter,
         )
 
     def get_oauth_router(
@@ -214,12 +229,15 @@ class FastAPIUsers:
             Callable[[user.UD, Dict[str, Any], Request], None]
         ] = None,
         requires_verification: bool = False,
+        after_delete: Optional[Callable[[user.UD, Request], None]] = None,
     ) -> APIRouter:
         """
         Return a router with routes to manage users.
 
         :param after_update: Optional function called
         after a successful user update.
+        :param after_delete: Optional function called
+        after a successful user deletion.
         """
         return get_users_router(
             self.db,  # type: ignore
@@ -229,4 +247,5 @@ class FastAPIUsers:
             self.authenticator,  # type: ignore
             after_update,
             requires_verification,
+            after_delete,
         )
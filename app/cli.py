@@ -0,0 +1,167 @@
+"""
+Administration commands.
+
+    python -m app.cli import-users users.csv --checkpoint users.checkpoint
+    python -m app.cli export-users users.jsonl
+    python -m app.cli rotate-key
+    python -m app.cli purge-expired-tokens
+    python -m app.cli password-report
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from typing import Optional
+
+from app.core.auth.keys import KEY_ALGORITHMS, KeyRing
+from app.core.bulk import (ImportProgress, export_users, get_format,
+                           import_users, read_records)
+from app.db.session import database
+from app.models.access_token import access_tokens
+from app.models.refresh_token import refresh_tokens
+from app.models.revocation import revocation_store
+from app.models.user import user_db
+from app.schemes.user import UserCreate, UserDB
+from app.security import PasswordHashReport
+from config.settings import settings
+
+
+def load_checkpoint(path: Optional[str]) -> ImportProgress:
+    progress = ImportProgress()
+    if path and os.path.exists(path):
+        with open(path) as file:
+            vars(progress).update(json.load(file))
+    return progress
+
+
+def save_checkpoint(path: Optional[str], progress: ImportProgress) -> None:
+    if path:
+        with open(f"{path}.tmp", "w") as file:
+            json.dump(vars(progress), file)
+        os.replace(f"{path}.tmp", path)
+
+
+async def import_users_command(args: argparse.Namespace) -> None:
+    progress = load_checkpoint(args.checkpoint)
+    if progress.processed:
+        print(f"Resuming after {progress.processed} records", file=sys.stderr)
+
+    def on_chunk(progress: ImportProgress) -> None:
+        save_checkpoint(args.checkpoint, progress)
+        print(progress, file=sys.stderr)
+
+    with open(args.path, newline="") as file:
+        records = read_records(file, get_format(args.path, args.format))
+        await import_users(
+            user_db,
+            UserCreate,
+            UserDB,
+            records,
+            chunk_size=args.chunk_size,
+            processes=args.processes,
+            progress=progress,
+            on_chunk=on_chunk,
+        )
+
+
+async def export_users_command(args: argparse.Namespace) -> None:
+    def on_progress(exported: int) -> None:
+        print(f"exported={exported}", file=sys.stderr)
+
+    with open(args.path, "w", newline="") as file:
+        exported = await export_users(
+            user_db, file, get_format(args.path, args.format), on_progress
+        )
+    print(f"exported={exported}", file=sys.stderr)
+
+
+def rotate_key_command(args: argparse.Namespace) -> None:
+    if not args.dir:
+        sys.exit("No key directory, set JWT_KEYS_DIR or pass --dir")
+    key_ring = KeyRing(
+        args.dir,
+        algorithm=args.algorithm,
+        activation_delay_seconds=settings.JWT_KEYS_ACTIVATION_DELAY_SECONDS,
+        overlap_seconds=settings.JWT_KEYS_OVERLAP_SECONDS,
+    )
+    kid = key_ring.rotate()
+    print(f"Added key {kid}", file=sys.stderr)
+
+
+async def purge_expired_tokens_command(args: argparse.Namespace) -> None:
+    await refresh_tokens.delete_expired()
+    await revocation_store.delete_expired()
+    await access_tokens.delete_expired()
+
+
+async def password_report_command(args: argparse.Namespace) -> None:
+    report = PasswordHashReport()
+    async for user in user_db.iterate():
+        report.add(user.hashed_password)
+    print(report)
+
+
+async def run(args: argparse.Namespace) -> None:
+    await database.connect()
+    try:
+        await args.command(args)
+    finally:
+        await database.disconnect()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Auth service administration.")
+    subparsers = parser.add_subparsers(required=True)
+
+    import_parser = subparsers.add_parser(
+        "import-users", help="Import users from a CSV or JSON Lines file."
+    )
+    import_parser.set_defaults(command=import_users_command)
+    import_parser.add_argument("path")
+    import_parser.add_argument("--format", choices=("csv", "jsonl"))
+    import_parser.add_argument("--chunk-size", type=int, default=1000)
+    import_parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    import_parser.add_argument(
+        "--checkpoint", help="File keeping the progress, to resume the import."
+    )
+
+    export_parser = subparsers.add_parser(
+        "export-users", help="Export users to a CSV or JSON Lines file."
+    )
+    export_parser.set_defaults(command=export_users_command)
+    export_parser.add_argument("path")
+    export_parser.add_argument("--format", choices=("csv", "jsonl"))
+
+    rotate_parser = subparsers.add_parser(
+        "rotate-key",
+        help="Add a token signing key and delete the retired ones. "
+        "Run it periodically, e.g. from cron.",
+    )
+    rotate_parser.set_defaults(command=rotate_key_command)
+    rotate_parser.add_argument("--dir", default=settings.JWT_KEYS_DIR)
+    rotate_parser.add_argument(
+        "--algorithm", choices=KEY_ALGORITHMS, default=settings.JWT_KEYS_ALGORITHM
+    )
+
+    purge_parser = subparsers.add_parser(
+        "purge-expired-tokens",
+        help="Delete the expired refresh tokens, revocations and sessions.",
+    )
+    purge_parser.set_defaults(command=purge_expired_tokens_command)
+
+    password_parser = subparsers.add_parser(
+        "password-report",
+        help="Count the password hashes per scheme and the ones to upgrade.",
+    )
+    password_parser.set_defaults(command=password_report_command)
+
+    args = parser.parse_args()
+    if asyncio.iscoroutinefunction(args.command):
+        asyncio.run(run(args))
+    else:
+        args.command(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,24 @@
 import re
+import time
 from inspect import Parameter, Signature
-from typing import Optional, Sequence
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from makefun import with_signature
+from pydantic import UUID4
 
 from app.core.auth.base import BaseAuthentication  # noqa: F401
 from app.core.auth.cookie import CookieAuthentication  # noqa: F401
 from app.core.auth.jwt import JWTAuthentication  # noqa: F401
+from app.core.auth.revocation import TokenRevocationList
+from app.core.metrics import auth_results
+from app.core.tracing import span
 from app.crud.base import BaseUserDatabase
 from app.schemes.user import BaseUserDB
 
 INVALID_CHARS_PATTERN = re.compile(r"[^0-9a-zA-Z_]")
 INVALID_LEADING_CHARS_PATTERN = re.compile(r"^[^a-zA-Z_]+")
+REQUEST_USER_ATTRIBUTE = "authenticated_user"
 
 
 def name_to_variable_name(name: str) -> str:
@@ -22,10 +28,77 @@ def name_to_variable_name(name: str) -> str:
     return name
 
 
+def get_request_user(request: Request) -> Optional[BaseUserDB]:
+    """Return the user already authenticated during this request, if any."""
+    return getattr(request.state, REQUEST_USER_ATTRIBUTE, None)
+
+
 class DuplicateBackendNamesError(Exception):
     pass
 
 
+class UnknownStrategyError(Exception):
+    pass
+
+
+STRATEGY_FIRST = "first"
+STRATEGY_RESOLVE_ONCE = "resolve_once"
+
+
+class BackendMetrics:
+    """Latency and outcome counters of an authentication backend."""
+
+    calls: int
+    rejected: int
+    seconds_total: float
+    seconds_max: float
+
+    def __init__(self):
+        self.calls = 0
+        self.rejected = 0
+        self.seconds_total = 0.0
+        self.seconds_max = 0.0
+
+    @property
+    def seconds_avg(self) -> float:
+        return self.seconds_total / self.calls if self.calls else 0.0
+
+    def observe(self, seconds: float, rejected: bool) -> None:
+        self.calls += 1
+        self.rejected += rejected
+        self.seconds_total += seconds
+        self.seconds_max = max(self.seconds_max, seconds)
+
+
+class AuthPolicy:
+    """
+    Requirements on the authenticated user of a dependency.
+
+    :param active: Whether the user must be active.
+    :param verified: Whether the user must be verified.
+    :param superuser: Whether the user must be a superuser.
+    :param optional: Whether to return None instead of raising
+    when the requirements are not met.
+    """
+
+    active: bool
+    verified: bool
+    superuser: bool
+    optional: bool
+
+    def __init__(
+        self,
+        active: bool = False,
+        verified: bool = False,
+        superuser: bool = False,
+        optional: bool = False,
+    ):
+        self.active = active
+        self.verified = verified
+        self.superuser = superuser
+        self.optional = optional
+
+
 class Authenticator:
     """
     Provides dependency callables to retrieve authenticated user.
@@ -34,18 +107,46 @@ class Authenticator:
     defined by the end-developer. The first backend yielding a user wins.
     If no backend yields a user, an HTTPException is raised.
 
+    With the "first" strategy, the backends are tried one after the other,
+    each one loading its user. With the "resolve_once" strategy, every
+    supplied credential is verified first, then the users are loaded with
+    a single query, and the user of the first valid credential wins;
+    when several credentials are valid, the users are loaded
+    from the database even by backends trusting token claims.
+
+    Authentication runs once per request: its result is kept
+    on `request.state` for every other dependency needing the user.
+    Each dependency then checks the user against its policy in place,
+    see `get_dependency`.
+
     :param backends: List of authentication backends.
     :param user_db: Database adapter instance.
+    :param revocations: Optional revocation list of the tokens.
+    :param strategy: Either "first" or "resolve_once".
+
+    :attribute metrics: Latency and outcome counters, by backend name.
     """
 
     backends: Sequence[BaseAuthentication]
     user_db: BaseUserDatabase
+    revocations: Optional[TokenRevocationList]
+    strategy: str
+    metrics: Dict[str, BackendMetrics]
 
     def __init__(
-        self, backends: Sequence[BaseAuthentication], user_db: BaseUserDatabase
+        self,
+        backends: Sequence[BaseAuthentication],
+        user_db: BaseUserDatabase,
+        revocations: Optional[TokenRevocationList] = None,
+        strategy: str = STRATEGY_FIRST,
     ):
+        if strategy not in (STRATEGY_FIRST, STRATEGY_RESOLVE_ONCE):
+            raise UnknownStrategyError(strategy)
         self.backends = backends
         self.user_db = user_db
+        self.revocations = revocations
+        self.strategy = strategy
+        self.metrics = {backend.name: BackendMetrics() for backend in backends}
 
         # Here comes some blood magic 🧙‍♂️
         # Thank to "makefun", we are able to generate callable
@@ -53,6 +154,12 @@ class Authenticator:
         # This way, each security schemes are detected by the OpenAPI generator.
         try:
             parameters = [
+                Parameter(
+                    name="request",
+                    kind=Parameter.POSITIONAL_OR_KEYWORD,
+                    annotation=Request,
+                )
+            ] + [
                 Parameter(
                     name=name_to_variable_name(backend.name),
                     kind=Parameter.POSITIONAL_OR_KEYWORD,
@@ -64,99 +171,154 @@ class Authenticator:
         except ValueError:
             raise DuplicateBackendNamesError()
 
-        @with_signature(signature, func_name="get_optional_current_user")
-        async def get_optional_current_user(*args, **kwargs):
-            return await self._authenticate(*args, **kwargs)
-
-        @with_signature(signature, func_name="get_optional_current_active_user")
-        async def get_optional_current_active_user(*args, **kwargs):
-            user = await get_optional_current_user(*args, **kwargs)
-            if not user or not user.is_active:
-                return None
-            return user
-
-        @with_signature(signature, func_name="get_optional_current_verified_user")
-        async def get_optional_current_verified_user(*args, **kwargs):
-            user = await get_optional_current_active_user(*args, **kwargs)
-            if not user or not user.is_verified:
-                return None
-            return user
+        self._signature = signature
 
-        @with_signature(signature, func_name="get_optional_current_superuser")
-        async def get_optional_current_superuser(*args, **kwargs):
-            user = await get_optional_current_active_user(*args, **kwargs)
-            if not user or not user.is_superuser:
-                return None
-            return user
+        self.get_current_user = self.get_dependency(AuthPolicy(), "get_current_user")
+        self.get_current_active_user = self.get_dependency(
+            AuthPolicy(active=True), "get_current_active_user"
+        )
+        self.get_current_verified_user = self.get_dependency(
+            AuthPolicy(active=True, verified=True), "get_current_verified_user"
+        )
+        self.get_current_superuser = self.get_dependency(
+            AuthPolicy(active=True, superuser=True), "get_current_superuser"
+        )
+        self.get_current_verified_superuser = self.get_dependency(
+            AuthPolicy(active=True, verified=True, superuser=True),
+            "get_current_verified_superuser",
+        )
+        self.get_optional_current_user = self.get_dependency(
+            AuthPolicy(optional=True), "get_optional_current_user"
+        )
+        self.get_optional_current_active_user = self.get_dependency(
+            AuthPolicy(active=True, optional=True),
+            "get_optional_current_active_user",
+        )
+        self.get_optional_current_verified_user = self.get_dependency(
+            AuthPolicy(active=True, verified=True, optional=True),
+            "get_optional_current_verified_user",
+        )
+        self.get_optional_current_superuser = self.get_dependency(
+            AuthPolicy(active=True, superuser=True, optional=True),
+            "get_optional_current_superuser",
+        )
+        self.get_optional_current_verified_superuser = self.get_dependency(
+            AuthPolicy(active=True, verified=True, superuser=True, optional=True),
+            "get_optional_current_verified_superuser",
+        )
 
-        @with_signature(signature, func_name="get_optional_current_verified_superuser")
-        async def get_optional_current_verified_superuser(*args, **kwargs):
-            user = await get_optional_current_verified_user(*args, **kwargs)
-            if not user or not user.is_superuser:
-                return None
-            return user
+    def get_dependency(self, policy: AuthPolicy, name: str = "get_user"):
+        """
+        Build a dependency callable returning the user allowed by a policy.
 
-        @with_signature(signature, func_name="get_current_user")
-        async def get_current_user(*args, **kwargs):
-            user = await get_optional_current_user(*args, **kwargs)
-            if user is None:
-                raise self._get_credentials_exception()
-            return user
+        The user is checked in a single coroutine, whatever the policy.
 
-        @with_signature(signature, func_name="get_current_active_user")
-        async def get_current_active_user(*args, **kwargs):
-            user = await get_optional_current_active_user(*args, **kwargs)
-            if user is None:
-                raise self._get_credentials_exception()
-            return user
+        :param policy: Requirements on the user.
+        :param name: Name of the callable.
+        """
 
-        @with_signature(signature, func_name="get_current_verified_user")
-        async def get_current_verified_user(*args, **kwargs):
-            user = await get_optional_current_verified_user(*args, **kwargs)
-            if user is None:
-                raise self._get_credentials_exception()
-            return user
+        @with_signature(self._signature, func_name=name)
+        async def dependency(*args, **kwargs):
+            request: Request = kwargs["request"]
+            if hasattr(request.state, REQUEST_USER_ATTRIBUTE):
+                user = get_request_user(request)
+            else:
+                user = await self._authenticate(**kwargs)
+                setattr(request.state, REQUEST_USER_ATTRIBUTE, user)
 
-        @with_signature(signature, func_name="get_current_superuser")
-        async def get_current_superuser(*args, **kwargs):
-            user = await get_optional_current_active_user(*args, **kwargs)
-            if user is None:
+            if user is None or (
+                (policy.active and not user.is_active)
+                or (policy.verified and not user.is_verified)
+            ):
+                if policy.optional:
+                    return None
                 raise self._get_credentials_exception()
-            if not user.is_superuser:
+            if policy.superuser and not user.is_superuser:
+                if policy.optional:
+                    return None
                 raise self._get_credentials_exception(status.HTTP_403_FORBIDDEN)
             return user
 
-        @with_signature(signature, func_name="get_current_verified_superuser")
-        async def get_current_verified_superuser(*args, **kwargs):
-            user = await get_optional_current_verified_user(*args, **kwargs)
-            if user is None:
-                raise self._get_credentials_exception()
-            if not user.is_superuser:
-                raise self._get_credentials_exception(status.HTTP_403_FORBIDDEN)
-            return user
+        return dependency
 
-        self.get_current_user = get_current_user
-        self.get_current_active_user = get_current_active_user
-        self.get_current_verified_user = get_current_verified_user
-        self.get_current_superuser = get_current_superuser
-        self.get_current_verified_superuser = get_current_verified_superuser
-        self.get_optional_current_user = get_optional_current_user
-        self.get_optional_current_active_user = get_optional_current_active_user
-        self.get_optional_current_verified_user = get_optional_current_verified_user
-        self.get_optional_current_superuser = get_optional_current_superuser
-        self.get_optional_current_verified_superuser = (
-            get_optional_current_verified_superuser
-        )
+    async def _authenticate(self, **kwargs) -> Optional[BaseUserDB]:
+        if self.strategy == STRATEGY_RESOLVE_ONCE:
+            return await self._authenticate_once(**kwargs)
 
-    async def _authenticate(self, *args, **kwargs) -> Optional[BaseUserDB]:
         for backend in self.backends:
             token: str = kwargs[name_to_variable_name(backend.name)]
             if token:
-                user = await backend(token, self.user_db)
+                started_at = time.perf_counter()
+                with span("auth.backend", {"auth.backend": backend.name}):
+                    data = await self._read_token(backend, token)
+                    user = None
+                    if data is not None:
+                        user = await backend.get_user(data, self.user_db)
+                self.metrics[backend.name].observe(
+                    time.perf_counter() - started_at, user is None
+                )
+                auth_results.labels(
+                    backend.name,
+                    "invalid" if data is None else "miss" if user is None else "hit",
+                ).inc()
                 if user is not None:
                     return user
         return None
 
+    async def _authenticate_once(self, **kwargs) -> Optional[BaseUserDB]:
+        candidates: List[Tuple[BaseAuthentication, Dict[str, Any]]] = []
+        for backend in self.backends:
+            token: str = kwargs[name_to_variable_name(backend.name)]
+            if token:
+                started_at = time.perf_counter()
+                with span("auth.read_token", {"auth.backend": backend.name}):
+                    data = await self._read_token(backend, token)
+                self.metrics[backend.name].observe(
+                    time.perf_counter() - started_at, data is None
+                )
+                if data is None:
+                    auth_results.labels(backend.name, "invalid").inc()
+                else:
+                    candidates.append((backend, data))
+
+        if len(candidates) == 1:
+            backend, data = candidates[0]
+            user = await backend.get_user(data, self.user_db)
+            auth_results.labels(backend.name, "miss" if user is None else "hit").inc()
+            return user
+
+        user_ids: List[Optional[UUID4]] = []
+        for _, data in candidates:
+            try:
+                user_id: Optional[UUID4] = UUID4(data.get("user_id"))
+            except (TypeError, ValueError):
+                user_id = None
+            user_ids.append(user_id)
+        unique_user_ids = list(dict.fromkeys(id for id in user_ids if id is not None))
+        users = {}
+        if unique_user_ids:
+            users = {
+                user.id: user for user in await self.user_db.get_many(unique_user_ids)
+            }
+        for (backend, _), user_id in zip(candidates, user_ids):
+            auth_results.labels(
+                backend.name, "hit" if user_id in users else "miss"
+            ).inc()
+        for user_id in unique_user_ids:
+            if user_id in users:
+                return users[user_id]
+        return None
+
+    async def _read_token(
+        self, backend: BaseAuthentication, token: str
+    ) -> Optional[Dict[str, Any]]:
+        data = await backend.read_token(token)
+        if data is None:
+            return None
+        if self.revocations is not None and await self.revocations.is_revoked(data):
+            return None
+        return data
+
     def _get_credentials_exception(
         self, status_code: int = status.HTTP_401_UNAUTHORIZED
     ) -> HTTPException:
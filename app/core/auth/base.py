@@ -1,8 +1,9 @@
-from typing import Any, Generic, Optional, TypeVar
+from typing import Any, Dict, Generic, Optional, TypeVar
 
 from fastapi import Response
 from fastapi.security.base import SecurityBase
 
+from app.core.tracing import span
 from app.crud.base import BaseUserDatabase
 from app.schemes.user import BaseUserDB
 
@@ -30,8 +31,28 @@ class BaseAuthentication(Generic[T]):
     async def __call__(
         self, credentials: Optional[T], user_db: BaseUserDatabase
     ) -> Optional[BaseUserDB]:
+        if credentials is None:
+            return None
+        with span("auth.backend", {"auth.backend": self.name}):
+            data = await self.read_token(credentials)
+            if data is None:
+                return None
+            return await self.get_user(data, user_db)
+
+    async def read_token(self, credentials: T) -> Optional[Dict[str, Any]]:
+        """Verify the credentials and return the data they hold, or None."""
         raise NotImplementedError()
 
+    async def get_user(
+        self, data: Dict[str, Any], user_db: BaseUserDatabase
+    ) -> Optional[BaseUserDB]:
+        """Return the user designated by verified credentials data, or None."""
+        raise NotImplementedError()
+
+    async def revoke_token(self, data: Dict[str, Any]) -> None:
+        """Invalidate verified credentials on logout, if the backend can."""
+        pass
+
     async def get_login_response(self, user: BaseUserDB, response: Response) -> Any:
         raise NotImplementedError()
 
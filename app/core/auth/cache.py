@@ -0,0 +1,64 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+class DecodedTokenCache:
+    """
+    Bounded LRU cache of verified token payloads, keyed by token digest.
+
+    Saves the signature and claims verification of tokens sent again and
+    again. An entry expires along with its token; tokens without an `exp`
+    claim are not cached.
+
+    :param max_size: Maximum number of cached tokens.
+    """
+
+    max_size: int
+    hits: int
+    misses: int
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[bytes, Tuple[float, Dict[str, Any]]]" = (
+            OrderedDict()
+        )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        """Get the payload of a token verified earlier and not expired yet."""
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, data = entry
+            if expires_at > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def set(self, token: str, data: Dict[str, Any]) -> None:
+        """Cache the payload of a verified token."""
+        expires_at = data.get("exp")
+        if not isinstance(expires_at, (int, float)):
+            return
+        key = self._key(token)
+        self._entries[key] = (expires_at, data)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _key(self, token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
@@ -0,0 +1,93 @@
+import time
+from typing import Any, Dict, Optional
+
+from pydantic import UUID4, ValidationError
+
+from app.schemes.user import BaseUserClaims, BaseUserDB
+
+USER_CLAIMS = ("email", "is_active", "is_verified", "is_superuser")
+CLAIMS_ISSUED_AT = "claims_iat"
+
+
+class ClaimsRevocationRegistry:
+    """
+    Remember the users whose claims changed, so older claims are not trusted.
+
+    The registry lives in the process memory: other workers only stop trusting
+    the stale claims once they are older than `max_age_seconds`, which bounds
+    their staleness. Keep it short, and revoke the tokens themselves when
+    every worker must stop trusting them sooner.
+
+    :param max_age_seconds: Maximum age of trusted claims. Older revocations
+    are forgotten since the claims they target are not trusted anymore.
+    """
+
+    max_age_seconds: int
+
+    def __init__(self, max_age_seconds: int):
+        self.max_age_seconds = max_age_seconds
+        self._revoked_at: Dict[UUID4, float] = {}
+
+    async def revoke(self, user_id: UUID4) -> None:
+        """Stop trusting claims of a user read before now."""
+        now = time.time()
+        self._revoked_at[user_id] = now
+        self._prune(now)
+
+    async def is_revoked(self, user_id: UUID4, claims_issued_at: float) -> bool:
+        """Whether claims of a user read at a given time have been revoked."""
+        revoked_at = self._revoked_at.get(user_id)
+        return revoked_at is not None and claims_issued_at <= revoked_at
+
+    def _prune(self, now: float) -> None:
+        threshold = now - self.max_age_seconds
+        for user_id, revoked_at in list(self._revoked_at.items()):
+            if revoked_at < threshold:
+                del self._revoked_at[user_id]
+
+
+def get_user_claims(user: BaseUserDB) -> Dict[str, Any]:
+    """
+    Return the claims describing a user, to embed in a token.
+
+    Claims keep the time they were read from the database, even when a token
+    is re-issued from another token, so their staleness is bounded.
+    """
+    if isinstance(user, BaseUserClaims):
+        issued_at = user.claims_issued_at
+    else:
+        issued_at = int(time.time())
+    claims = {claim: getattr(user, claim) for claim in USER_CLAIMS}
+    claims[CLAIMS_ISSUED_AT] = issued_at
+    return claims
+
+
+async def get_claims_user(
+    user_id: UUID4,
+    data: Dict[str, Any],
+    max_age_seconds: int,
+    revocations: Optional[ClaimsRevocationRegistry] = None,
+) -> Optional[BaseUserClaims]:
+    """
+    Rebuild a user from the claims of a decoded token.
+
+    Return None when the token has no claims, when they are too old
+    or when they have been revoked; the user should then be read from the
+    database.
+    """
+    issued_at = data.get(CLAIMS_ISSUED_AT)
+    if not isinstance(issued_at, int) or any(c not in data for c in USER_CLAIMS):
+        return None
+    if issued_at + max_age_seconds < time.time():
+        return None
+    if revocations is not None and await revocations.is_revoked(user_id, issued_at):
+        return None
+
+    try:
+        return BaseUserClaims(
+            id=user_id,
+            claims_issued_at=issued_at,
+            **{claim: data[claim] for claim in USER_CLAIMS},
+        )
+    except ValidationError:
+        return None
@@ -1,4 +1,6 @@
-from typing import Any, Optional
+import time
+import uuid
+from typing import Any, Dict, Optional
 
 import jwt
 from fastapi import Response
@@ -6,6 +8,11 @@ from fastapi.security import APIKeyCookie
 from pydantic import UUID4
 
 from app.core.auth.base import BaseAuthentication
+from app.core.auth.cache import DecodedTokenCache
+from app.core.auth.claims import (ClaimsRevocationRegistry, get_claims_user,
+                                  get_user_claims)
+from app.core.auth.keys import KeyRing
+from app.core.metrics import jwt_seconds
 from app.crud.base import BaseUserDatabase
 from app.schemes.user import BaseUserDB
 from app.utils import JWT_ALGORITHM, generate_jwt
@@ -25,12 +32,25 @@ class CookieAuthentication(BaseAuthentication[str]):
     :param cookie_secure: Whether to only send the cookie to the server via SSL request.
     :param cookie_httponly: Whether to prevent access to the cookie via JavaScript.
     :param name: Name of the backend. It will be used to name the login route.
+    :param claims: Whether to embed the user state in the token and trust it
+    instead of reading the user from the database.
+    :param claims_max_age_seconds: Maximum age of trusted claims.
+    :param claims_revocations: Optional registry of users whose claims
+    should not be trusted anymore.
+    :param token_cache: Optional cache of verified tokens.
+    :param key_ring: Optional ring of asymmetric keys signing the tokens
+    instead of the secret.
     """
 
     scheme: APIKeyCookie
     token_audience: str = "fastapi-users:auth"
     secret: str
     lifetime_seconds: int
+    claims: bool
+    claims_max_age_seconds: int
+    claims_revocations: Optional[ClaimsRevocationRegistry]
+    token_cache: Optional[DecodedTokenCache]
+    key_ring: Optional[KeyRing]
     cookie_name: str
     cookie_path: str
     cookie_domain: Optional[str]
@@ -49,10 +69,20 @@ class CookieAuthentication(BaseAuthentication[str]):
         cookie_httponly: bool = True,
         cookie_samesite: str = "lax",
         name: str = "cookie",
+        claims: bool = False,
+        claims_max_age_seconds: int = 300,
+        claims_revocations: Optional[ClaimsRevocationRegistry] = None,
+        token_cache: Optional[DecodedTokenCache] = None,
+        key_ring: Optional[KeyRing] = None,
     ):
         super().__init__(name, logout=True)
         self.secret = secret
         self.lifetime_seconds = lifetime_seconds
+        self.claims = claims
+        self.claims_max_age_seconds = claims_max_age_seconds
+        self.claims_revocations = claims_revocations
+        self.token_cache = token_cache
+        self.key_ring = key_ring
         self.cookie_name = cookie_name
         self.cookie_path = cookie_path
         self.cookie_domain = cookie_domain
@@ -61,33 +91,49 @@ class CookieAuthentication(BaseAuthentication[str]):
         self.cookie_samesite = cookie_samesite
         self.scheme = APIKeyCookie(name=self.cookie_name, auto_error=False)
 
-    async def __call__(
-        self,
-        credentials: Optional[str],
-        user_db: BaseUserDatabase,
-    ) -> Optional[BaseUserDB]:
-        if credentials is None:
-            return None
-
-        try:
-            data = jwt.decode(
-                credentials,
-                self.secret,
-                audience=self.token_audience,
-                algorithms=[JWT_ALGORITHM],
-            )
-            user_id = data.get("user_id")
-            if user_id is None:
+    async def read_token(self, credentials: str) -> Optional[Dict[str, Any]]:
+        data = None
+        if self.token_cache is not None:
+            data = self.token_cache.get(credentials)
+        if data is None:
+            try:
+                with jwt_seconds.labels("decode").time():
+                    if self.key_ring is not None:
+                        data = self.key_ring.decode(credentials, self.token_audience)
+                    else:
+                        data = jwt.decode(
+                            credentials,
+                            self.secret,
+                            audience=self.token_audience,
+                            algorithms=[JWT_ALGORITHM],
+                        )
+            except jwt.PyJWTError:
                 return None
-        except jwt.PyJWTError:
+            if self.token_cache is not None:
+                self.token_cache.set(credentials, data)
+        return data
+
+    async def get_user(
+        self, data: Dict[str, Any], user_db: BaseUserDatabase
+    ) -> Optional[BaseUserDB]:
+        user_id = data.get("user_id")
+        if user_id is None:
             return None
 
         try:
             user_uiid = UUID4(user_id)
-            return await user_db.get(user_uiid)
         except ValueError:
             return None
 
+        if self.claims:
+            user = await get_claims_user(
+                user_uiid, data, self.claims_max_age_seconds, self.claims_revocations
+            )
+            if user is not None:
+                return user
+
+        return await user_db.get(user_uiid)
+
     async def get_login_response(self, user: BaseUserDB, response: Response) -> Any:
         token = await self._generate_token(user)
         response.set_cookie(
@@ -111,5 +157,14 @@ class CookieAuthentication(BaseAuthentication[str]):
         )
 
     async def _generate_token(self, user: BaseUserDB) -> str:
-        data = {"user_id": str(user.id), "aud": self.token_audience}
+        data = {
+            "user_id": str(user.id),
+            "aud": self.token_audience,
+            "jti": uuid.uuid4().hex,
+            "iat": int(time.time()),
+        }
+        if self.claims:
+            data.update(get_user_claims(user))
+        if self.key_ring is not None:
+            return self.key_ring.encode(data, self.lifetime_seconds)
         return generate_jwt(data, self.lifetime_seconds, self.secret, JWT_ALGORITHM)
@@ -0,0 +1,196 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Mapping, Optional, Set, Tuple
+
+from fastapi import Response
+from fastapi.security import OAuth2PasswordBearer
+from pydantic import UUID4
+
+from app.core.auth.base import BaseAuthentication
+from app.crud.base import BaseUserDatabase
+from app.crud.crud_access_token import SQLAlchemyAccessTokenStore
+from app.schemes.user import BaseUserDB
+
+logger = logging.getLogger(__name__)
+
+
+class DatabaseAuthentication(BaseAuthentication[str]):
+    """
+    Authentication backend using opaque tokens in a Bearer header,
+    backed by server-side sessions.
+
+    Sessions are cached in process for `cache_ttl_seconds`: a session closed
+    by another process is still accepted here until its entry expires.
+    The sliding expiration is not written on every request: a session seen
+    again after `touch_interval_seconds` is queued, and the queue is saved
+    in a single statement every `flush_interval_seconds`, as seen at the
+    time of the save.
+
+    :param store: Access token store instance.
+    :param lifetime_seconds: Lifetime of an idle session.
+    :param tokenUrl: Path where to get a token.
+    :param name: Name of the backend. It will be used to name the login route.
+    :param cache_size: Maximum number of cached sessions.
+    :param cache_ttl_seconds: Time to live of a cached session.
+    :param touch_interval_seconds: Minimum delay between two saves
+    of the last use of a session.
+    :param flush_interval_seconds: Delay between two saves of the queue.
+    """
+
+    scheme: OAuth2PasswordBearer
+    store: SQLAlchemyAccessTokenStore
+    lifetime_seconds: int
+    cache_size: int
+    cache_ttl_seconds: float
+    touch_interval_seconds: int
+    flush_interval_seconds: float
+
+    def __init__(
+        self,
+        store: SQLAlchemyAccessTokenStore,
+        lifetime_seconds: int,
+        tokenUrl: str = "/login",
+        name: str = "database",
+        cache_size: int = 10000,
+        cache_ttl_seconds: float = 30,
+        touch_interval_seconds: int = 300,
+        flush_interval_seconds: float = 10,
+    ):
+        super().__init__(name, logout=True)
+        self.scheme = OAuth2PasswordBearer(tokenUrl, auto_error=False)
+        self.store = store
+        self.lifetime_seconds = lifetime_seconds
+        self.cache_size = cache_size
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self.touch_interval_seconds = touch_interval_seconds
+        self.flush_interval_seconds = flush_interval_seconds
+        self._sessions: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = (
+            OrderedDict()
+        )
+        self._touches: Set[str] = set()
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    def start(self) -> None:
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def read_token(self, credentials: str) -> Optional[Dict[str, Any]]:
+        # Leave the tokens of other backends alone, without a query
+        if not credentials.startswith(self.store.token_prefix):
+            return None
+
+        digest = self.store.digest(credentials)
+        session = self._get_cached(digest)
+        if session is None:
+            row = await self.store.get(digest)
+            if row is None:
+                return None
+            session = self._make_session(row)
+            self._set_cached(digest, session)
+
+        now = datetime.utcnow()
+        if session["expires_at"] <= now:
+            self._sessions.pop(digest, None)
+            return None
+        if now - session["last_seen_at"] >= timedelta(
+            seconds=self.touch_interval_seconds
+        ):
+            session["last_seen_at"] = now
+            session["expires_at"] = now + timedelta(seconds=self.lifetime_seconds)
+            self._touches.add(digest)
+
+        return {
+            "user_id": str(session["user_id"]),
+            "session_id": session["id"],
+            "iat": (session["created_at"] - datetime(1970, 1, 1)).total_seconds(),
+        }
+
+    async def get_user(
+        self, data: Dict[str, Any], user_db: BaseUserDatabase
+    ) -> Optional[BaseUserDB]:
+        return await user_db.get(UUID4(data["user_id"]))
+
+    async def get_login_response(self, user: BaseUserDB, response: Response) -> Any:
+        token = await self.store.create(user.id, self.lifetime_seconds)
+        return {"access_token": token, "token_type": "bearer"}
+
+    async def get_logout_response(self, user: BaseUserDB, response: Response) -> Any:
+        return None
+
+    async def revoke_token(self, data: Dict[str, Any]) -> None:
+        await self.close_sessions(UUID4(data["user_id"]), data["session_id"])
+
+    async def get_sessions(self, user_id: UUID4) -> List[Dict[str, Any]]:
+        """List the open sessions of a user."""
+        rows = await self.store.get_by_user(user_id)
+        return [self._make_session(row) for row in rows]
+
+    async def close_sessions(
+        self, user_id: UUID4, session_id: Optional[UUID4] = None
+    ) -> int:
+        """
+        Close a session of a user, or all of them.
+
+        :return: The number of closed sessions.
+        """
+        digests = await self.store.delete(user_id, session_id)
+        for digest in digests:
+            self._sessions.pop(digest, None)
+            self._touches.discard(digest)
+        return len(digests)
+
+    async def flush(self) -> None:
+        """Save the queued sliding expirations."""
+        if not self._touches:
+            return
+        touches, self._touches = self._touches, set()
+        await self.store.touch_many(
+            list(touches), datetime.utcnow(), self.lifetime_seconds
+        )
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval_seconds)
+            try:
+                await self.flush()
+            except Exception:
+                # A lost update only shortens the sessions
+                logger.exception("Cannot save the last use of sessions")
+
+    def _get_cached(self, digest: str) -> Optional[Dict[str, Any]]:
+        entry = self._sessions.get(digest)
+        if entry is None:
+            return None
+        expires_at, session = entry
+        if expires_at <= time.monotonic():
+            del self._sessions[digest]
+            return None
+        self._sessions.move_to_end(digest)
+        return session
+
+    def _set_cached(self, digest: str, session: Dict[str, Any]) -> None:
+        self._sessions[digest] = (time.monotonic() + self.cache_ttl_seconds, session)
+        self._sessions.move_to_end(digest)
+        while len(self._sessions) > self.cache_size:
+            self._sessions.popitem(last=False)
+
+    def _make_session(self, row: Mapping[str, Any]) -> Dict[str, Any]:
+        return {
+            "id": row["id"],
+            "user_id": row["user_id"],
+            "created_at": row["created_at"],
+            "last_seen_at": row["last_seen_at"],
+            "expires_at": row["expires_at"],
+        }
@@ -0,0 +1,258 @@
+import base64
+import os
+import secrets
+import time
+from typing import Any, Dict, List, Tuple
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+
+from app.utils import generate_jwt
+
+KEY_ALGORITHMS = ("RS256", "ES256", "EdDSA")
+KEY_FILE_SUFFIX = ".pem"
+
+
+class UnknownKeyError(jwt.InvalidTokenError):
+    """The token was signed by a key missing from the key ring."""
+
+    pass
+
+
+class SigningKey:
+    """
+    Private key of a key ring.
+
+    The key id starts with the creation timestamp of the key,
+    so that every process of the service orders the keys the same way.
+
+    :param kid: Key id, sent in the `kid` header of the tokens.
+    :param private_key: Private key object.
+    :param created_at: Creation timestamp of the key.
+    """
+
+    kid: str
+    private_key: Any
+    public_key: Any
+    created_at: float
+
+    def __init__(self, kid: str, private_key: Any, created_at: float):
+        self.kid = kid
+        self.private_key = private_key
+        self.public_key = private_key.public_key()
+        self.created_at = created_at
+
+
+def generate_private_key(algorithm: str) -> bytes:
+    """Generate a private key for the algorithm, serialized in PEM format."""
+    if algorithm == "RS256":
+        key: Any = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    elif algorithm == "ES256":
+        key = ec.generate_private_key(ec.SECP256R1())
+    elif algorithm == "EdDSA":
+        key = ed25519.Ed25519PrivateKey.generate()
+    else:
+        raise ValueError(f"Unsupported algorithm {algorithm}")
+    return key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+
+
+def get_public_jwk(public_key: Any) -> Dict[str, Any]:
+    """Represent a public key as a JSON Web Key."""
+    if isinstance(public_key, rsa.RSAPublicKey):
+        numbers = public_key.public_numbers()
+        return {"kty": "RSA", "n": _b64_uint(numbers.n), "e": _b64_uint(numbers.e)}
+    if isinstance(public_key, ec.EllipticCurvePublicKey):
+        numbers = public_key.public_numbers()
+        return {
+            "kty": "EC",
+            "crv": "P-256",
+            "x": _b64_uint(numbers.x, 32),
+            "y": _b64_uint(numbers.y, 32),
+        }
+    raw = public_key.public_bytes(
+        serialization.Encoding.Raw, serialization.PublicFormat.Raw
+    )
+    return {"kty": "OKP", "crv": "Ed25519", "x": _b64(raw)}
+
+
+def _b64(value: bytes) -> str:
+    return base64.urlsafe_b64encode(value).rstrip(b"=").decode()
+
+
+def _b64_uint(value: int, length: int = 0) -> str:
+    return _b64(value.to_bytes(max(length, (value.bit_length() + 7) // 8), "big"))
+
+
+class KeyRing:
+    """
+    Rotating set of asymmetric keys signing the tokens.
+
+    Keys are PEM private keys stored in a directory, one `<kid>.pem` file per
+    key, shared by every process of the service. A new key is published
+    right away, but only signs tokens after `activation_delay_seconds`,
+    so that the verifiers caching the JWKS learn about it first. The previous
+    key is still published for `overlap_seconds` after being superseded,
+    so that the tokens it signed stay valid until they expire.
+
+    The directory is checked for new keys every `reload_interval_seconds`.
+
+    :param directory: Directory of the PEM files.
+    :param algorithm: Signing algorithm, one of RS256, ES256 or EdDSA.
+    :param activation_delay_seconds: Delay before a new key signs tokens.
+    :param overlap_seconds: Delay before a superseded key is retired.
+    It should be at least the lifetime of the tokens.
+    :param reload_interval_seconds: Interval between checks of the directory.
+    """
+
+    directory: str
+    algorithm: str
+    activation_delay_seconds: int
+    overlap_seconds: int
+    reload_interval_seconds: int
+
+    def __init__(
+        self,
+        directory: str,
+        algorithm: str = "RS256",
+        activation_delay_seconds: int = 600,
+        overlap_seconds: int = 3600,
+        reload_interval_seconds: int = 60,
+    ):
+        if algorithm not in KEY_ALGORITHMS:
+            raise ValueError(f"Unsupported algorithm {algorithm}")
+        self.directory = directory
+        self.algorithm = algorithm
+        self.activation_delay_seconds = activation_delay_seconds
+        self.overlap_seconds = overlap_seconds
+        self.reload_interval_seconds = reload_interval_seconds
+        self._keys: List[SigningKey] = []
+        self._files: List[Tuple[str, float]] = []
+        self._next_reload_at = 0.0
+
+    @property
+    def keys(self) -> List[SigningKey]:
+        """Keys not retired yet, from the oldest to the newest."""
+        self._reload_if_changed()
+        now = time.time()
+        retired = 0
+        for i, key in enumerate(self._keys):
+            if self._activates_at(key) + self.overlap_seconds <= now:
+                retired = i
+        return self._keys[retired:]
+
+    @property
+    def signing_key(self) -> SigningKey:
+        """Newest active key; the oldest key if none is active yet."""
+        keys = self.keys
+        if not keys:
+            raise RuntimeError(f"No key in {self.directory}")
+        now = time.time()
+        for key in reversed(keys):
+            if self._activates_at(key) <= now:
+                return key
+        return keys[0]
+
+    def get_public_key(self, kid: str) -> Any:
+        for key in self.keys:
+            if key.kid == kid:
+                return key.public_key
+        raise UnknownKeyError(kid)
+
+    def encode(self, data: dict, lifetime_seconds: int) -> str:
+        """Sign a token with the current key."""
+        key = self.signing_key
+        return generate_jwt(
+            data,
+            lifetime_seconds,
+            key.private_key,
+            self.algorithm,
+            headers={"kid": key.kid},
+        )
+
+    def decode(self, token: str, audience: str) -> Dict[str, Any]:
+        """
+        Verify a token signed by any key of the ring.
+
+        :raises jwt.PyJWTError: The token is invalid.
+        """
+        kid = jwt.get_unverified_header(token).get("kid")
+        if not isinstance(kid, str):
+            raise UnknownKeyError(kid)
+        return jwt.decode(
+            token,
+            self.get_public_key(kid),
+            audience=audience,
+            algorithms=[self.algorithm],
+        )
+
+    def jwks(self) -> Dict[str, Any]:
+        """Public keys of the ring, as a JSON Web Key Set."""
+        return {
+            "keys": [
+                {
+                    **get_public_jwk(key.public_key),
+                    "kid": key.kid,
+                    "alg": self.algorithm,
+                    "use": "sig",
+                }
+                for key in self.keys
+            ]
+        }
+
+    def rotate(self) -> str:
+        """
+        Add a new key to the directory and delete the retired ones.
+
+        :return: Id of the new key.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        kid = f"{int(time.time())}-{secrets.token_hex(4)}"
+        path = os.path.join(self.directory, kid + KEY_FILE_SUFFIX)
+        fd = os.open(f"{path}.tmp", os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "wb") as file:
+            file.write(generate_private_key(self.algorithm))
+        os.replace(f"{path}.tmp", path)
+
+        self._next_reload_at = 0.0
+        kept = {key.kid for key in self.keys}
+        for key in self._keys:
+            if key.kid not in kept:
+                os.remove(os.path.join(self.directory, key.kid + KEY_FILE_SUFFIX))
+        return kid
+
+    def _activates_at(self, key: SigningKey) -> float:
+        return key.created_at + self.activation_delay_seconds
+
+    def _reload_if_changed(self) -> None:
+        now = time.monotonic()
+        if now < self._next_reload_at:
+            return
+        self._next_reload_at = now + self.reload_interval_seconds
+
+        files = sorted(
+            (entry.name, entry.stat().st_mtime)
+            for entry in os.scandir(self.directory)
+            if entry.name.endswith(KEY_FILE_SUFFIX)
+        )
+        if files == self._files:
+            return
+
+        keys = []
+        for name, mtime in files:
+            kid = name[: -len(KEY_FILE_SUFFIX)]
+            with open(os.path.join(self.directory, name), "rb") as file:
+                private_key = serialization.load_pem_private_key(
+                    file.read(), password=None
+                )
+            try:
+                created_at = float(kid.split("-", 1)[0])
+            except ValueError:
+                created_at = mtime
+            keys.append(SigningKey(kid, private_key, created_at))
+        self._keys = sorted(keys, key=lambda key: key.created_at)
+        self._files = files
@@ -0,0 +1,158 @@
+import asyncio
+import hashlib
+import logging
+import math
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from pydantic import UUID4
+
+from app.crud.crud_revocation import SQLAlchemyRevocationStore
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """
+    Probabilistic set of strings, without false negatives.
+
+    :param capacity: Expected number of items.
+    :param error_rate: False positive rate at capacity.
+    """
+
+    size: int
+    hash_count: int
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        capacity = max(capacity, 1)
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+
+class TokenRevocationList:
+    """
+    Revocation checks of authentication tokens, without a query per request.
+
+    Revoked `jti` are kept in a bloom filter and the user cutoffs in a dict,
+    both rebuilt from the store every `sync_interval_seconds`. Only a token
+    whose `jti` may be in the filter is checked against the store.
+    Revocations made by other processes are seen after the next sync.
+
+    :param store: Revocation store instance.
+    :param max_token_age_seconds: Lifetime of the longest-lived tokens;
+    older cutoffs are not loaded.
+    :param sync_interval_seconds: Delay between two syncs.
+    :param capacity: Expected number of revoked tokens not expired yet.
+    :param error_rate: False positive rate of the bloom filter at capacity.
+    """
+
+    store: SQLAlchemyRevocationStore
+    max_token_age_seconds: int
+    sync_interval_seconds: float
+    capacity: int
+    error_rate: float
+
+    def __init__(
+        self,
+        store: SQLAlchemyRevocationStore,
+        max_token_age_seconds: int,
+        sync_interval_seconds: float = 10.0,
+        capacity: int = 100000,
+        error_rate: float = 0.001,
+    ):
+        self.store = store
+        self.max_token_age_seconds = max_token_age_seconds
+        self.sync_interval_seconds = sync_interval_seconds
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._revoked_tokens = BloomFilter(capacity, error_rate)
+        self._cutoffs: Dict[UUID4, float] = {}
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    def start(self) -> None:
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def is_revoked(self, data: Dict[str, Any]) -> bool:
+        """Whether the token holding this verified data is revoked."""
+        jti = data.get("jti")
+        if jti is not None and jti in self._revoked_tokens:
+            if await self.store.is_token_revoked(jti):
+                return True
+
+        user_id = data.get("user_id")
+        if user_id is not None and self._cutoffs:
+            try:
+                cutoff = self._cutoffs.get(UUID4(user_id))
+            except ValueError:
+                return False
+            if cutoff is not None and data.get("iat", 0) < cutoff:
+                return True
+
+        return False
+
+    async def revoke_token(self, data: Dict[str, Any]) -> None:
+        """Revoke a token from its verified data, until it expires."""
+        jti = data.get("jti")
+        exp = data.get("exp")
+        if jti is None or exp is None:
+            return
+        await self.store.revoke_token(jti, datetime.utcfromtimestamp(exp))
+        self._revoked_tokens.add(jti)
+
+    async def revoke_user(self, user_id: UUID4) -> None:
+        """Revoke every token of a user issued before the current second."""
+        # Tokens hold their issue time in whole seconds
+        now = datetime.utcnow().replace(microsecond=0)
+        await self.store.set_cutoff(user_id, now)
+        self._cutoffs[user_id] = self._timestamp(now)
+
+    async def sync(self) -> None:
+        """Reload the revocations from the store."""
+        revoked_tokens = BloomFilter(self.capacity, self.error_rate)
+        async for jti in self.store.iterate_revoked_tokens():
+            revoked_tokens.add(jti)
+        since = datetime.utcnow() - timedelta(seconds=self.max_token_age_seconds)
+        cutoffs = await self.store.get_cutoffs(since)
+
+        self._revoked_tokens = revoked_tokens
+        self._cutoffs = {
+            user_id: self._timestamp(not_before)
+            for user_id, not_before in cutoffs.items()
+        }
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.sync()
+            except Exception:
+                logger.exception("Cannot sync the token revocations, retrying")
+            await asyncio.sleep(self.sync_interval_seconds)
+
+    def _timestamp(self, value: datetime) -> float:
+        return (value - datetime(1970, 1, 1)).total_seconds()
@@ -0,0 +1,209 @@
+import asyncio
+import csv
+import json
+from itertools import islice
+from typing import (IO, Any, Callable, Dict, Iterable, Iterator, List,
+                    Optional, Type)
+
+from pydantic import ValidationError
+
+from app.crud.base import BaseUserDatabase
+from app.schemes import user as models
+from app.security import PasswordHasher
+
+EXPORTED_FIELDS = (
+    "id",
+    "email",
+    "hashed_password",
+    "is_active",
+    "is_superuser",
+    "is_verified",
+)
+BOOLEAN_FIELDS = ("is_active", "is_superuser", "is_verified")
+
+
+class UnknownFormatError(Exception):
+    pass
+
+
+class ImportProgress:
+    """
+    Progress of a bulk import.
+
+    :param processed: Number of records already processed by a previous run.
+    """
+
+    processed: int
+    created: int
+    duplicates: int
+    invalid: int
+
+    def __init__(self, processed: int = 0):
+        self.processed = processed
+        self.created = 0
+        self.duplicates = 0
+        self.invalid = 0
+
+    def __str__(self) -> str:
+        return (
+            f"processed={self.processed} created={self.created} "
+            f"duplicates={self.duplicates} invalid={self.invalid}"
+        )
+
+
+def get_format(path: str, format: Optional[str] = None) -> str:
+    """Return the explicit format, or guess it from the file extension."""
+    format = format or path.rsplit(".", 1)[-1].lower()
+    if format not in ("csv", "jsonl"):
+        raise UnknownFormatError(format)
+    return format
+
+
+def read_records(file: IO[str], format: str) -> Iterator[Dict[str, Any]]:
+    """Stream user records from a CSV or JSON Lines file."""
+    if format == "csv":
+        for row in csv.DictReader(file):
+            record: Dict[str, Any] = {k: v for k, v in row.items() if v != ""}
+            for field in BOOLEAN_FIELDS:
+                if field in record:
+                    record[field] = record[field].lower() in ("1", "true", "yes")
+            yield record
+    else:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+async def export_users(
+    user_db: BaseUserDatabase[models.BaseUserDB],
+    file: IO[str],
+    format: str,
+    on_progress: Optional[Callable[[int], None]] = None,
+    progress_every: int = 10000,
+) -> int:
+    """
+    Stream all the users to a CSV or JSON Lines file.
+
+    :param on_progress: Optional function called with the number
+    of exported users every `progress_every` users.
+    :return: The number of exported users.
+    """
+    if format == "csv":
+        writer = csv.DictWriter(file, fieldnames=EXPORTED_FIELDS)
+        writer.writeheader()
+        write = writer.writerow
+    else:
+
+        def write(record: Dict[str, Any]) -> None:
+            file.write(json.dumps(record, default=str) + "\n")
+
+    exported = 0
+    async for user in user_db.iterate():
+        write(user.dict(include=set(EXPORTED_FIELDS)))
+        exported += 1
+        if on_progress and exported % progress_every == 0:
+            on_progress(exported)
+    return exported
+
+
+async def import_users(
+    user_db: BaseUserDatabase[models.BaseUserDB],
+    user_create_model: Type[models.BaseUserCreate],
+    user_db_model: Type[models.BaseUserDB],
+    records: Iterable[Dict[str, Any]],
+    chunk_size: int = 1000,
+    processes: int = 4,
+    progress: Optional[ImportProgress] = None,
+    on_chunk: Optional[Callable[[ImportProgress], None]] = None,
+) -> ImportProgress:
+    """
+    Import users from a stream of records, chunk by chunk.
+
+    A record either has a plain `password`, hashed in parallel processes,
+    or a `hashed_password`, as produced by `export_users`. Records whose email
+    is already used, in the database or earlier in the chunk, are skipped.
+
+    Each chunk is inserted in a single transaction. To resume an interrupted
+    import, pass the progress of the last completed chunk: the records it
+    already processed are skipped.
+
+    :param on_chunk: Optional function called with the progress
+    after each inserted chunk.
+    """
+    progress = progress or ImportProgress()
+    records = iter(records)
+    for _ in islice(records, progress.processed):
+        pass
+
+    hasher = PasswordHasher(
+        max_workers=processes, max_queue_size=chunk_size, use_processes=True
+    )
+    try:
+        while True:
+            chunk = list(islice(records, chunk_size))
+            if not chunk:
+                break
+            users = await _make_users(
+                chunk, user_create_model, user_db_model, hasher, progress
+            )
+            if users:
+                existing_emails = await user_db.get_existing_emails(
+                    [user.email for user in users]  # type: ignore
+                )
+                new_users = [
+                    user
+                    for user in users
+                    if user.email.lower() not in existing_emails  # type: ignore
+                ]
+                progress.duplicates += len(users) - len(new_users)
+                if new_users:
+                    await user_db.create_many(new_users)
+                progress.created += len(new_users)
+            progress.processed += len(chunk)
+            if on_chunk:
+                on_chunk(progress)
+    finally:
+        hasher.shutdown()
+
+    return progress
+
+
+async def _make_users(
+    chunk: List[Dict[str, Any]],
+    user_create_model: Type[models.BaseUserCreate],
+    user_db_model: Type[models.BaseUserDB],
+    hasher: PasswordHasher,
+    progress: ImportProgress,
+) -> List[models.BaseUserDB]:
+    seen_emails = set()
+    users: List[models.BaseUserDB] = []
+    passwords: List[Optional[str]] = []
+
+    for record in chunk:
+        try:
+            if "hashed_password" in record:
+                user = user_db_model(**record)
+                password = None
+            else:
+                user_create = user_create_model(**record)
+                user_dict = user_create.create_update_dict_superuser()
+                user = user_db_model(**user_dict, hashed_password="")
+                password = user_create.password
+        except ValidationError:
+            progress.invalid += 1
+            continue
+
+        email = user.email.lower()  # type: ignore
+        if email in seen_emails:
+            progress.duplicates += 1
+            continue
+        seen_emails.add(email)
+        users.append(user)
+        passwords.append(password)
+
+    to_hash = [(u, p) for u, p in zip(users, passwords) if p is not None]
+    hashed_passwords = await asyncio.gather(*(hasher.hash(p) for _, p in to_hash))
+    for (user, _), hashed_password in zip(to_hash, hashed_passwords):
+        user.hashed_password = hashed_password
+
+    return users
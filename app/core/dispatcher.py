@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+Job = Tuple[Callable, Tuple[Any, ...], Dict[str, Any]]
+F = TypeVar("F", bound=Callable)
+
+
+def inline(handler: F) -> F:
+    """
+    Mark a hook to always run in the request, even with a dispatcher.
+
+    For the hooks enforcing security, such as revoking the tokens of a user,
+    which must be done before the response, and fail it when they fail.
+    """
+    handler.run_inline = True  # type: ignore
+    return handler
+
+
+class HookMetrics:
+    """Latency and outcome counters of a hook."""
+
+    calls: int
+    failures: int
+    dead_letters: int
+    seconds_total: float
+    seconds_max: float
+
+    def __init__(self):
+        self.calls = 0
+        self.failures = 0
+        self.dead_letters = 0
+        self.seconds_total = 0.0
+        self.seconds_max = 0.0
+
+    @property
+    def seconds_avg(self) -> float:
+        return self.seconds_total / self.calls if self.calls else 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.calls += 1
+        self.seconds_total += seconds
+        self.seconds_max = max(self.seconds_max, seconds)
+
+
+class HookDispatcher:
+    """
+    Run hooks in the background, off the request path.
+
+    A fixed set of workers consumes a bounded queue of hook calls.
+    Failing calls are retried with an exponential backoff, then logged
+    as dead letters.
+
+    :param concurrency: Number of hooks running at the same time.
+    :param queue_size: Maximum number of hook calls waiting for a worker.
+    Submitting waits for room in the queue when it is full.
+    :param max_retries: Number of retries of a failing hook call.
+    :param backoff_seconds: Delay before the first retry, doubled on each retry.
+    """
+
+    concurrency: int
+    queue_size: int
+    max_retries: int
+    backoff_seconds: float
+    metrics: Dict[str, HookMetrics]
+
+    def __init__(
+        self,
+        concurrency: int = 8,
+        queue_size: int = 1000,
+        max_retries: int = 3,
+        backoff_seconds: float = 0.5,
+    ):
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.metrics = {}
+        self._queue: Optional["asyncio.Queue[Job]"] = None
+        self._workers: List["asyncio.Task[None]"] = []
+
+    def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._workers = [
+            asyncio.ensure_future(self._work()) for _ in range(self.concurrency)
+        ]
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        """Wait for the submitted hook calls, then stop the workers."""
+        if self._queue is not None:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.error("Dropping %d pending hook calls", self._queue.qsize())
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+    async def submit(self, handler: Callable, *args: Any, **kwargs: Any) -> None:
+        """Schedule a hook call."""
+        if self._queue is None:
+            raise RuntimeError("Hook dispatcher is not started")
+        await self._queue.put((handler, args, kwargs))
+
+    async def _work(self) -> None:
+        assert self._queue is not None
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job) -> None:
+        handler, args, kwargs = job
+        name = getattr(handler, "__qualname__", repr(handler))
+        metrics = self.metrics.setdefault(name, HookMetrics())
+
+        for attempt in range(self.max_retries + 1):
+            started_at = time.perf_counter()
+            try:
+                if asyncio.iscoroutinefunction(handler):
+                    await handler(*args, **kwargs)
+                else:
+                    handler(*args, **kwargs)
+                return
+            except Exception:
+                metrics.failures += 1
+                if attempt == self.max_retries:
+                    metrics.dead_letters += 1
+                    # The arguments hold secrets, such as tokens and hashes:
+                    # only the user id identifies the call
+                    user_id = getattr(args[0], "id", None) if args else None
+                    logger.exception(
+                        "Dead letter: hook %s failed %d times for user %s",
+                        name,
+                        attempt + 1,
+                        user_id,
+                    )
+                    return
+                logger.warning("Hook %s failed, retrying", name, exc_info=True)
+            finally:
+                metrics.observe(time.perf_counter() - started_at)
+            await asyncio.sleep(self.backoff_seconds * 2 ** attempt)
@@ -0,0 +1,236 @@
+"""
+Prometheus metrics of the service.
+
+Metrics are recorded in the default registry of `prometheus_client`, and
+are no-ops when it is not installed. The counters kept by the components
+themselves, such as the hasher or the caches, are read at scrape time.
+"""
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+try:
+    from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, Counter,
+                                   Histogram, generate_latest)
+    from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+    METRICS_AVAILABLE = True
+except ModuleNotFoundError:  # pragma: no cover
+    METRICS_AVAILABLE = False
+
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Buckets of operations taking microseconds, such as the JWT operations
+FAST_BUCKETS = (
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.1,
+)
+
+Samples = Iterable[Tuple[Sequence[str], float]]
+
+# Collectors registered by `register_stats`, by metric name
+_stats_collectors: Dict[str, Any] = {}
+
+
+class NoopMetric:
+    """Stands for a metric when `prometheus_client` is not installed."""
+
+    def labels(self, *labelvalues: str) -> "NoopMetric":
+        return self
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+    def observe(self, amount: float) -> None:
+        pass
+
+    def time(self) -> "NoopMetric":
+        return self
+
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, *args: Any) -> None:
+        pass
+
+
+def histogram(
+    name: str,
+    documentation: str,
+    labelnames: Sequence[str] = (),
+    buckets: Optional[Sequence[float]] = None,
+) -> Any:
+    if not METRICS_AVAILABLE:
+        return NoopMetric()
+    if buckets is None:
+        return Histogram(name, documentation, labelnames)
+    return Histogram(name, documentation, labelnames, buckets=buckets)
+
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Any:
+    if not METRICS_AVAILABLE:
+        return NoopMetric()
+    return Counter(name, documentation, labelnames)
+
+
+request_seconds = histogram(
+    "http_request_duration_seconds",
+    "Latency of the HTTP requests.",
+    ("method", "route", "status"),
+)
+password_hash_seconds = histogram(
+    "auth_password_hash_duration_seconds",
+    "Duration of the password hashing jobs, once they have a worker.",
+    ("operation",),
+)
+password_hash_queue_wait_seconds = histogram(
+    "auth_password_hash_queue_wait_seconds",
+    "Time the password hashing jobs waited for a free worker.",
+)
+db_query_seconds = histogram(
+    "auth_db_query_duration_seconds",
+    "Duration of the user database queries.",
+    ("operation",),
+)
+jwt_seconds = histogram(
+    "auth_jwt_duration_seconds",
+    "Duration of the JWT encodings and decodings.",
+    ("operation",),
+    buckets=FAST_BUCKETS,
+)
+auth_results = counter(
+    "auth_results",
+    "Outcomes of the supplied credentials: hit when they yield a user, "
+    "miss when their user is not found, invalid when they are rejected.",
+    ("backend", "outcome"),
+)
+publish_seconds = histogram(
+    "auth_publish_duration_seconds",
+    "Duration of the publications of a batch of messages to the broker, "
+    "until confirmed.",
+)
+
+
+class StatsCollector:
+    """
+    Expose counters kept by the service components, read at scrape time.
+
+    :param name: Name of the metric.
+    :param documentation: Help text of the metric.
+    :param labelnames: Names of the labels.
+    :param read: Callable returning the label values and value of each sample.
+    :param kind: Either "gauge" or "counter".
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        read: Callable[[], Samples],
+        kind: str = "gauge",
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.read = read
+        self.kind = kind
+
+    def collect(self) -> Iterable[Any]:
+        if self.kind == "counter":
+            family: Any = CounterMetricFamily(
+                self.name, self.documentation, labels=self.labelnames
+            )
+        else:
+            family = GaugeMetricFamily(
+                self.name, self.documentation, labels=self.labelnames
+            )
+        for labelvalues, value in self.read():
+            family.add_metric(list(labelvalues), value)
+        yield family
+
+
+def register_stats(
+    name: str,
+    documentation: str,
+    labelnames: Sequence[str],
+    read: Callable[[], Samples],
+    kind: str = "gauge",
+) -> None:
+    """
+    Expose counters of a component, see `StatsCollector`.
+
+    Registering a name again replaces its collector, e.g. when the app
+    starts again in the same process.
+    """
+    if not METRICS_AVAILABLE:
+        return
+    previous = _stats_collectors.pop(name, None)
+    if previous is not None:
+        REGISTRY.unregister(previous)
+    collector = StatsCollector(name, documentation, labelnames, read, kind)
+    REGISTRY.register(collector)
+    _stats_collectors[name] = collector
+
+
+class MetricsMiddleware:
+    """
+    Observe the latency of the HTTP requests, by route template.
+
+    Plain ASGI middleware, without the overhead of `BaseHTTPMiddleware`.
+    Requests matching no route are labelled "unmatched", so that scanners
+    can't blow up the number of series.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._route_paths: Optional[Dict[Any, str]] = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started_at = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_seconds.labels(
+                scope["method"], self._get_route(scope), str(status_code)
+            ).observe(time.perf_counter() - started_at)
+
+    def _get_route(self, scope: Scope) -> str:
+        # The router sets the endpoint of the matched route in the scope
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self._route_paths is None:
+            self._route_paths = {}
+            for route in scope["app"].routes:
+                self._route_paths.setdefault(
+                    getattr(route, "endpoint", None), route.path
+                )
+        return self._route_paths.get(endpoint, "unmatched")
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    return Response(
+        generate_latest(REGISTRY), headers={"Content-Type": CONTENT_TYPE_LATEST}
+    )
@@ -0,0 +1,65 @@
+import asyncio
+import logging
+from typing import Optional
+
+from app.core.publisher import Publisher
+from app.crud.crud_outbox import SQLAlchemyOutbox
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxRelay:
+    """
+    Background task moving outbox messages to the broker.
+
+    Delivery is at-least-once: a message is removed from the outbox
+    only after the broker confirmed it.
+
+    :param outbox: Outbox instance.
+    :param publisher: Publisher instance.
+    :param batch_size: Maximum number of messages published at once.
+    :param interval_seconds: Delay between polls of an empty outbox.
+    """
+
+    outbox: SQLAlchemyOutbox
+    publisher: Publisher
+    batch_size: int
+    interval_seconds: float
+
+    def __init__(
+        self,
+        outbox: SQLAlchemyOutbox,
+        publisher: Publisher,
+        batch_size: int = 100,
+        interval_seconds: float = 1.0,
+    ):
+        self.outbox = outbox
+        self.publisher = publisher
+        self.batch_size = batch_size
+        self.interval_seconds = interval_seconds
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    def start(self) -> None:
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                published = await self.outbox.drain(
+                    self.publisher.publish_many, self.batch_size
+                )
+            except Exception:
+                # Keep relaying once the broker or the database is back
+                logger.exception("Cannot relay outbox messages, retrying")
+                published = 0
+            if published < self.batch_size:
+                await asyncio.sleep(self.interval_seconds)
@@ -9,7 +9,7 @@ from pydantic import EmailStr
 
 from app.crud.base import BaseUserDatabase
 from app.schemes import user
-from app.security import get_password_hash
+from app.security import password_hasher
 
 
 class UserAlreadyExists(Exception):
@@ -50,7 +50,7 @@ def get_create_user(
         if existing_user is not None:
             raise UserAlreadyExists()
 
-        hashed_password = get_password_hash(user.password)
+        hashed_password = await password_hasher.hash(user.password)
         user_dict = (
             user.create_update_dict() if safe else user.create_update_dict_superuser()
         )
@@ -0,0 +1,226 @@
+import asyncio
+import json
+import logging
+from typing import (Any, Awaitable, Callable, Dict, List, Optional, Sequence,
+                    Tuple)
+
+import aio_pika
+from aio_pika.exceptions import AMQPException
+from aio_pika.pool import Pool
+
+from app.core.metrics import publish_seconds
+from app.core.tracing import inject_context, span
+
+logger = logging.getLogger(__name__)
+
+PUBLISH_ERRORS = (AMQPException, ConnectionError, asyncio.TimeoutError)
+
+OutgoingMessage = Tuple[str, Any]
+# Message with its JSON-encoded body and its headers, holding the trace
+# context of the publisher
+BufferedMessage = Tuple[str, bytes, Dict[str, Any]]
+
+
+class PublisherBufferFull(Exception):
+    """
+    The publisher buffer is full.
+
+    Raised instead of buffering a message when the broker can't keep up.
+    """
+
+    pass
+
+
+class Publisher:
+    """
+    Asynchronous RabbitMQ publisher.
+
+    Messages are buffered in memory and published in batches by a background
+    task, over a pool of channels with publisher confirms. The connection is
+    opened on `start` and re-established automatically when lost.
+
+    :param url: AMQP URL of the broker.
+    :param routing_key: Routing key of the published messages.
+    :param pool_size: Number of channels used to publish concurrently.
+    :param buffer_size: Maximum number of messages waiting to be published.
+    :param batch_size: Maximum number of messages published at once.
+    :param retry_delay_seconds: Delay before retrying a failed batch.
+    :param connect: Optional coroutine function opening the connection,
+    for instance to an in-process fake broker.
+    """
+
+    url: str
+    routing_key: str
+    pool_size: int
+    buffer_size: int
+    batch_size: int
+    retry_delay_seconds: float
+
+    def __init__(
+        self,
+        url: str,
+        routing_key: str,
+        pool_size: int = 4,
+        buffer_size: int = 10000,
+        batch_size: int = 100,
+        retry_delay_seconds: float = 1.0,
+        connect: Optional[Callable[[str], Awaitable[Any]]] = None,
+    ):
+        self.url = url
+        self.routing_key = routing_key
+        self.pool_size = pool_size
+        self.buffer_size = buffer_size
+        self.batch_size = batch_size
+        self.retry_delay_seconds = retry_delay_seconds
+        self._connect = connect or aio_pika.connect_robust
+        self._connection: Optional[Any] = None
+        self._channels: Optional[Pool] = None
+        self._buffer: Optional["asyncio.Queue[BufferedMessage]"] = None
+        self._flush_task: Optional["asyncio.Task[None]"] = None
+
+    async def start(self) -> None:
+        """Connect to the broker and start publishing buffered messages."""
+        self._buffer = asyncio.Queue(maxsize=self.buffer_size)
+        self._flush_task = asyncio.ensure_future(self._flush_loop())
+        try:
+            await self._get_channels()
+        except PUBLISH_ERRORS:
+            logger.exception("Cannot connect to the broker, will retry on publish")
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Publish buffered messages, then close the connection."""
+        if self._buffer is not None and self._flush_task is not None:
+            try:
+                await asyncio.wait_for(self._buffer.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.error("Dropping %d unpublished messages", self._buffer.qsize())
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        if self._channels is not None:
+            await self._channels.close()
+            self._channels = None
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+
+    async def publish(self, method: str, body: Any) -> None:
+        """
+        Buffer a message to be published.
+
+        Return once the message is buffered, not once the broker confirmed it.
+        The message headers hold the current trace context.
+
+        :raises TypeError: The body can't be encoded to JSON.
+        """
+        if self._buffer is None:
+            raise RuntimeError("Publisher is not started")
+        with span("publish", {"messaging.operation": method}):
+            # Encoded now, so that the caller gets the error, not the flush task
+            message = (method, json.dumps(body).encode(), inject_context({}))
+            try:
+                self._buffer.put_nowait(message)
+            except asyncio.QueueFull:
+                raise PublisherBufferFull()
+
+    async def publish_many(
+        self,
+        messages: Sequence[OutgoingMessage],
+        headers: Optional[Sequence[Dict[str, Any]]] = None,
+    ) -> None:
+        """
+        Publish messages right away and wait for the broker confirms.
+
+        :param messages: Messages to publish.
+        :param headers: Optional headers of each message.
+        By default, the headers hold the current trace context.
+        """
+        with span("publish_many", {"messaging.batch.message_count": len(messages)}):
+            if headers is None:
+                headers = [inject_context({}) for _ in messages]
+            await self._publish_encoded(
+                [
+                    (method, json.dumps(body).encode(), message_headers)
+                    for (method, body), message_headers in zip(messages, headers)
+                ]
+            )
+
+    async def _publish_encoded(self, messages: Sequence[BufferedMessage]) -> None:
+        channels = await self._get_channels()
+
+        async def publish_one(
+            method: str, body: bytes, headers: Dict[str, Any]
+        ) -> None:
+            message = aio_pika.Message(
+                body,
+                content_type=method,
+                delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+                headers=headers,
+            )
+            async with channels.acquire() as channel:
+                await channel.default_exchange.publish(
+                    message, routing_key=self.routing_key
+                )
+
+        with publish_seconds.time():
+            await asyncio.gather(*(publish_one(*message) for message in messages))
+
+    async def _get_channels(self) -> Pool:
+        if self._channels is None:
+            if self._connection is None:
+                self._connection = await self._connect(self.url)
+
+            async def open_channel() -> Any:
+                return await self._connection.channel(  # type: ignore
+                    publisher_confirms=True
+                )
+
+            self._channels = Pool(open_channel, max_size=self.pool_size)
+        return self._channels
+
+    async def _flush_loop(self) -> None:
+        assert self._buffer is not None
+        while True:
+            batch: List[BufferedMessage] = [await self._buffer.get()]
+            while len(batch) < self.batch_size and not self._buffer.empty():
+                batch.append(self._buffer.get_nowait())
+
+            try:
+                await self._publish_batch(batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Rejected by the client library rather than the broker being
+                # unavailable, such as invalid headers: find and drop the
+                # faulty messages, without ending the task. Delivery is
+                # at-least-once, the others may be published twice
+                logger.exception("Cannot publish %d messages", len(batch))
+                for message in batch:
+                    try:
+                        await self._publish_batch([message])
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception:
+                        logger.exception(
+                            "Dropping unpublishable %s message", message[0]
+                        )
+
+            for _ in batch:
+                self._buffer.task_done()
+
+    async def _publish_batch(self, batch: Sequence[BufferedMessage]) -> None:
+        """Publish buffered messages, retrying while the broker is unavailable."""
+        while True:
+            try:
+                with span(
+                    "publish_many", {"messaging.batch.message_count": len(batch)}
+                ):
+                    await self._publish_encoded(batch)
+                return
+            except PUBLISH_ERRORS:
+                logger.exception("Cannot publish %d messages, retrying", len(batch))
+                await asyncio.sleep(self.retry_delay_seconds)
@@ -0,0 +1,240 @@
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from starlette.requests import Request
+
+
+class RateLimitMetrics:
+    """Outcome counters of a rate limiter."""
+
+    allowed: int
+    rejected: Dict[str, int]
+
+    def __init__(self):
+        self.allowed = 0
+        self.rejected = {}
+
+    def reject(self, reason: str) -> None:
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+
+
+class BaseRateLimitStore:
+    """
+    Base store of sliding window counters.
+
+    A window is approximated from the counts of the current and the previous
+    fixed windows, weighted by their overlap with the sliding window.
+    Every hit is counted, even rejected ones.
+    """
+
+    async def hit(self, key: str, limit: int, window_seconds: int) -> float:
+        """
+        Count a hit of a key.
+
+        :return: 0 if the hit is within the limit,
+        else the number of seconds to wait before retrying.
+        """
+        now = time.time()
+        window = int(now // window_seconds)
+        current, previous = await self._increment(key, window, window_seconds)
+        elapsed = now / window_seconds - window
+        if previous * (1 - elapsed) + current <= limit:
+            return 0.0
+        return (1 - elapsed) * window_seconds
+
+    async def _increment(
+        self, key: str, window: int, window_seconds: int
+    ) -> Tuple[int, int]:
+        """Increment the count of a window, return it and the previous count."""
+        raise NotImplementedError()
+
+
+class MemoryRateLimitStore(BaseRateLimitStore):
+    """
+    In-process store, evicting the least recently hit keys.
+
+    Limits are enforced per process: divide them by the number of workers.
+
+    :param max_keys: Maximum number of tracked keys.
+    """
+
+    max_keys: int
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._counts: "OrderedDict[str, Tuple[int, int, int]]" = OrderedDict()
+
+    async def _increment(
+        self, key: str, window: int, window_seconds: int
+    ) -> Tuple[int, int]:
+        stored_window, current, previous = self._counts.get(key, (window, 0, 0))
+        if stored_window != window:
+            previous = current if stored_window == window - 1 else 0
+            current = 0
+        current += 1
+        self._counts[key] = (window, current, previous)
+        self._counts.move_to_end(key)
+        while len(self._counts) > self.max_keys:
+            self._counts.popitem(last=False)
+        return current, previous
+
+
+class RedisRateLimitStore(BaseRateLimitStore):
+    """
+    Store shared between processes, in Redis.
+
+    :param redis: Asyncio Redis client, or any object implementing
+    its `incr`, `expire` and `get` coroutines, such as a local fake.
+    :param key_prefix: Prefix of the Redis keys.
+    """
+
+    redis: Any
+    key_prefix: str
+
+    def __init__(self, redis: Any, key_prefix: str = "auth:ratelimit:"):
+        self.redis = redis
+        self.key_prefix = key_prefix
+
+    async def _increment(
+        self, key: str, window: int, window_seconds: int
+    ) -> Tuple[int, int]:
+        current_key = f"{self.key_prefix}{key}:{window}"
+        current = await self.redis.incr(current_key)
+        if current == 1:
+            await self.redis.expire(current_key, 2 * window_seconds)
+        previous = await self.redis.get(f"{self.key_prefix}{key}:{window - 1}")
+        return current, int(previous or 0)
+
+
+class TokenBucket:
+    """
+    In-process token bucket, smoothing bursts over a sustained rate.
+
+    :param rate: Tokens added per second.
+    :param capacity: Maximum number of tokens, the allowed burst.
+    """
+
+    rate: float
+    capacity: float
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+
+    def take(self) -> float:
+        """
+        Take a token.
+
+        :return: 0 if a token was available,
+        else the number of seconds before the next one.
+        """
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated_at) * self.rate
+        )
+        self._updated_at = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+
+class LoginRateLimiter:
+    """
+    Throttle login attempts per client IP, per email and overall.
+
+    Checks are cheap and run before any password hashing or database work.
+
+    :param store: Store of the per IP and per email windows.
+    :param window_seconds: Duration of the sliding windows.
+    :param ip_limit: Maximum attempts per IP in a window.
+    :param email_limit: Maximum attempts per email in a window.
+    :param bucket: Optional token bucket capping the overall attempts
+    of this process.
+    :param trusted_proxies: Number of reverse proxies in front of the service.
+    The client IP is then read from `forwarded_header`, as appended to
+    by the last of them.
+    :param forwarded_header: Header listing the client and proxy IPs.
+    """
+
+    store: BaseRateLimitStore
+    window_seconds: int
+    ip_limit: int
+    email_limit: int
+    bucket: Optional[TokenBucket]
+    trusted_proxies: int
+    forwarded_header: str
+    metrics: RateLimitMetrics
+
+    def __init__(
+        self,
+        store: BaseRateLimitStore,
+        window_seconds: int = 60,
+        ip_limit: int = 60,
+        email_limit: int = 10,
+        bucket: Optional[TokenBucket] = None,
+        trusted_proxies: int = 0,
+        forwarded_header: str = "X-Forwarded-For",
+    ):
+        self.store = store
+        self.window_seconds = window_seconds
+        self.ip_limit = ip_limit
+        self.email_limit = email_limit
+        self.bucket = bucket
+        self.trusted_proxies = trusted_proxies
+        self.forwarded_header = forwarded_header
+        self.metrics = RateLimitMetrics()
+
+    def get_client_ip(self, request: Request) -> Optional[str]:
+        """
+        Return the IP of the client of a request.
+
+        Behind proxies, the entries of the forwarded header before the ones
+        added by the trusted proxies are set by the client, so they can't be
+        trusted: the IP is the entry added by the first trusted proxy.
+        """
+        peer_ip = request.client.host if request.client else None
+        if not self.trusted_proxies:
+            return peer_ip
+        forwarded = [
+            ip.strip()
+            for ip in request.headers.get(self.forwarded_header, "").split(",")
+            if ip.strip()
+        ]
+        if not forwarded:
+            return peer_ip
+        return forwarded[-min(self.trusted_proxies, len(forwarded))]
+
+    async def check(self, ip: Optional[str], email: str) -> int:
+        """
+        Count a login attempt.
+
+        :return: 0 if the attempt is allowed,
+        else the number of seconds to wait before retrying.
+        """
+        if self.bucket is not None:
+            retry_after = self.bucket.take()
+            if retry_after:
+                return self._reject("global", retry_after)
+        if ip is not None:
+            retry_after = await self.store.hit(
+                f"ip:{ip}", self.ip_limit, self.window_seconds
+            )
+            if retry_after:
+                return self._reject("ip", retry_after)
+        retry_after = await self.store.hit(
+            f"email:{email.lower()}", self.email_limit, self.window_seconds
+        )
+        if retry_after:
+            return self._reject("email", retry_after)
+
+        self.metrics.allowed += 1
+        return 0
+
+    def _reject(self, reason: str, retry_after: float) -> int:
+        self.metrics.reject(reason)
+        return max(1, math.ceil(retry_after))
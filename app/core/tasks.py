@@ -1,15 +1,79 @@
+from typing import Any, Dict
+
 from fastapi import Request
 
+from app.core.auth.claims import USER_CLAIMS, ClaimsRevocationRegistry
+from app.core.auth.database import DatabaseAuthentication
+from app.core.auth.revocation import TokenRevocationList
+from app.core.dispatcher import inline
+from app.models.access_token import access_tokens
+from app.models.outbox import outbox
+from app.models.refresh_token import refresh_tokens
+from app.models.revocation import revocation_store
 from app.schemes.user import UserDB
+from config.settings import settings
+
+claims_revocations = ClaimsRevocationRegistry(settings.AUTH_CLAIMS_MAX_AGE_SECONDS)
+token_revocations = TokenRevocationList(
+    revocation_store,
+    max_token_age_seconds=settings.AUTH_TOKEN_LIFETIME_SECONDS,
+    sync_interval_seconds=settings.TOKEN_REVOCATION_SYNC_INTERVAL_SECONDS,
+    capacity=settings.TOKEN_REVOCATION_CAPACITY,
+    error_rate=settings.TOKEN_REVOCATION_ERROR_RATE,
+)
+database_auth = DatabaseAuthentication(
+    access_tokens,
+    lifetime_seconds=settings.DATABASE_AUTH_LIFETIME_SECONDS,
+    tokenUrl="/api/auth/database/login",
+    cache_size=settings.DATABASE_AUTH_CACHE_SIZE,
+    cache_ttl_seconds=settings.DATABASE_AUTH_CACHE_TTL_SECONDS,
+    touch_interval_seconds=settings.DATABASE_AUTH_TOUCH_INTERVAL_SECONDS,
+    flush_interval_seconds=settings.DATABASE_AUTH_FLUSH_INTERVAL_SECONDS,
+)
+
+
+async def revoke_user_tokens(user: UserDB) -> None:
+    await refresh_tokens.revoke_user(user.id)
+    # Also evicts the sessions cached by this process
+    await database_auth.close_sessions(user.id)
+    if settings.TOKEN_REVOCATION_ENABLED:
+        await token_revocations.revoke_user(user.id)
 
 
 def on_after_register(user: UserDB, request: Request):
     print(f"User {user.id} has registered.")
 
 
-def on_after_forgot_password(user: UserDB, token: str, request: Request):
-    print(f"User {user.id} has forgot their password. Reset token: {token}")
+async def on_after_forgot_password(user: UserDB, token: str, request: Request):
+    await outbox.add(
+        "user.forgot_password", {"id": user.id, "email": user.email, "token": token}
+    )
+
+
+async def after_verification_request(user: UserDB, token: str, request: Request):
+    await outbox.add(
+        "user.verification_requested",
+        {"id": user.id, "email": user.email, "token": token},
+    )
+
+
+@inline
+async def on_after_reset_password(user: UserDB, request: Request):
+    await revoke_user_tokens(user)
+
+
+@inline
+async def on_after_update(user: UserDB, update_dict: Dict[str, Any], request: Request):
+    if any(claim in update_dict for claim in USER_CLAIMS):
+        await claims_revocations.revoke(user.id)
+    # Other workers keep trusting the claims, but not the revoked tokens
+    losing_access = ("is_active" in update_dict and not user.is_active) or (
+        "is_superuser" in update_dict and not user.is_superuser
+    )
+    if "password" in update_dict or losing_access:
+        await revoke_user_tokens(user)
 
 
-def after_verification_request(user: UserDB, token: str, request: Request):
-    print(f"Verification requested for user {user.id}. Verification token: {token}")
+@inline
+async def on_after_delete(user: UserDB, request: Request):
+    await claims_revocations.revoke(user.id)
@@ -0,0 +1,98 @@
+"""
+OpenTelemetry tracing of the service.
+
+Spans are recorded by the globally configured tracer provider, and are
+no-ops when `opentelemetry-api` is not installed or no provider is set.
+Exporters are configured by the deployment, or by `configure_tracing`.
+"""
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    from opentelemetry import propagate, trace
+
+    TRACING_AVAILABLE = True
+except ModuleNotFoundError:  # pragma: no cover
+    TRACING_AVAILABLE = False
+
+TRACER_NAME = "auth"
+
+# Resolved lazily by the API, so that a provider set later is still used
+_tracer = trace.get_tracer(TRACER_NAME) if TRACING_AVAILABLE else None
+
+
+@contextmanager
+def span(name: str, attributes: Optional[Dict[str, Any]] = None) -> Iterator[None]:
+    """Trace a block of code in a child span of the current one."""
+    if _tracer is None:
+        yield
+        return
+    with _tracer.start_as_current_span(name, attributes=attributes):
+        yield
+
+
+def inject_context(headers: Dict[str, Any]) -> Dict[str, Any]:
+    """Add the current trace context to message headers, and return them."""
+    if TRACING_AVAILABLE:
+        propagate.inject(headers)
+    return headers
+
+
+def configure_tracing(service_name: str, exporter: Any, batch: bool = True) -> Any:
+    """
+    Set a tracer provider sending the spans to an exporter.
+
+    For instance an OTLP exporter in production, or an in-memory one
+    in tests. Requires `opentelemetry-sdk`.
+
+    :param service_name: Name of the service in the traces.
+    :param exporter: Span exporter instance.
+    :param batch: Whether to export the spans in batches, in the background,
+    instead of as soon as they end.
+    :return: The tracer provider, to flush or shut it down.
+    """
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import (BatchSpanProcessor,
+                                                SimpleSpanProcessor)
+
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    processor_class = BatchSpanProcessor if batch else SimpleSpanProcessor
+    provider.add_span_processor(processor_class(exporter))
+    trace.set_tracer_provider(provider)
+    return provider
+
+
+class TracingMiddleware:
+    """
+    Trace each HTTP request in a server span, parent of the spans of the
+    request, continuing the trace of the caller if any.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or _tracer is None:
+            await self.app(scope, receive, send)
+            return
+
+        carrier = {
+            name.decode("latin-1"): value.decode("latin-1")
+            for name, value in scope["headers"]
+        }
+        with _tracer.start_as_current_span(
+            f"HTTP {scope['method']}",
+            context=propagate.extract(carrier),
+            kind=trace.SpanKind.SERVER,
+            attributes={"http.method": scope["method"], "http.target": scope["path"]},
+        ) as request_span:
+
+            async def send_wrapper(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    request_span.set_attribute("http.status_code", message["status"])
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
@@ -1,9 +1,12 @@
-from typing import Generic, Optional, Type
+from typing import (Any, AsyncIterator, Generic, List, Optional, Sequence, Set,
+                    Type)
 
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import UUID4
 
 from app import security
+from app.core.tracing import span
+from app.db.replica import read_primary
 from app.schemes.user import UD
 
 
@@ -23,6 +26,15 @@ class BaseUserDatabase(Generic[UD]):
         """Get a single user by id."""
         raise NotImplementedError()
 
+    async def get_many(self, ids: Sequence[UUID4]) -> List[UD]:
+        """Get the users matching a list of ids, skipping unknown ones."""
+        users = []
+        for id in ids:
+            user = await self.get(id)
+            if user is not None:
+                users.append(user)
+        return users
+
     async def get_by_email(self, email: str) -> Optional[UD]:
         """Get a single user by email."""
         raise NotImplementedError()
@@ -31,10 +43,48 @@ class BaseUserDatabase(Generic[UD]):
         """Get a single user by OAuth account id."""
         raise NotImplementedError()
 
+    async def get_existing_emails(self, emails: Sequence[str]) -> Set[str]:
+        """Return the lowercased emails already used by a user."""
+        existing_emails = set()
+        for email in emails:
+            if await self.get_by_email(email) is not None:
+                existing_emails.add(email.lower())
+        return existing_emails
+
+    async def list(
+        self,
+        limit: int,
+        after: Optional[Any] = None,
+        order_by: str = "id",
+        is_active: Optional[bool] = None,
+        is_verified: Optional[bool] = None,
+        is_superuser: Optional[bool] = None,
+        email_prefix: Optional[str] = None,
+    ) -> List[UD]:
+        """
+        Get a page of users, with keyset pagination.
+
+        :param limit: Maximum number of users.
+        :param after: Value of the `order_by` field of the last user
+        of the previous page.
+        :param order_by: Field sorting the users, `id` or `email`.
+        :param email_prefix: Case-insensitive prefix of the email.
+        """
+        raise NotImplementedError()
+
+    def iterate(self) -> AsyncIterator[UD]:
+        """Iterate over all the users, ordered by id."""
+        raise NotImplementedError()
+
     async def create(self, user: UD) -> UD:
         """Create a user."""
         raise NotImplementedError()
 
+    async def create_many(self, users: Sequence[UD]) -> None:
+        """Create several users."""
+        for user in users:
+            await self.create(user)
+
     async def update(self, user: UD) -> UD:
         """Update a user."""
         raise NotImplementedError()
@@ -51,21 +101,33 @@ class BaseUserDatabase(Generic[UD]):
 
         Will automatically upgrade password hash if necessary.
         """
+        with span("user_db.authenticate"):
+            return await self._authenticate(credentials)
+
+    async def _authenticate(
+        self, credentials: OAuth2PasswordRequestForm
+    ) -> Optional[UD]:
         user = await self.get_by_email(credentials.username)
 
         if user is None:
             # Run the hasher to mitigate timing attack
             # Inspired from Django: https://code.djangoproject.com/ticket/20760
-            security.get_password_hash(credentials.password)
+            await security.password_hasher.verify_dummy(credentials.password)
             return None
 
-        verified, updated_password_hash = security.verify_and_update_password(
+        hasher = security.password_hasher
+        verified, updated_password_hash = await hasher.verify_and_update(
             credentials.password, user.hashed_password
         )
         if not verified:
             return None
         # Update password hash to a more robust one if needed
         if updated_password_hash is not None:
+            # Write over the current user, not a possibly stale replica read
+            read_primary()
+            user = await self.get(user.id)
+            if user is None:
+                return None
             user.hashed_password = updated_password_hash
             await self.update(user)
 
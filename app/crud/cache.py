@@ -0,0 +1,212 @@
+import time
+from collections import OrderedDict
+from typing import (Any, AsyncIterator, Generic, List, Optional, Sequence, Set,
+                    Tuple, Type)
+
+from pydantic import UUID4
+
+from app.crud.base import BaseUserDatabase
+from app.schemes.user import UD
+
+
+class BaseUserCache(Generic[UD]):
+    """
+    Base cache of DB representations of users, keyed by user id.
+
+    Keeps hit and miss counters so that the cache can be sized.
+    """
+
+    hits: int
+    misses: int
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    async def get(self, id: UUID4) -> Optional[UD]:
+        """Get a cached user by id."""
+        user = await self._get(id)
+        if user is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return user
+
+    async def set(self, user: UD) -> None:
+        """Cache a user."""
+        raise NotImplementedError()
+
+    async def delete(self, id: UUID4) -> None:
+        """Drop a user from the cache."""
+        raise NotImplementedError()
+
+    async def _get(self, id: UUID4) -> Optional[UD]:
+        raise NotImplementedError()
+
+
+class MemoryUserCache(BaseUserCache[UD]):
+    """
+    In-process LRU cache with a time to live.
+
+    Entries are only invalidated in the current process: keep the TTL short
+    when several workers serve the same database.
+
+    :param max_size: Maximum number of cached users.
+    :param ttl_seconds: Time to live of a cached user.
+    """
+
+    max_size: int
+    ttl_seconds: float
+
+    def __init__(self, max_size: int = 10000, ttl_seconds: float = 30):
+        super().__init__()
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[UUID4, Tuple[float, UD]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def set(self, user: UD) -> None:
+        expires_at = time.monotonic() + self.ttl_seconds
+        self._entries[user.id] = (expires_at, user.copy(deep=True))
+        self._entries.move_to_end(user.id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def delete(self, id: UUID4) -> None:
+        self._entries.pop(id, None)
+
+    async def _get(self, id: UUID4) -> Optional[UD]:
+        entry = self._entries.get(id)
+        if entry is None:
+            return None
+        expires_at, user = entry
+        if expires_at <= time.monotonic():
+            del self._entries[id]
+            return None
+        self._entries.move_to_end(id)
+        # Callers may mutate the user they get before saving it
+        return user.copy(deep=True)
+
+
+class RedisUserCache(BaseUserCache[UD]):
+    """
+    Cache shared between processes, stored in Redis.
+
+    :param redis: Asyncio Redis client, or any object implementing
+    its `get`, `set` and `delete` coroutines.
+    :param user_db_model: Pydantic model of a DB representation of a user.
+    :param ttl_seconds: Time to live of a cached user.
+    :param key_prefix: Prefix of the Redis keys.
+    """
+
+    redis: Any
+    user_db_model: Type[UD]
+    ttl_seconds: int
+    key_prefix: str
+
+    def __init__(
+        self,
+        redis: Any,
+        user_db_model: Type[UD],
+        ttl_seconds: int = 30,
+        key_prefix: str = "auth:user:",
+    ):
+        super().__init__()
+        self.redis = redis
+        self.user_db_model = user_db_model
+        self.ttl_seconds = ttl_seconds
+        self.key_prefix = key_prefix
+
+    async def set(self, user: UD) -> None:
+        await self.redis.set(self._key(user.id), user.json(), ex=self.ttl_seconds)
+
+    async def delete(self, id: UUID4) -> None:
+        await self.redis.delete(self._key(id))
+
+    async def _get(self, id: UUID4) -> Optional[UD]:
+        raw = await self.redis.get(self._key(id))
+        if raw is None:
+            return None
+        return self.user_db_model.parse_raw(raw)
+
+    def _key(self, id: UUID4) -> str:
+        return f"{self.key_prefix}{id}"
+
+
+class CachedUserDatabase(BaseUserDatabase[UD]):
+    """
+    Read-through cache in front of another database adapter.
+
+    Lookups by id are served from the cache. Writes go to the wrapped adapter
+    and invalidate the cached user.
+
+    :param user_db: Database adapter instance.
+    :param cache: User cache instance.
+    """
+
+    user_db: BaseUserDatabase[UD]
+    cache: BaseUserCache[UD]
+
+    def __init__(self, user_db: BaseUserDatabase[UD], cache: BaseUserCache[UD]):
+        super().__init__(user_db.user_db_model)
+        self.user_db = user_db
+        self.cache = cache
+
+    async def get(self, id: UUID4) -> Optional[UD]:
+        user = await self.cache.get(id)
+        if user is None:
+            user = await self.user_db.get(id)
+            if user is not None:
+                await self.cache.set(user)
+        return user
+
+    async def get_many(self, ids: Sequence[UUID4]) -> List[UD]:
+        cached_users = {}
+        for id in ids:
+            user = await self.cache.get(id)
+            if user is not None:
+                cached_users[id] = user
+
+        missing_ids = [id for id in ids if id not in cached_users]
+        for user in await self.user_db.get_many(missing_ids):
+            await self.cache.set(user)
+            cached_users[user.id] = user
+
+        return [cached_users[id] for id in ids if id in cached_users]
+
+    async def get_by_email(self, email: str) -> Optional[UD]:
+        return await self.user_db.get_by_email(email)
+
+    async def get_by_oauth_account(self, oauth: str, account_id: str) -> Optional[UD]:
+        return await self.user_db.get_by_oauth_account(oauth, account_id)
+
+    async def list(self, limit: int, after: Optional[Any] = None, **kwargs) -> List[UD]:
+        return await self.user_db.list(limit, after, **kwargs)
+
+    async def get_existing_emails(self, emails: Sequence[str]) -> Set[str]:
+        return await self.user_db.get_existing_emails(emails)
+
+    def iterate(self) -> AsyncIterator[UD]:
+        return self.user_db.iterate()
+
+    async def create(self, user: UD) -> UD:
+        return await self.user_db.create(user)
+
+    async def create_many(self, users: Sequence[UD]) -> None:
+        await self.user_db.create_many(users)
+
+    async def update(self, user: UD) -> UD:
+        updated_user = await self.user_db.update(user)
+        await self.cache.delete(user.id)
+        return updated_user
+
+    async def delete(self, user: UD) -> None:
+        await self.user_db.delete(user)
+        await self.cache.delete(user.id)
@@ -0,0 +1,100 @@
+import hashlib
+import secrets
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, List, Mapping, Optional, Sequence
+
+from databases import Database
+from pydantic import UUID4
+from sqlalchemy import Table, select
+
+
+class SQLAlchemyAccessTokenStore:
+    """
+    Server-side sessions behind opaque access tokens, for SQLAlchemy.
+
+    Only the SHA-256 digest of a token is stored. Each session also has
+    a public id, to list and revoke the sessions of a user.
+
+    :param database: `Database` instance from `encode/databases`.
+    :param tokens: SQLAlchemy access tokens table instance.
+    :param token_prefix: Prefix of the generated tokens.
+    """
+
+    database: Database
+    tokens: Table
+    token_prefix: str
+
+    def __init__(self, database: Database, tokens: Table, token_prefix: str = "at_"):
+        self.database = database
+        self.tokens = tokens
+        self.token_prefix = token_prefix
+
+    def digest(self, token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    async def create(self, user_id: UUID4, lifetime_seconds: int) -> str:
+        """Open a session and return its token."""
+        token = self.token_prefix + secrets.token_urlsafe(32)
+        now = datetime.utcnow()
+        query = self.tokens.insert().values(
+            id=uuid.uuid4(),
+            token=self.digest(token),
+            user_id=user_id,
+            created_at=now,
+            last_seen_at=now,
+            expires_at=now + timedelta(seconds=lifetime_seconds),
+        )
+        await self.database.execute(query)
+        return token
+
+    async def get(self, digest: str) -> Optional[Mapping[str, Any]]:
+        query = select([self.tokens]).where(self.tokens.c.token == digest)
+        return await self.database.fetch_one(query)
+
+    async def get_by_user(self, user_id: UUID4) -> List[Mapping[str, Any]]:
+        query = (
+            select([self.tokens])
+            .where(self.tokens.c.user_id == user_id)
+            .where(self.tokens.c.expires_at > datetime.utcnow())
+            .order_by(self.tokens.c.last_seen_at.desc())
+        )
+        return await self.database.fetch_all(query)
+
+    async def touch_many(
+        self, digests: Sequence[str], seen_at: datetime, lifetime_seconds: int
+    ) -> None:
+        """Save that sessions were seen and slide their expiration, at once."""
+        query = (
+            self.tokens.update()
+            .where(self.tokens.c.token.in_(digests))
+            .values(
+                last_seen_at=seen_at,
+                expires_at=seen_at + timedelta(seconds=lifetime_seconds),
+            )
+        )
+        await self.database.execute(query)
+
+    async def delete(
+        self, user_id: UUID4, session_id: Optional[UUID4] = None
+    ) -> List[str]:
+        """
+        Close a session of a user, or all of them.
+
+        :return: The digests of the closed sessions.
+        """
+        condition = self.tokens.c.user_id == user_id
+        if session_id is not None:
+            condition &= self.tokens.c.id == session_id
+        async with self.database.transaction():
+            rows = await self.database.fetch_all(
+                select([self.tokens.c.token]).where(condition)
+            )
+            await self.database.execute(self.tokens.delete().where(condition))
+        return [row["token"] for row in rows]
+
+    async def delete_expired(self) -> None:
+        query = self.tokens.delete().where(
+            self.tokens.c.expires_at <= datetime.utcnow()
+        )
+        await self.database.execute(query)
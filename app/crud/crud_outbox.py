@@ -0,0 +1,90 @@
+import json
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Sequence, Tuple
+
+from databases import Database
+from sqlalchemy import Table, select
+
+from app.core.tracing import inject_context
+
+OutboxMessage = Tuple[str, Any]
+
+
+class SQLAlchemyOutbox:
+    """
+    Transactional outbox for SQLAlchemy.
+
+    Messages added inside a database transaction are committed or rolled back
+    along with it, then handed over to the broker by a relay. They keep
+    the trace context of their writer in their headers.
+
+    :param database: `Database` instance from `encode/databases`.
+    :param messages: SQLAlchemy outbox messages table instance.
+    """
+
+    database: Database
+    messages: Table
+
+    def __init__(self, database: Database, messages: Table):
+        self.database = database
+        self.messages = messages
+
+    async def add(self, method: str, body: Any) -> None:
+        """Add a message to the outbox."""
+        await self.add_many([(method, body)])
+
+    async def add_many(self, messages: Sequence[OutboxMessage]) -> None:
+        """Add several messages to the outbox."""
+        now = datetime.utcnow()
+        headers = json.dumps(inject_context({}))
+        values = [
+            {
+                "method": method,
+                "body": json.dumps(body, default=str),
+                "headers": headers,
+                "created_at": now,
+            }
+            for method, body in messages
+        ]
+        query = self.messages.insert()
+        await self.database.execute_many(query, values)
+
+    async def drain(
+        self,
+        publish: Callable[
+            [List[OutboxMessage], List[Dict[str, Any]]], Awaitable[None]
+        ],
+        batch_size: int = 100,
+    ) -> int:
+        """
+        Publish the oldest messages, then remove them from the outbox.
+
+        `publish` receives the messages and their headers.
+        Messages are locked while published so that concurrent relays
+        skip them. They are only removed once `publish` succeeded,
+        so a message may be published more than once.
+
+        :return: The number of published messages.
+        """
+        async with self.database.transaction():
+            query = (
+                select([self.messages])
+                .order_by(self.messages.c.id)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            rows = await self.database.fetch_all(query)
+            if not rows:
+                return 0
+
+            await publish(
+                [(row["method"], json.loads(row["body"])) for row in rows],
+                [json.loads(row["headers"]) if row["headers"] else {} for row in rows],
+            )
+
+            query = self.messages.delete().where(
+                self.messages.c.id.in_([row["id"] for row in rows])
+            )
+            await self.database.execute(query)
+
+        return len(rows)
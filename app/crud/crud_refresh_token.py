@@ -0,0 +1,115 @@
+import hashlib
+import secrets
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from databases import Database
+from pydantic import UUID4
+from sqlalchemy import Table, select
+
+
+class SQLAlchemyRefreshTokenStore:
+    """
+    Server-side store of opaque refresh tokens for SQLAlchemy.
+
+    Only the SHA-256 digest of a token is stored. Every refresh consumes the
+    token and issues a new one in the same family. Presenting a consumed
+    token again means it leaked: the whole family is then revoked.
+
+    :param database: `Database` instance from `encode/databases`.
+    :param tokens: SQLAlchemy refresh tokens table instance.
+    """
+
+    database: Database
+    tokens: Table
+
+    def __init__(self, database: Database, tokens: Table):
+        self.database = database
+        self.tokens = tokens
+
+    async def create(
+        self,
+        user_id: UUID4,
+        lifetime_seconds: int,
+        family_id: Optional[UUID4] = None,
+    ) -> str:
+        """Issue a refresh token, in a new family unless `family_id` is given."""
+        token = secrets.token_urlsafe(32)
+        now = datetime.utcnow()
+        query = self.tokens.insert().values(
+            id=self._digest(token),
+            family_id=family_id or uuid.uuid4(),
+            user_id=user_id,
+            created_at=now,
+            expires_at=now + timedelta(seconds=lifetime_seconds),
+            used_at=None,
+            revoked=False,
+        )
+        await self.database.execute(query)
+        return token
+
+    async def rotate(
+        self, token: str, lifetime_seconds: int
+    ) -> Optional[Tuple[UUID4, str]]:
+        """
+        Consume a refresh token and issue the next one of its family.
+
+        :return: The user id and the new token,
+        or None if the token is unknown, expired, revoked or reused.
+        """
+        async with self.database.transaction():
+            query = (
+                select([self.tokens])
+                .where(self.tokens.c.id == self._digest(token))
+                .with_for_update()
+            )
+            row = await self.database.fetch_one(query)
+            if row is None or row["revoked"]:
+                return None
+
+            now = datetime.utcnow()
+            if row["used_at"] is not None:
+                await self.revoke_family(row["family_id"])
+                return None
+            if row["expires_at"] <= now:
+                return None
+
+            query = (
+                self.tokens.update()
+                .where(self.tokens.c.id == row["id"])
+                .values(used_at=now)
+            )
+            await self.database.execute(query)
+            new_token = await self.create(
+                row["user_id"], lifetime_seconds, family_id=row["family_id"]
+            )
+
+        return row["user_id"], new_token
+
+    async def revoke_family(self, family_id: UUID4) -> None:
+        query = (
+            self.tokens.update()
+            .where(self.tokens.c.family_id == family_id)
+            .values(revoked=True)
+        )
+        await self.database.execute(query)
+
+    async def revoke_user(self, user_id: UUID4) -> None:
+        """Revoke every refresh token of a user."""
+        query = (
+            self.tokens.update()
+            .where(self.tokens.c.user_id == user_id)
+            .values(revoked=True)
+        )
+        await self.database.execute(query)
+
+    async def delete_expired(self) -> None:
+        """Delete the expired tokens, along with what they tell about reuse."""
+        query = self.tokens.delete().where(
+            self.tokens.c.expires_at <= datetime.utcnow()
+        )
+        await self.database.execute(query)
+
+    def _digest(self, token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
@@ -0,0 +1,78 @@
+from datetime import datetime
+from typing import AsyncIterator, Dict, Optional
+
+from databases import Database
+from pydantic import UUID4
+from sqlalchemy import Table, select
+from sqlalchemy.dialects.postgresql import insert
+
+
+class SQLAlchemyRevocationStore:
+    """
+    Revoked tokens and per-user token cutoffs for SQLAlchemy.
+
+    A token is revoked either by its `jti`, until it expires,
+    or because it was issued before the cutoff of its user.
+
+    :param database: `Database` instance from `encode/databases`.
+    :param revoked_tokens: SQLAlchemy revoked tokens table instance.
+    :param cutoffs: SQLAlchemy user token cutoffs table instance.
+    """
+
+    database: Database
+    revoked_tokens: Table
+    cutoffs: Table
+
+    def __init__(self, database: Database, revoked_tokens: Table, cutoffs: Table):
+        self.database = database
+        self.revoked_tokens = revoked_tokens
+        self.cutoffs = cutoffs
+
+    async def revoke_token(self, jti: str, expires_at: datetime) -> None:
+        # Concurrent revocations of the same token, such as two logouts,
+        # must not fail on the primary key
+        query = (
+            insert(self.revoked_tokens)
+            .values(jti=jti, expires_at=expires_at)
+            .on_conflict_do_nothing(index_elements=[self.revoked_tokens.c.jti])
+        )
+        await self.database.execute(query)
+
+    async def is_token_revoked(self, jti: str) -> bool:
+        query = select([self.revoked_tokens.c.jti]).where(
+            self.revoked_tokens.c.jti == jti
+        )
+        return await self.database.fetch_one(query) is not None
+
+    async def iterate_revoked_tokens(self) -> AsyncIterator[str]:
+        """Stream the `jti` of the revoked tokens not expired yet."""
+        query = select([self.revoked_tokens.c.jti]).where(
+            self.revoked_tokens.c.expires_at > datetime.utcnow()
+        )
+        async for row in self.database.iterate(query):
+            yield row["jti"]
+
+    async def set_cutoff(self, user_id: UUID4, not_before: datetime) -> None:
+        """Revoke the tokens of a user issued before `not_before`."""
+        query = insert(self.cutoffs).values(user_id=user_id, not_before=not_before)
+        query = query.on_conflict_do_update(
+            index_elements=[self.cutoffs.c.user_id],
+            set_={"not_before": query.excluded.not_before},
+        )
+        await self.database.execute(query)
+
+    async def get_cutoffs(
+        self, since: Optional[datetime] = None
+    ) -> Dict[UUID4, datetime]:
+        """Get the cutoffs of the users, or only those set after `since`."""
+        query = select([self.cutoffs])
+        if since is not None:
+            query = query.where(self.cutoffs.c.not_before > since)
+        rows = await self.database.fetch_all(query)
+        return {row["user_id"]: row["not_before"] for row in rows}
+
+    async def delete_expired(self) -> None:
+        query = self.revoked_tokens.delete().where(
+            self.revoked_tokens.c.expires_at <= datetime.utcnow()
+        )
+        await self.database.execute(query)
@@ -1,12 +1,26 @@
-from typing import Mapping, Optional, Type
+import re
+from contextlib import contextmanager
+from typing import (Any, AsyncIterator, Dict, Hashable, Iterator, List,
+                    Mapping, Optional, Sequence, Set, Type)
 
 from databases import Database
 from pydantic import UUID4
 from sqlalchemy import Table, func, select
+from sqlalchemy.sql import Select
 
+from app.core.metrics import db_query_seconds
+from app.core.tracing import span
 from app.crud.base import BaseUserDatabase
+from app.crud.crud_outbox import SQLAlchemyOutbox
+from app.db.replica import ReadReplicaRouter
 from app.schemes.user import UD
 
+OAUTH_COLUMN_PREFIX = "oauth_"
+
+USER_CREATED = "user.created"
+USER_UPDATED = "user.updated"
+USER_DELETED = "user.deleted"
+
 
 class NotSetOAuthAccountTableError(Exception):
     """
@@ -15,6 +29,7 @@ class NotSetOAuthAccountTableError(Exception):
     Raised when trying to create/update a user with OAuth accounts set
     but no table were specified in the DB adapter.
     """
+
     pass
 
 
@@ -26,11 +41,17 @@ class SQLAlchemyUserDatabase(BaseUserDatabase[UD]):
     :param database: `Database` instance from `encode/databases`.
     :param users: SQLAlchemy users table instance.
     :param oauth_accounts: Optional SQLAlchemy OAuth accounts table instance.
+    :param outbox: Optional outbox receiving user lifecycle events,
+    written in the same transaction as the user.
+    :param read_router: Optional router sending the user lookups
+    to a read replica, except those following a write of the user.
     """
 
     database: Database
     users: Table
     oauth_accounts: Optional[Table]
+    outbox: Optional[SQLAlchemyOutbox]
+    read_router: Optional[ReadReplicaRouter]
 
     def __init__(
         self,
@@ -38,94 +59,258 @@ class SQLAlchemyUserDatabase(BaseUserDatabase[UD]):
         database: Database,
         users: Table,
         oauth_accounts: Optional[Table] = None,
+        outbox: Optional[SQLAlchemyOutbox] = None,
+        read_router: Optional[ReadReplicaRouter] = None,
     ):
         super().__init__(user_db_model)
         self.database = database
         self.users = users
         self.oauth_accounts = oauth_accounts
+        self.outbox = outbox
+        self.read_router = read_router
 
     async def get(self, id: UUID4) -> Optional[UD]:
-        query = self.users.select().where(self.users.c.id == id)
-        user = await self.database.fetch_one(query)
-        return await self._make_user(user) if user else None
+        query = self._select_users().where(self.users.c.id == id)
+        return await self._fetch_user("get", query, ("id", id))
+
+    async def get_many(self, ids: Sequence[UUID4]) -> List[UD]:
+        if not ids:
+            return []
+        query = self._select_users().where(self.users.c.id.in_(ids))
+        with self._query("get_many"):
+            rows = await self._read(query, *[("id", id) for id in ids])
+        return self._make_users(rows)
 
     async def get_by_email(self, email: str) -> Optional[UD]:
-        query = self.users.select().where(
+        query = self._select_users().where(
             func.lower(self.users.c.email) == func.lower(email)
         )
-        user = await self.database.fetch_one(query)
-        return await self._make_user(user) if user else None
+        return await self._fetch_user("get_by_email", query, ("email", email.lower()))
 
     async def get_by_oauth_account(self, oauth: str, account_id: str) -> Optional[UD]:
         if self.oauth_accounts is not None:
-            query = (
-                select([self.users])
-                .select_from(self.users.join(self.oauth_accounts))
+            user_ids = (
+                select([self.oauth_accounts.c.user_id])
                 .where(self.oauth_accounts.c.oauth_name == oauth)
                 .where(self.oauth_accounts.c.account_id == account_id)
             )
-            user = await self.database.fetch_one(query)
-            return await self._make_user(user) if user else None
+            query = self._select_users().where(self.users.c.id.in_(user_ids))
+            return await self._fetch_user(
+                "get_by_oauth_account", query, ("oauth", oauth, account_id)
+            )
         raise NotSetOAuthAccountTableError()
 
+    async def get_existing_emails(self, emails: Sequence[str]) -> Set[str]:
+        if not emails:
+            return set()
+        lower_email = func.lower(self.users.c.email)
+        query = select([lower_email]).where(
+            lower_email.in_([email.lower() for email in emails])
+        )
+        with self._query("get_existing_emails"):
+            rows = await self.database.fetch_all(query)
+        return {row[0] for row in rows}
+
+    async def list(
+        self,
+        limit: int,
+        after: Optional[Any] = None,
+        order_by: str = "id",
+        is_active: Optional[bool] = None,
+        is_verified: Optional[bool] = None,
+        is_superuser: Optional[bool] = None,
+        email_prefix: Optional[str] = None,
+    ) -> List[UD]:
+        sort_column = self.users.c[order_by]
+        page = select([self.users.c.id]).order_by(sort_column).limit(limit)
+        if after is not None:
+            page = page.where(sort_column > after)
+        for field, value in (
+            ("is_active", is_active),
+            ("is_verified", is_verified),
+            ("is_superuser", is_superuser),
+        ):
+            if value is not None:
+                page = page.where(self.users.c[field] == value)
+        if email_prefix:
+            escaped_prefix = re.sub(r"([\\%_])", r"\\\1", email_prefix.lower())
+            page = page.where(
+                func.lower(self.users.c.email).like(f"{escaped_prefix}%", escape="\\")
+            )
+
+        # Limit the users before joining their OAuth accounts
+        query = (
+            self._select_users().where(self.users.c.id.in_(page)).order_by(sort_column)
+        )
+        with self._query("list"):
+            rows = await self.database.fetch_all(query)
+        return self._make_users(rows)
+
+    async def iterate(self) -> AsyncIterator[UD]:  # type: ignore
+        query = self._select_users().order_by(self.users.c.id)
+        rows: List[Mapping] = []
+        # Rows of a user are contiguous: yield it once the next one starts
+        async for row in self.database.iterate(query):
+            if rows and rows[0]["id"] != row["id"]:
+                yield self._make_users(rows)[0]
+                rows = []
+            rows.append(row)
+        if rows:
+            yield self._make_users(rows)[0]
+
     async def create(self, user: UD) -> UD:
-        user_dict = user.dict()
-        oauth_accounts_values = None
+        await self.create_many([user])
+        return user
 
-        if "oauth_accounts" in user_dict:
-            oauth_accounts_values = []
+    async def create_many(self, users: Sequence[UD]) -> None:
+        users_values: List[Dict[str, Any]] = []
+        oauth_accounts_values: List[Dict[str, Any]] = []
 
-            oauth_accounts = user_dict.pop("oauth_accounts")
-            for oauth_account in oauth_accounts:
-                oauth_accounts_values.append({"user_id": user.id, **oauth_account})
+        for user in users:
+            user_dict = user.dict()
+            if "oauth_accounts" in user_dict:
+                if self.oauth_accounts is None:
+                    raise NotSetOAuthAccountTableError()
+                oauth_accounts = user_dict.pop("oauth_accounts")
+                for oauth_account in oauth_accounts:
+                    oauth_accounts_values.append({"user_id": user.id, **oauth_account})
+            users_values.append(user_dict)
 
-        query = self.users.insert()
-        await self.database.execute(query, user_dict)
+        with self._query("create"):
+            async with self.database.transaction():
+                query = self.users.insert()
+                await self.database.execute_many(query, users_values)
 
-        if oauth_accounts_values is not None:
-            if self.oauth_accounts is None:
-                raise NotSetOAuthAccountTableError()
-            query = self.oauth_accounts.insert()
-            await self.database.execute_many(query, oauth_accounts_values)
+                if oauth_accounts_values and self.oauth_accounts is not None:
+                    query = self.oauth_accounts.insert()
+                    await self.database.execute_many(query, oauth_accounts_values)
 
-        return user
+                if self.outbox is not None:
+                    await self.outbox.add_many(
+                        [(USER_CREATED, self._event_body(user)) for user in users]
+                    )
+
+        for user in users:
+            self._mark_written(user)
 
     async def update(self, user: UD) -> UD:
         user_dict = user.dict()
 
-        if "oauth_accounts" in user_dict:
-            if self.oauth_accounts is None:
-                raise NotSetOAuthAccountTableError()
+        with self._query("update"):
+            async with self.database.transaction():
+                if "oauth_accounts" in user_dict:
+                    if self.oauth_accounts is None:
+                        raise NotSetOAuthAccountTableError()
 
-            query = self.oauth_accounts.delete().where(
-                self.oauth_accounts.c.user_id == user.id
-            )
-            await self.database.execute(query)
+                    query = self.oauth_accounts.delete().where(
+                        self.oauth_accounts.c.user_id == user.id
+                    )
+                    await self.database.execute(query)
+
+                    oauth_accounts_values = []
+                    oauth_accounts = user_dict.pop("oauth_accounts")
+                    for oauth_account in oauth_accounts:
+                        oauth_accounts_values.append(
+                            {"user_id": user.id, **oauth_account}
+                        )
+
+                    query = self.oauth_accounts.insert()
+                    await self.database.execute_many(query, oauth_accounts_values)
 
-            oauth_accounts_values = []
-            oauth_accounts = user_dict.pop("oauth_accounts")
-            for oauth_account in oauth_accounts:
-                oauth_accounts_values.append({"user_id": user.id, **oauth_account})
+                query = (
+                    self.users.update()
+                    .where(self.users.c.id == user.id)
+                    .values(user_dict)
+                )
+                await self.database.execute(query)
 
-            query = self.oauth_accounts.insert()
-            await self.database.execute_many(query, oauth_accounts_values)
+                await self._add_event(USER_UPDATED, user)
 
-        query = self.users.update().where(self.users.c.id == user.id).values(user_dict)
-        await self.database.execute(query)
+        self._mark_written(user)
         return user
 
     async def delete(self, user: UD) -> None:
-        query = self.users.delete().where(self.users.c.id == user.id)
-        await self.database.execute(query)
+        with self._query("delete"):
+            async with self.database.transaction():
+                query = self.users.delete().where(self.users.c.id == user.id)
+                await self.database.execute(query)
 
-    async def _make_user(self, user: Mapping) -> UD:
-        user_dict = {**user}
+                await self._add_event(USER_DELETED, user)
 
-        if self.oauth_accounts is not None:
-            query = self.oauth_accounts.select().where(
-                self.oauth_accounts.c.user_id == user["id"]
-            )
-            oauth_accounts = await self.database.fetch_all(query)
-            user_dict["oauth_accounts"] = [{**a} for a in oauth_accounts]
+        self._mark_written(user)
+
+    async def _add_event(self, method: str, user: UD) -> None:
+        if self.outbox is not None:
+            await self.outbox.add(method, self._event_body(user))
+
+    @contextmanager
+    def _query(self, operation: str) -> Iterator[None]:
+        """Time and trace the queries of an operation."""
+        with span(f"db.{operation}", {"db.operation": operation}):
+            with db_query_seconds.labels(operation).time():
+                yield
+
+    def _event_body(self, user: UD) -> Dict[str, Any]:
+        return user.dict(exclude={"hashed_password", "oauth_accounts"})
+
+    def _select_users(self) -> Select:
+        """
+        Select users along with their OAuth accounts, if any.
+
+        OAuth accounts are left joined so that users and their accounts are
+        fetched in a single query, one row per account. Their columns are
+        labelled with an `oauth_` prefix.
+        """
+        columns = list(self.users.c)
+        if self.oauth_accounts is None:
+            return select(columns)
+
+        columns += [
+            column.label(f"{OAUTH_COLUMN_PREFIX}{column.name}")
+            for column in self.oauth_accounts.c
+        ]
+        return select(columns).select_from(self.users.outerjoin(self.oauth_accounts))
+
+    async def _read(self, query: Select, *keys: Hashable) -> List[Mapping]:
+        """Run a lookup of users by keys, on the read replica when allowed."""
+        if self.read_router is None:
+            return await self.database.fetch_all(query)
+        return await self.read_router.fetch_all(query, *keys)
+
+    def _mark_written(self, user: UD) -> None:
+        """Send the next lookups of a written user to the primary."""
+        if self.read_router is None:
+            return
+        keys: List[Hashable] = [("id", user.id), ("email", user.email.lower())]
+        for oauth_account in getattr(user, "oauth_accounts", []):
+            keys.append(("oauth", oauth_account.oauth_name, oauth_account.account_id))
+        self.read_router.mark_written(*keys)
+
+    async def _fetch_user(
+        self, operation: str, query: Select, *keys: Hashable
+    ) -> Optional[UD]:
+        with self._query(operation):
+            rows = await self._read(query, *keys)
+        users = self._make_users(rows)
+        return users[0] if users else None
+
+    def _make_users(self, rows: Sequence[Mapping]) -> List[UD]:
+        users: Dict[UUID4, dict] = {}
+
+        for row in rows:
+            user_dict = users.get(row["id"])
+            if user_dict is None:
+                user_dict = {column.name: row[column.name] for column in self.users.c}
+                users[row["id"]] = user_dict
+
+            if self.oauth_accounts is not None:
+                oauth_accounts = user_dict.setdefault("oauth_accounts", [])
+                if row[f"{OAUTH_COLUMN_PREFIX}id"] is not None:
+                    oauth_accounts.append(
+                        {
+                            column.name: row[f"{OAUTH_COLUMN_PREFIX}{column.name}"]
+                            for column in self.oauth_accounts.c
+                        }
+                    )
 
-        return self.user_db_model(**user_dict)
+        return [self.user_db_model(**user_dict) for user_dict in users.values()]
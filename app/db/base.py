@@ -1,4 +1,8 @@
 # Import all the models, so that Base has them before being
 # imported by Alembic
 from app.db.base_class import Base  # noqa
+from app.models.access_token import AccessToken  # noqa
+from app.models.outbox import OutboxMessage  # noqa
+from app.models.refresh_token import RefreshToken  # noqa
+from app.models.revocation import RevokedToken, UserTokenCutoff  # noqa
 from app.models.user import UserTable  # noqa
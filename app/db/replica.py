@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Hashable, List, Mapping, Optional
+
+from databases import Database
+from sqlalchemy.sql import ClauseElement
+
+logger = logging.getLogger(__name__)
+
+# Set once the current request, or task, wrote to the primary or is about to
+_primary_only: ContextVar[bool] = ContextVar("primary_only", default=False)
+
+
+def read_primary() -> None:
+    """
+    Send the next reads of the current request, or task, to the primary.
+
+    For the requests reading users to write them back, so that they don't
+    write a stale replica read over newer data. Call it from the request
+    task, not from a thread.
+    """
+    _primary_only.set(True)
+
+
+class ReadReplicaRouter:
+    """
+    Route reads to a replica, unless they must see recent writes.
+
+    A read goes to the primary for the rest of a request, or task, which
+    wrote to it or called `read_primary`; and for `sticky_seconds` after
+    a write of one of its keys, such as a user id or email, in any request
+    of the process. Longer than the replication lag, this lets clients read
+    their own writes.
+
+    The replica is connected and checked in the background, and reads go
+    to the primary while it is unhealthy.
+
+    :param primary: `Database` instance of the primary.
+    :param replica: `Database` instance of the replica.
+    :param sticky_seconds: Duration reads of written keys go to the primary.
+    :param check_interval_seconds: Delay between health checks of the replica.
+    :param check_timeout_seconds: Time a health check can take.
+    :param max_sticky_keys: Maximum number of written keys remembered.
+    """
+
+    primary: Database
+    replica: Database
+    sticky_seconds: float
+    check_interval_seconds: float
+    check_timeout_seconds: float
+    max_sticky_keys: int
+    healthy: bool
+
+    def __init__(
+        self,
+        primary: Database,
+        replica: Database,
+        sticky_seconds: float = 5.0,
+        check_interval_seconds: float = 5.0,
+        check_timeout_seconds: float = 1.0,
+        max_sticky_keys: int = 100000,
+    ):
+        self.primary = primary
+        self.replica = replica
+        self.sticky_seconds = sticky_seconds
+        self.check_interval_seconds = check_interval_seconds
+        self.check_timeout_seconds = check_timeout_seconds
+        self.max_sticky_keys = max_sticky_keys
+        self.healthy = False
+        self.reads = {"primary": 0, "replica": 0}
+        # Expiry of the written keys, in the order they expire
+        self._sticky_keys: "OrderedDict[Hashable, float]" = OrderedDict()
+        self._task: Optional["asyncio.Task[None]"] = None
+
+    def mark_written(self, *keys: Hashable) -> None:
+        """Send the next reads of these keys, and of this request, to the primary."""
+        _primary_only.set(True)
+        now = time.monotonic()
+        while self._sticky_keys:
+            key, expires_at = next(iter(self._sticky_keys.items()))
+            if expires_at > now and len(self._sticky_keys) < self.max_sticky_keys:
+                break
+            del self._sticky_keys[key]
+
+        for key in keys:
+            self._sticky_keys.pop(key, None)
+            self._sticky_keys[key] = now + self.sticky_seconds
+
+    def get_database(self, *keys: Hashable) -> Database:
+        """Return the database serving a read of these keys."""
+        if not self.healthy or _primary_only.get():
+            return self.primary
+        now = time.monotonic()
+        for key in keys:
+            expires_at = self._sticky_keys.get(key)
+            if expires_at is not None and expires_at > now:
+                return self.primary
+        return self.replica
+
+    async def fetch_all(self, query: ClauseElement, *keys: Hashable) -> List[Mapping]:
+        """
+        Run a read query, on the replica when allowed.
+
+        Falls back to the primary when the replica fails, until it passes
+        a health check again.
+        """
+        database = self.get_database(*keys)
+        if database is self.replica:
+            try:
+                rows = await database.fetch_all(query)
+                self.reads["replica"] += 1
+                return rows
+            except Exception:
+                logger.exception("Read replica failed, reading from the primary")
+                self.healthy = False
+        rows = await self.primary.fetch_all(query)
+        self.reads["primary"] += 1
+        return rows
+
+    async def check(self) -> bool:
+        """
+        Check that the replica answers a query in time, and record it.
+
+        Connects to the replica first if needed.
+        """
+        try:
+            if not self.replica.is_connected:
+                await asyncio.wait_for(
+                    self.replica.connect(), self.check_timeout_seconds
+                )
+            await asyncio.wait_for(
+                self.replica.fetch_val("SELECT 1"), self.check_timeout_seconds
+            )
+            healthy = True
+        except Exception as e:
+            healthy = False
+            if self.healthy:
+                logger.warning("Read replica is unhealthy: %r", e)
+        if healthy and not self.healthy:
+            logger.info("Read replica is healthy again")
+        self.healthy = healthy
+        return healthy
+
+    async def start(self) -> None:
+        """Connect to the replica, then check it in the background."""
+        await self.check()
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.replica.is_connected:
+            await self.replica.disconnect()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.check_interval_seconds)
+            await self.check()
@@ -1,5 +1,40 @@
+from typing import Any, Dict
+
 import databases
 
+from app.db.replica import ReadReplicaRouter
 from config.settings import settings
 
-database = databases.Database(str(settings.SQLALCHEMY_DATABASE_URI))
+
+def get_pool_options() -> Dict[str, Any]:
+    """Options of the connection pools, passed to `asyncpg.create_pool`."""
+    options: Dict[str, Any] = {
+        "min_size": settings.DATABASE_POOL_MIN_SIZE,
+        "max_size": settings.DATABASE_POOL_MAX_SIZE,
+        "max_inactive_connection_lifetime": (
+            settings.DATABASE_POOL_MAX_INACTIVE_SECONDS
+        ),
+    }
+    if settings.DATABASE_STATEMENT_TIMEOUT_SECONDS:
+        timeout_ms = int(settings.DATABASE_STATEMENT_TIMEOUT_SECONDS * 1000)
+        options["server_settings"] = {"statement_timeout": str(timeout_ms)}
+    return options
+
+
+database = databases.Database(
+    str(settings.SQLALCHEMY_DATABASE_URI), **get_pool_options()
+)
+
+read_router = (
+    ReadReplicaRouter(
+        database,
+        databases.Database(
+            str(settings.SQLALCHEMY_REPLICA_DATABASE_URI), **get_pool_options()
+        ),
+        sticky_seconds=settings.DATABASE_REPLICA_STICKY_SECONDS,
+        check_interval_seconds=settings.DATABASE_REPLICA_CHECK_INTERVAL_SECONDS,
+        check_timeout_seconds=settings.DATABASE_REPLICA_CHECK_TIMEOUT_SECONDS,
+    )
+    if settings.SQLALCHEMY_REPLICA_DATABASE_URI
+    else None
+)
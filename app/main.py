@@ -1,8 +1,23 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
 from starlette.middleware.cors import CORSMiddleware
 
-from app.api.api import router
-from app.db.session import database
+from app.api.api import (cookie_auth, database_auth, fastapi_users, jwt_auth,
+                         key_ring, login_rate_limiter, router)
+from app.api.routers.common import set_hook_dispatcher
+from app.api.routers.jwks import get_jwks_router
+from app.core.dispatcher import HookDispatcher
+from app.core.metrics import (METRICS_AVAILABLE, MetricsMiddleware,
+                              metrics_endpoint, register_stats)
+from app.core.outbox import OutboxRelay
+from app.core.tasks import token_revocations
+from app.core.tracing import TracingMiddleware, configure_tracing
+from app.crud.cache import CachedUserDatabase
+from app.db.session import database, read_router
+from app.models.outbox import outbox
+from app.models.user import user_db
+from app.security import PasswordHasherBusy, password_hasher
+from app.utils import publisher
 from config.settings import settings
 
 app = FastAPI(
@@ -22,13 +37,212 @@ if settings.BACKEND_CORS_ORIGINS:
     )
 
 app.include_router(router, prefix="/api/auth")
+if key_ring is not None:
+    app.include_router(
+        get_jwks_router(key_ring, settings.JWKS_MAX_AGE_SECONDS), tags=["auth"]
+    )
+
+outbox_relay = OutboxRelay(
+    outbox,
+    publisher,
+    batch_size=settings.OUTBOX_BATCH_SIZE,
+    interval_seconds=settings.OUTBOX_POLL_INTERVAL_SECONDS,
+)
+hook_dispatcher = HookDispatcher(
+    concurrency=settings.HOOKS_CONCURRENCY,
+    queue_size=settings.HOOKS_QUEUE_SIZE,
+    max_retries=settings.HOOKS_MAX_RETRIES,
+)
+
+
+def register_service_stats() -> None:
+    """Expose the counters kept by the components of the service."""
+    hasher = password_hasher.metrics
+    register_stats(
+        "auth_password_hasher_jobs",
+        "Password hashing jobs, by state.",
+        ["state"],
+        lambda: [(["queued"], hasher.queued), (["running"], hasher.running)],
+    )
+    register_stats(
+        "auth_password_hasher_saturation",
+        "Share of the password hashing workers currently busy, between 0 and 1.",
+        [],
+        lambda: [([], hasher.saturation)],
+    )
+    register_stats(
+        "auth_password_hasher_rejected",
+        "Password hashing jobs rejected because the queue was full.",
+        [],
+        lambda: [([], hasher.rejected)],
+        kind="counter",
+    )
+    register_stats(
+        "auth_password_hasher_queue_wait_seconds_max",
+        "Longest time a password hashing job waited for a worker.",
+        [],
+        lambda: [([], hasher.queue_wait_seconds_max)],
+    )
+
+    token_caches = {
+        backend.name: backend.token_cache
+        for backend in (jwt_auth, cookie_auth)
+        if backend.token_cache is not None
+    }
+    register_stats(
+        "auth_token_cache_lookups",
+        "Lookups of the decoded token caches, by backend and result.",
+        ["backend", "result"],
+        lambda: [
+            sample
+            for name, cache in token_caches.items()
+            for sample in (([name, "hit"], cache.hits), ([name, "miss"], cache.misses))
+        ],
+        kind="counter",
+    )
+    if isinstance(user_db, CachedUserDatabase):
+        user_cache = user_db.cache
+        register_stats(
+            "auth_user_cache_lookups",
+            "Lookups of the user cache, by result.",
+            ["result"],
+            lambda: [(["hit"], user_cache.hits), (["miss"], user_cache.misses)],
+            kind="counter",
+        )
+
+    backends = fastapi_users.authenticator.metrics
+    register_stats(
+        "auth_backend_calls",
+        "Authentications attempted by each backend, by result.",
+        ["backend", "result"],
+        lambda: [
+            sample
+            for name, metrics in backends.items()
+            for sample in (
+                ([name, "accepted"], metrics.calls - metrics.rejected),
+                ([name, "rejected"], metrics.rejected),
+            )
+        ],
+        kind="counter",
+    )
+    register_stats(
+        "auth_backend_seconds",
+        "Time spent authenticating by each backend.",
+        ["backend"],
+        lambda: [([name], metrics.seconds_total) for name, metrics in backends.items()],
+        kind="counter",
+    )
+
+    hooks = hook_dispatcher.metrics
+    register_stats(
+        "auth_hook_attempts",
+        "Attempts of the background hook calls, by hook and result.",
+        ["hook", "result"],
+        lambda: [
+            sample
+            for name, metrics in hooks.items()
+            for sample in (
+                ([name, "succeeded"], metrics.calls - metrics.failures),
+                ([name, "failed"], metrics.failures),
+            )
+        ],
+        kind="counter",
+    )
+    register_stats(
+        "auth_hook_dead_letters",
+        "Background hook calls given up after their retries, by hook.",
+        ["hook"],
+        lambda: [([name], metrics.dead_letters) for name, metrics in hooks.items()],
+        kind="counter",
+    )
+
+    if read_router is not None:
+        router = read_router
+        reads = router.reads
+        register_stats(
+            "auth_db_user_reads",
+            "User lookups, by database serving them.",
+            ["database"],
+            lambda: [([name], count) for name, count in reads.items()],
+            kind="counter",
+        )
+        register_stats(
+            "auth_db_replica_healthy",
+            "Whether the read replica passed its last health check.",
+            [],
+            lambda: [([], float(router.healthy))],
+        )
+
+    if login_rate_limiter is not None:
+        limits = login_rate_limiter.metrics
+        register_stats(
+            "auth_login_attempts",
+            "Login attempts, by rate limit decision.",
+            ["result"],
+            lambda: [(["allowed"], limits.allowed)]
+            + [
+                ([f"rejected_{reason}"], count)
+                for reason, count in limits.rejected.items()
+            ],
+            kind="counter",
+        )
+
+
+if METRICS_AVAILABLE and settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
+
+if settings.TRACING_OTLP_ENDPOINT:
+    from opentelemetry.exporter.otlp.proto.http import trace_exporter
+
+    configure_tracing(
+        settings.PROJECT_NAME,
+        trace_exporter.OTLPSpanExporter(endpoint=settings.TRACING_OTLP_ENDPOINT),
+    )
+    app.add_middleware(TracingMiddleware)
+
+
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "PASSWORD_HASHER_BUSY"},
+        headers={"Retry-After": "1"},
+    )
 
 
 @app.on_event("startup")
 async def startup():
+    if METRICS_AVAILABLE and settings.METRICS_ENABLED:
+        register_service_stats()
+    if settings.PASSWORD_HASH_TARGET_SECONDS:
+        await password_hasher.calibrate(settings.PASSWORD_HASH_TARGET_SECONDS)
+    else:
+        await password_hasher.hash_dummy()
     await database.connect()
+    if read_router is not None:
+        await read_router.start()
+    await publisher.start()
+    outbox_relay.start()
+    if settings.DATABASE_AUTH_ENABLED:
+        database_auth.start()
+    if settings.TOKEN_REVOCATION_ENABLED:
+        token_revocations.start()
+    if settings.HOOKS_BACKGROUND_DISPATCH:
+        hook_dispatcher.start()
+        set_hook_dispatcher(hook_dispatcher)
 
 
 @app.on_event("shutdown")
 async def shutdown():
+    if settings.HOOKS_BACKGROUND_DISPATCH:
+        set_hook_dispatcher(None)
+        await hook_dispatcher.stop()
+    await token_revocations.stop()
+    await database_auth.stop()
+    await outbox_relay.stop()
+    await publisher.stop()
+    if read_router is not None:
+        await read_router.stop()
     await database.disconnect()
+    password_hasher.shutdown()
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, DateTime, ForeignKey, String
+
+from app.crud.crud_access_token import SQLAlchemyAccessTokenStore
+from app.db.base_class import Base
+from app.db.session import database
+from app.models.user import GUID
+
+
+class AccessToken(Base):
+    id = Column(GUID, primary_key=True)
+    # SHA-256 digest of the token
+    token = Column(String(length=64), unique=True, index=True, nullable=False)
+    user_id = Column(
+        GUID, ForeignKey("usertable.id", ondelete="CASCADE"), index=True, nullable=False
+    )
+    created_at = Column(DateTime, nullable=False)
+    last_seen_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+
+access_tokens = SQLAlchemyAccessTokenStore(
+    database, AccessToken.__table__  # type: ignore
+)
@@ -0,0 +1,17 @@
+from sqlalchemy import BigInteger, Column, DateTime, Integer, String, Text
+
+from app.crud.crud_outbox import SQLAlchemyOutbox
+from app.db.base_class import Base
+from app.db.session import database
+
+
+class OutboxMessage(Base):
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    method = Column(String(length=255), nullable=False)
+    body = Column(Text, nullable=False)
+    # JSON message headers, such as the trace context of the writer
+    headers = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+
+
+outbox = SQLAlchemyOutbox(database, OutboxMessage.__table__)  # type: ignore
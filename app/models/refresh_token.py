@@ -0,0 +1,24 @@
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, String
+
+from app.crud.crud_refresh_token import SQLAlchemyRefreshTokenStore
+from app.db.base_class import Base
+from app.db.session import database
+from app.models.user import GUID
+
+
+class RefreshToken(Base):
+    # SHA-256 digest of the token
+    id = Column(String(length=64), primary_key=True)
+    family_id = Column(GUID, index=True, nullable=False)
+    user_id = Column(
+        GUID, ForeignKey("usertable.id", ondelete="CASCADE"), index=True, nullable=False
+    )
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    used_at = Column(DateTime, nullable=True)
+    revoked = Column(Boolean, default=False, nullable=False)
+
+
+refresh_tokens = SQLAlchemyRefreshTokenStore(
+    database, RefreshToken.__table__  # type: ignore
+)
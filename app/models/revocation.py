@@ -0,0 +1,23 @@
+from sqlalchemy import Column, DateTime, ForeignKey, String
+
+from app.crud.crud_revocation import SQLAlchemyRevocationStore
+from app.db.base_class import Base
+from app.db.session import database
+from app.models.user import GUID
+
+
+class RevokedToken(Base):
+    jti = Column(String(length=64), primary_key=True)
+    expires_at = Column(DateTime, index=True, nullable=False)
+
+
+class UserTokenCutoff(Base):
+    user_id = Column(
+        GUID, ForeignKey("usertable.id", ondelete="CASCADE"), primary_key=True
+    )
+    not_before = Column(DateTime, nullable=False)
+
+
+revocation_store = SQLAlchemyRevocationStore(
+    database, RevokedToken.__table__, UserTokenCutoff.__table__  # type: ignore
+)
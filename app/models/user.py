@@ -1,13 +1,18 @@
 import uuid
 
-from sqlalchemy import Boolean, Column, String
+from sqlalchemy import Boolean, Column, Index, String, func
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.types import CHAR, TypeDecorator
 
+from app.crud.base import BaseUserDatabase
+from app.crud.cache import (BaseUserCache, CachedUserDatabase, MemoryUserCache,
+                            RedisUserCache)
 from app.crud.crud_user import SQLAlchemyUserDatabase
 from app.db.base_class import Base
-from app.db.session import database
+from app.db.session import database, read_router
+from app.models.outbox import outbox
 from app.schemes.user import UserDB
+from config.settings import settings
 
 
 class GUID(TypeDecorator):  # pragma: no cover
@@ -48,10 +53,36 @@ class GUID(TypeDecorator):  # pragma: no cover
 class UserTable(Base):
     id = Column(GUID, primary_key=True)
     email = Column(String(length=320), unique=True, index=True, nullable=False)
-    hashed_password = Column(String(length=72), nullable=False)
+    hashed_password = Column(String(length=255), nullable=False)
     is_active = Column(Boolean, default=True, nullable=False)
     is_superuser = Column(Boolean, default=False, nullable=False)
     is_verified = Column(Boolean, default=False, nullable=False)
 
 
-user_db = SQLAlchemyUserDatabase(UserDB, database, UserTable.__table__)  # type: ignore
+# Serves the case-insensitive lookups of SQLAlchemyUserDatabase.get_by_email
+Index("ix_usertable_email_lower", func.lower(UserTable.email), unique=True)
+
+user_db: BaseUserDatabase = SQLAlchemyUserDatabase(
+    UserDB,
+    database,
+    UserTable.__table__,  # type: ignore
+    outbox=outbox,
+    read_router=read_router,
+)
+
+if settings.USER_CACHE_TTL_SECONDS > 0:
+    user_cache: BaseUserCache
+    if settings.USER_CACHE_REDIS_URL:
+        from redis import asyncio as aioredis
+
+        user_cache = RedisUserCache(
+            aioredis.from_url(settings.USER_CACHE_REDIS_URL),
+            UserDB,
+            ttl_seconds=settings.USER_CACHE_TTL_SECONDS,
+        )
+    else:
+        user_cache = MemoryUserCache(
+            max_size=settings.USER_CACHE_MAX_SIZE,
+            ttl_seconds=settings.USER_CACHE_TTL_SECONDS,
+        )
+    user_db = CachedUserDatabase(user_db, user_cache)
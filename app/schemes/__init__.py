@@ -1,3 +1,4 @@
 from .msg import Msg  # noqa
+from .session import Session  # noqa
 from .token import Token, TokenPayload  # noqa
 from .user import User, UserCreate, UserDB, UserUpdate  # noqa
@@ -0,0 +1,10 @@
+from datetime import datetime
+
+from pydantic import UUID4, BaseModel
+
+
+class Session(BaseModel):
+    id: UUID4
+    created_at: datetime
+    last_seen_at: datetime
+    expires_at: datetime
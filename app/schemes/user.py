@@ -58,6 +58,19 @@ class BaseUserDB(BaseUser):
 UD = TypeVar("UD", bound=BaseUserDB)
 
 
+class BaseUserClaims(BaseUser):
+    """
+    User rebuilt from the claims of an authentication token.
+
+    It has no password hash and may be stale: read the user from the database
+    before updating it.
+    """
+
+    id: UUID4
+    email: EmailStr
+    claims_issued_at: int
+
+
 class BaseOAuthAccount(BaseModel):
     """Base OAuth account model."""
 
@@ -1,9 +1,110 @@
-from typing import Tuple
+import asyncio
+import logging
+import time
+from concurrent.futures import (Executor, ProcessPoolExecutor,
+                                ThreadPoolExecutor)
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple, TypeVar
 
 from passlib import pwd
 from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.core.metrics import (password_hash_queue_wait_seconds,
+                              password_hash_seconds)
+from app.core.tracing import span
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+PASSWORD_SCHEMES = ("argon2", "bcrypt")
+# Calibration never goes below these costs
+PASSWORD_MIN_COSTS = {"argon2": 2, "bcrypt": 10}
+
+T = TypeVar("T")
+
+
+def make_password_context(
+    schemes: Sequence[str] = ("bcrypt",),
+    bcrypt_rounds: int = 12,
+    argon2_time_cost: int = 3,
+    argon2_memory_cost: int = 65536,
+    argon2_parallelism: int = 4,
+) -> CryptContext:
+    """
+    Build a password context.
+
+    The first scheme hashes the passwords, the other ones are only verified.
+    Hashes of another scheme, or with a lower cost, are flagged for update:
+    `verify_and_update_password` returns their upgraded hash.
+
+    :param schemes: Schemes of the context, among argon2 and bcrypt.
+    :param bcrypt_rounds: Log2 of the bcrypt iterations.
+    :param argon2_time_cost: Number of argon2 passes.
+    :param argon2_memory_cost: Memory used by argon2, in KiB.
+    :param argon2_parallelism: Number of argon2 lanes.
+    """
+    for scheme in schemes:
+        if scheme not in PASSWORD_SCHEMES:
+            raise ValueError(f"Unsupported password scheme {scheme}")
+    return CryptContext(
+        schemes=list(schemes),
+        deprecated="auto",
+        bcrypt__default_rounds=bcrypt_rounds,
+        bcrypt__min_rounds=bcrypt_rounds,
+        argon2__type="ID",
+        argon2__default_rounds=argon2_time_cost,
+        argon2__min_rounds=argon2_time_cost,
+        argon2__memory_cost=argon2_memory_cost,
+        argon2__parallelism=argon2_parallelism,
+    )
+
+
+pwd_context = make_password_context(
+    settings.PASSWORD_HASH_SCHEMES,
+    bcrypt_rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+    argon2_time_cost=settings.PASSWORD_ARGON2_TIME_COST,
+    argon2_memory_cost=settings.PASSWORD_ARGON2_MEMORY_COST,
+    argon2_parallelism=settings.PASSWORD_ARGON2_PARALLELISM,
+)
+
+
+def configure_password_context(options: Dict[str, Any]) -> None:
+    """
+    Replace the options of the password context, as returned by its `to_dict`.
+
+    Also used to initialize the workers of a process pool.
+    """
+    pwd_context.load(options)
+
+
+def calibrate_password_context(target_seconds: float) -> Dict[str, Any]:
+    """
+    Pick the cost of the default scheme matching a verification latency.
+
+    The cost is raised one step at a time while a verification on the current
+    hardware stays under `target_seconds`, from a safe minimum.
+    Existing hashes with a lower cost are upgraded on login; hashes with
+    a higher cost, e.g. from a faster instance, are kept.
+
+    :return: Options of the calibrated context,
+    to pass to `configure_password_context`.
+    """
+    scheme = pwd_context.default_scheme()
+    handler = pwd_context.handler(scheme)
+    cost = PASSWORD_MIN_COSTS[scheme]
+    while cost < handler.max_rounds:
+        hashed_password = handler.using(rounds=cost + 1).hash("calibration")
+        started_at = time.perf_counter()
+        handler.verify("calibration", hashed_password)
+        if time.perf_counter() - started_at > target_seconds:
+            break
+        cost += 1
+
+    logger.info("Calibrated the %s password cost to %d", scheme, cost)
+    return {
+        **pwd_context.to_dict(),
+        f"{scheme}__default_rounds": cost,
+        f"{scheme}__min_rounds": cost,
+    }
 
 
 def verify_and_update_password(
@@ -20,3 +121,228 @@ def get_password_hash(password: str) -> str:
 
 def generate_password() -> str:
     return pwd.genword()  # type: ignore
+
+
+class PasswordHashReport:
+    """Number of password hashes per scheme, and of hashes to upgrade."""
+
+    total: int
+    schemes: Dict[str, int]
+    outdated: int
+
+    def __init__(self):
+        self.total = 0
+        self.schemes = {}
+        self.outdated = 0
+
+    def add(self, hashed_password: str) -> None:
+        self.total += 1
+        scheme = pwd_context.identify(hashed_password, required=False)
+        if scheme is None:
+            # No usable password, e.g. imported without one
+            scheme = "unknown"
+        elif pwd_context.needs_update(hashed_password):
+            self.outdated += 1
+        self.schemes[scheme] = self.schemes.get(scheme, 0) + 1
+
+    @property
+    def migrated_rate(self) -> float:
+        """Share of the usable hashes already up to date, between 0 and 1."""
+        usable = self.total - self.schemes.get("unknown", 0)
+        return 1 - self.outdated / usable if usable else 1.0
+
+    def __str__(self) -> str:
+        schemes = " ".join(
+            f"{scheme}={count}" for scheme, count in sorted(self.schemes.items())
+        )
+        return (
+            f"total={self.total} {schemes} outdated={self.outdated} "
+            f"migrated={self.migrated_rate:.1%}"
+        )
+
+
+class PasswordHasherBusy(Exception):
+    """
+    Too many password hashing jobs are waiting for a worker.
+
+    Raised instead of queueing the job when the hasher queue is full.
+    """
+
+    pass
+
+
+class PasswordHasherMetrics:
+    """
+    Load counters of a password hasher.
+
+    :param max_workers: Size of the worker pool, used to compute saturation.
+    """
+
+    max_workers: int
+    queued: int
+    running: int
+    completed: int
+    rejected: int
+    queue_wait_seconds_max: float
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.queue_wait_seconds_max = 0.0
+
+    @property
+    def saturation(self) -> float:
+        """Share of the workers currently busy, between 0 and 1."""
+        return self.running / self.max_workers
+
+    def observe_queue_wait(self, seconds: float) -> None:
+        password_hash_queue_wait_seconds.observe(seconds)
+        self.queue_wait_seconds_max = max(self.queue_wait_seconds_max, seconds)
+
+
+class PasswordHasher:
+    """
+    Run password hashing and verification outside of the event loop.
+
+    Jobs are executed by a bounded thread or process pool. When every worker
+    is busy, up to `max_queue_size` jobs wait for a free one; further jobs are
+    rejected with `PasswordHasherBusy`.
+
+    :param max_workers: Number of hashing workers.
+    :param max_queue_size: Number of jobs allowed to wait for a worker.
+    :param use_processes: Whether to use a process pool instead of threads.
+    """
+
+    max_workers: int
+    max_queue_size: int
+    use_processes: bool
+    metrics: PasswordHasherMetrics
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        max_queue_size: int = 64,
+        use_processes: bool = False,
+    ):
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.use_processes = use_processes
+        self.metrics = PasswordHasherMetrics(max_workers)
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._dummy_hash: Optional[str] = None
+
+    async def hash(self, password: str) -> str:
+        """Hash a password."""
+        with span("password.hash"):
+            return await self._run("hash", get_password_hash, password)
+
+    async def verify_and_update(
+        self, plain_password: str, hashed_password: str
+    ) -> Tuple[bool, Optional[str]]:
+        """Verify a password and return an upgraded hash if needed."""
+        with span("password.verify"):
+            return await self._run(
+                "verify", verify_and_update_password, plain_password, hashed_password
+            )
+
+    async def verify_dummy(self, plain_password: str) -> None:
+        """
+        Verify a password against the hash of a random one, to take as long
+        as verifying the password of an existing user.
+
+        The hash is computed once with the current options, see `hash_dummy`.
+        """
+        dummy_hash = self._dummy_hash
+        if dummy_hash is None:
+            dummy_hash = await self.hash_dummy()
+        await self.verify_and_update(plain_password, dummy_hash)
+
+    async def hash_dummy(self) -> str:
+        """
+        Hash the random password of `verify_dummy` with the current options,
+        so that the first unknown email doesn't take longer to reject.
+        """
+        self._dummy_hash = await self.hash(generate_password())
+        return self._dummy_hash
+
+    async def calibrate(self, target_seconds: float) -> None:
+        """
+        Calibrate the cost of the default scheme, in a thread,
+        see `calibrate_password_context`.
+        """
+        loop = asyncio.get_running_loop()
+        options = await loop.run_in_executor(
+            None, calibrate_password_context, target_seconds
+        )
+        self.configure(options)
+        await self.hash_dummy()
+
+    def configure(self, options: Dict[str, Any]) -> None:
+        """Replace the options of the password context, in every worker."""
+        configure_password_context(options)
+        self._dummy_hash = None
+        if self.use_processes and self._executor is not None:
+            # Running jobs finish, the next ones start new configured workers
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def shutdown(self) -> None:
+        """Wait for running jobs and release the workers."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self._semaphore = None
+
+    async def _run(self, operation: str, func: Callable[..., T], *args: Any) -> T:
+        semaphore = self._get_semaphore()
+        if semaphore.locked() and self.metrics.queued >= self.max_queue_size:
+            self.metrics.rejected += 1
+            raise PasswordHasherBusy()
+
+        queued_at = time.perf_counter()
+        self.metrics.queued += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self.metrics.queued -= 1
+        self.metrics.observe_queue_wait(time.perf_counter() - queued_at)
+
+        self.metrics.running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            with password_hash_seconds.labels(operation).time():
+                return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self.metrics.running -= 1
+            self.metrics.completed += 1
+            semaphore.release()
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+        return self._semaphore
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.use_processes:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    initializer=configure_password_context,
+                    initargs=(pwd_context.to_dict(),),
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="password-hasher"
+                )
+        return self._executor
+
+
+password_hasher = PasswordHasher(
+    max_workers=settings.PASSWORD_HASHER_WORKERS,
+    max_queue_size=settings.PASSWORD_HASHER_QUEUE_SIZE,
+    use_processes=settings.PASSWORD_HASHER_USE_PROCESSES,
+)
@@ -1,30 +1,39 @@
-import json
 from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
 
 import jwt
-import pika
 
+from app.core.metrics import jwt_seconds
+from app.core.publisher import Publisher
 from config.settings import settings
 
-params = pika.URLParameters(settings.RABBITMQ_URL)
-connection = pika.BlockingConnection(params)
-channel = connection.channel()
+publisher = Publisher(
+    str(settings.RABBITMQ_URL),
+    routing_key="admin",
+    pool_size=settings.RABBITMQ_CHANNEL_POOL_SIZE,
+    buffer_size=settings.RABBITMQ_BUFFER_SIZE,
+    batch_size=settings.RABBITMQ_BATCH_SIZE,
+)
 
 
-def publish(method, body):
-    properties = pika.BasicProperties(method)
-    channel.basic_publish(
-        exchange="", routing_key="admin", body=json.dumps(body), properties=properties
-    )
+async def publish(method: str, body: Any) -> None:
+    await publisher.publish(method, body)
 
 
 JWT_ALGORITHM = "HS256"
 
 
 def generate_jwt(
-    data: dict, lifetime_seconds: int, secret: str, algorithm: str = JWT_ALGORITHM
+    data: dict,
+    lifetime_seconds: int,
+    secret: Any,
+    algorithm: str = JWT_ALGORITHM,
+    headers: Optional[Dict[str, Any]] = None,
 ) -> str:
     payload = data.copy()
     expire = datetime.utcnow() + timedelta(seconds=lifetime_seconds)
     payload["exp"] = expire
-    return jwt.encode(payload, secret, algorithm=algorithm)  # type: ignore
+    with jwt_seconds.labels("encode").time():
+        return jwt.encode(
+            payload, secret, algorithm=algorithm, headers=headers
+        )  # type: ignore
@@ -0,0 +1,261 @@
+"""
+Throughput and latency of the authentication endpoints, end to end.
+
+Serves the auth, register, users, verify and reset password routers in
+process, with the JWT and cookie backends, against a SQL database: a local
+PostgreSQL, or SQLite through the `GUID` fallback. The tables are dropped
+and created again, so give it a scratch database.
+
+    python -m benchmarks.bench_auth --dsn sqlite:///./bench.db --iterations 200
+    python -m benchmarks.bench_auth --dsn postgresql://... --output baseline.json
+    python -m benchmarks.bench_auth --dsn postgresql://... --baseline baseline.json
+
+Password hashing dominates login, register and reset password: pass
+`--bcrypt-rounds` to measure them with another cost than the configured one.
+"""
+import argparse
+import asyncio
+import uuid
+from typing import Dict, List
+
+import httpx
+import sqlalchemy
+from databases import Database
+from fastapi import Body, FastAPI, HTTPException, Request, Response, status
+
+from app.api.singleton import FastAPIUsers
+from app.core.auth.cookie import CookieAuthentication
+from app.core.auth.jwt import JWTAuthentication
+from app.crud.crud_outbox import SQLAlchemyOutbox
+from app.crud.crud_refresh_token import SQLAlchemyRefreshTokenStore
+from app.crud.crud_user import SQLAlchemyUserDatabase
+from app.db.base import Base
+from app.schemes.user import User, UserCreate, UserDB, UserUpdate
+from app.security import (get_password_hash, make_password_context,
+                          password_hasher)
+from benchmarks.common import add_report_arguments, measure, report
+from config.settings import settings
+
+SECRET = "benchmark-secret"
+PASSWORD = "benchmark-password"
+
+
+def reset_tables(dsn: str) -> None:
+    engine = sqlalchemy.create_engine(dsn)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    engine.dispose()
+
+
+def make_users(count: int, prefix: str, is_verified: bool) -> List[UserDB]:
+    hashed_password = get_password_hash(PASSWORD)
+    return [
+        UserDB(
+            id=uuid.uuid4(),
+            email=f"{prefix}{i}@example.com",
+            hashed_password=hashed_password,
+            is_active=True,
+            is_verified=is_verified,
+        )
+        for i in range(count)
+    ]
+
+
+def make_app(
+    user_db: SQLAlchemyUserDatabase,
+    jwt_backend: JWTAuthentication,
+    cookie_backend: CookieAuthentication,
+    tokens: Dict[str, List[str]],
+) -> FastAPI:
+    fastapi_users = FastAPIUsers(
+        user_db,
+        [cookie_backend, jwt_backend],
+        User,
+        UserCreate,
+        UserUpdate,
+        UserDB,
+    )
+
+    def after_forgot_password(user: UserDB, token: str, request: Request) -> None:
+        tokens["reset"].append(token)
+
+    def after_verification_request(
+        user: UserDB, token: str, request: Request
+    ) -> None:
+        tokens["verify"].append(token)
+
+    app = FastAPI()
+    app.include_router(fastapi_users.get_auth_router(jwt_backend), prefix="/jwt")
+    app.include_router(
+        fastapi_users.get_auth_router(cookie_backend), prefix="/cookie"
+    )
+    app.include_router(fastapi_users.get_register_router())
+    app.include_router(
+        fastapi_users.get_reset_password_router(
+            SECRET, after_forgot_password=after_forgot_password
+        )
+    )
+    app.include_router(
+        fastapi_users.get_verify_router(
+            SECRET, after_verification_request=after_verification_request
+        )
+    )
+    app.include_router(fastapi_users.get_users_router(), prefix="/users")
+
+    # Same refresh path as the service, see app.api.api
+    @app.post("/jwt/refresh")
+    async def refresh_jwt(refresh_token: str = Body(..., embed=True)):
+        login_response = await jwt_backend.get_refresh_response(
+            refresh_token, user_db
+        )
+        if login_response is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST)
+        return login_response
+
+    return app
+
+
+async def main(args: argparse.Namespace) -> None:
+    users, iterations, concurrency = args.users, args.iterations, args.concurrency
+    if args.bcrypt_rounds is not None:
+        password_hasher.configure(
+            make_password_context(
+                settings.PASSWORD_HASH_SCHEMES, bcrypt_rounds=args.bcrypt_rounds
+            ).to_dict()
+        )
+
+    reset_tables(args.dsn)
+    database = Database(args.dsn)
+    await database.connect()
+    tables = Base.metadata.tables
+    user_db = SQLAlchemyUserDatabase(
+        UserDB,
+        database,
+        tables["usertable"],
+        outbox=SQLAlchemyOutbox(database, tables["outboxmessage"]),
+    )
+    refresh_tokens = SQLAlchemyRefreshTokenStore(database, tables["refreshtoken"])
+    jwt_backend = JWTAuthentication(SECRET, 3600, refresh_tokens=refresh_tokens)
+    cookie_backend = CookieAuthentication(SECRET, 3600)
+
+    verified_users = make_users(users, "user", True)
+    unverified_users = make_users(iterations, "unverified", False)
+    await user_db.create_many(verified_users + unverified_users)
+
+    tokens: Dict[str, List[str]] = {"reset": [], "verify": []}
+    app = make_app(user_db, jwt_backend, cookie_backend, tokens)
+
+    def get_email(i: int) -> str:
+        return verified_users[i % users].email
+
+    results = {}
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+
+        async def login(i: int) -> None:
+            response = await client.post(
+                "/jwt/login", data={"username": get_email(i), "password": PASSWORD}
+            )
+            assert response.status_code == 200
+
+        async def register(i: int) -> None:
+            response = await client.post(
+                "/register",
+                json={"email": f"registered{i}@example.com", "password": PASSWORD},
+            )
+            assert response.status_code == 201
+
+        results["POST /jwt/login"] = await measure(login, iterations, concurrency)
+        results["POST /register"] = await measure(register, iterations, concurrency)
+
+        user = verified_users[0]
+        login_response = await jwt_backend.get_login_response(user, Response())
+        jwt_headers = {"Authorization": f"Bearer {login_response['access_token']}"}
+        response = await client.post(
+            "/cookie/login", data={"username": user.email, "password": PASSWORD}
+        )
+        cookie_name = cookie_backend.cookie_name
+        cookies = {cookie_name: response.cookies[cookie_name]}
+        # Only the requests of the cookie benchmark send the cookie
+        client.cookies.clear()
+
+        async def get_me_jwt(i: int) -> None:
+            response = await client.get("/users/me", headers=jwt_headers)
+            assert response.status_code == 200
+
+        async def get_me_cookie(i: int) -> None:
+            response = await client.get("/users/me", cookies=cookies)
+            assert response.status_code == 200
+
+        results["GET /users/me (JWT)"] = await measure(
+            get_me_jwt, iterations, concurrency
+        )
+        results["GET /users/me (cookie)"] = await measure(
+            get_me_cookie, iterations, concurrency
+        )
+
+        # A refresh token is consumed by its refresh
+        refreshes = [
+            await refresh_tokens.create(verified_users[i % users].id, 3600)
+            for i in range(iterations)
+        ]
+
+        async def refresh(i: int) -> None:
+            response = await client.post(
+                "/jwt/refresh", json={"refresh_token": refreshes[i]}
+            )
+            assert response.status_code == 200
+
+        results["POST /jwt/refresh"] = await measure(refresh, iterations, concurrency)
+
+        async def forgot_password(i: int) -> None:
+            response = await client.post(
+                "/forgot-password", json={"email": get_email(i)}
+            )
+            assert response.status_code == 202
+
+        async def reset_password(i: int) -> None:
+            response = await client.post(
+                "/reset-password",
+                json={"token": tokens["reset"][i], "password": PASSWORD},
+            )
+            assert response.status_code == 200
+
+        results["POST /forgot-password"] = await measure(
+            forgot_password, iterations, concurrency
+        )
+        results["POST /reset-password"] = await measure(
+            reset_password, iterations, concurrency
+        )
+
+        async def request_verify_token(i: int) -> None:
+            response = await client.post(
+                "/request-verify-token", json={"email": unverified_users[i].email}
+            )
+            assert response.status_code == 202
+
+        async def verify(i: int) -> None:
+            response = await client.post("/verify", json={"token": tokens["verify"][i]})
+            assert response.status_code == 200
+
+        results["POST /request-verify-token"] = await measure(
+            request_verify_token, iterations, concurrency
+        )
+        results["POST /verify"] = await measure(verify, iterations, concurrency)
+
+    password_hasher.shutdown()
+    await database.disconnect()
+    report(results, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--dsn", default="sqlite:///./bench.db")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--bcrypt-rounds", type=int)
+    add_report_arguments(parser)
+    args = parser.parse_args()
+    asyncio.run(main(args))
@@ -0,0 +1,76 @@
+"""
+Requests/s of `/users/me`, and cost of the current user dependencies alone.
+
+Serves the users router in process, with the JWT and cookie backends,
+against an in-memory user database, so that only the routing and
+authentication overhead is measured.
+
+    python -m benchmarks.bench_current_user --iterations 20000
+"""
+import argparse
+import asyncio
+import uuid
+
+import httpx
+from fastapi import FastAPI, Request, Response
+
+from app.api.singleton import FastAPIUsers
+from app.core.auth.cookie import CookieAuthentication
+from app.core.auth.jwt import JWTAuthentication
+from app.schemes.user import User, UserCreate, UserDB, UserUpdate
+from benchmarks.common import MemoryUserDatabase, measure, print_report
+
+SECRET = "benchmark-secret"
+
+
+async def main(iterations: int) -> None:
+    user = UserDB(
+        id=uuid.uuid4(),
+        email="user@example.com",
+        hashed_password="",
+        is_active=True,
+        is_verified=True,
+        is_superuser=True,
+    )
+    jwt_backend = JWTAuthentication(SECRET, 3600)
+    cookie_backend = CookieAuthentication(SECRET, 3600)
+    fastapi_users = FastAPIUsers(
+        MemoryUserDatabase(user),
+        [cookie_backend, jwt_backend],
+        User,
+        UserCreate,
+        UserUpdate,
+        UserDB,
+    )
+    app = FastAPI()
+    app.include_router(fastapi_users.get_users_router(), prefix="/users")
+    login = await jwt_backend.get_login_response(user, Response())
+    token = login["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    results = {}
+    async with httpx.AsyncClient(app=app, base_url="http://bench") as client:
+
+        async def get_me(i: int) -> None:
+            response = await client.get("/users/me", headers=headers)
+            assert response.status_code == 200
+
+        results["GET /users/me"] = await measure(get_me, iterations)
+
+    get_current_verified_superuser = fastapi_users.get_current_verified_superuser
+
+    async def resolve(i: int) -> None:
+        request = Request({"type": "http", "headers": []})
+        await get_current_verified_superuser(
+            request=request, cookie=None, jwt=token
+        )
+
+    results["get_current_verified_superuser"] = await measure(resolve, iterations)
+    print_report(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations))
@@ -0,0 +1,118 @@
+"""
+Login latency against a large users table, with and without the
+lower(email) index.
+
+Seeds a scratch `bench_usertable` table in the given PostgreSQL database,
+measures `get_by_email` and `authenticate` with only the plain email index
+of the first migration, then with the lower(email) index, and drops the
+table.
+
+    python -m benchmarks.bench_get_by_email --dsn postgresql://... --users 1000000
+"""
+import argparse
+import asyncio
+import random
+from types import SimpleNamespace
+
+from databases import Database
+from sqlalchemy import MetaData
+
+from app.crud.crud_user import SQLAlchemyUserDatabase
+from app.models.user import UserTable
+from app.schemes.user import UserDB
+from app.security import get_password_hash
+from benchmarks.common import measure, print_report
+
+TABLE = "bench_usertable"
+PASSWORD = "benchmark-password"
+
+
+async def seed(database: Database, users: int) -> None:
+    await database.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    await database.execute(
+        f"""
+        CREATE TABLE {TABLE} (
+            id UUID PRIMARY KEY,
+            email VARCHAR(320) NOT NULL,
+            hashed_password VARCHAR(255) NOT NULL,
+            is_active BOOLEAN NOT NULL,
+            is_superuser BOOLEAN NOT NULL,
+            is_verified BOOLEAN NOT NULL
+        )
+        """
+    )
+    await database.execute(
+        f"""
+        INSERT INTO {TABLE}
+        SELECT md5(i::text)::uuid, 'user' || i || '@example.com', :hashed_password,
+               true, false, true
+        FROM generate_series(1, {users}) AS i
+        """,
+        {"hashed_password": get_password_hash(PASSWORD)},
+    )
+    await database.execute(f"CREATE UNIQUE INDEX bench_email ON {TABLE} (email)")
+    await database.execute(f"ANALYZE {TABLE}")
+
+
+async def explain(database: Database, email: str) -> str:
+    rows = await database.fetch_all(
+        f"EXPLAIN SELECT * FROM {TABLE} WHERE lower(email) = lower(:email)",
+        {"email": email},
+    )
+    return "\n".join(row[0] for row in rows)
+
+
+async def run(dsn: str, users: int, lookups: int, logins: int) -> None:
+    database = Database(dsn)
+    await database.connect()
+    table = UserTable.__table__.tometadata(MetaData(), name=TABLE)  # type: ignore
+    user_db = SQLAlchemyUserDatabase(UserDB, database, table)
+
+    def random_email(_: int) -> str:
+        return f"User{random.randint(1, users)}@Example.com"
+
+    async def get_by_email(i: int) -> None:
+        await user_db.get_by_email(random_email(i))
+
+    async def login(i: int) -> None:
+        credentials = SimpleNamespace(username=random_email(i), password=PASSWORD)
+        await user_db.authenticate(credentials)  # type: ignore
+
+    try:
+        print(f"Seeding {users} users...")
+        await seed(database, users)
+        results = {}
+
+        print(await explain(database, random_email(0)))
+        results["get_by_email, email index"] = await measure(get_by_email, lookups)
+        results["login, email index"] = await measure(login, logins)
+
+        await database.execute(
+            f"CREATE UNIQUE INDEX bench_email_lower ON {TABLE} (lower(email))"
+        )
+        await database.execute(f"ANALYZE {TABLE}")
+
+        print(await explain(database, random_email(0)))
+        results["get_by_email, lower(email) index"] = await measure(
+            get_by_email, lookups
+        )
+        results["login, lower(email) index"] = await measure(login, logins)
+
+        print_report(results)
+    finally:
+        await database.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        await database.disconnect()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dsn", required=True, help="Scratch PostgreSQL database")
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=1000)
+    parser.add_argument("--logins", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(run(args.dsn, args.users, args.lookups, args.logins))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Login latency of unknown emails against existing ones, to check that
+failed logins do not reveal whether an email is registered.
+
+Authenticates against an in-memory user database with the configured
+password context, interleaving the cases so that they share the same
+machine load. Compares each case to a wrong password for an existing email
+with a Welch t-test: |t| above the threshold means the timings differ.
+
+    python -m benchmarks.bench_login_timing --iterations 200
+"""
+import argparse
+import asyncio
+import math
+import statistics
+import sys
+import time
+import uuid
+from typing import Dict, List, Sequence
+
+from fastapi.security import OAuth2PasswordRequestForm
+
+from app.schemes.user import UserDB
+from app.security import get_password_hash, password_hasher
+from benchmarks.common import MemoryUserDatabase, print_report, summarize
+
+EMAIL = "user@example.com"
+PASSWORD = "benchmark-password"
+
+
+def welch_t(a: Sequence[float], b: Sequence[float]) -> float:
+    """Welch's t statistic of the difference between two sample means."""
+    error = math.sqrt(
+        statistics.variance(a) / len(a) + statistics.variance(b) / len(b)
+    )
+    return (statistics.mean(a) - statistics.mean(b)) / error if error else 0.0
+
+
+async def main(iterations: int, threshold: float) -> None:
+    user = UserDB(
+        id=uuid.uuid4(),
+        email=EMAIL,
+        hashed_password=get_password_hash(PASSWORD),
+        is_active=True,
+    )
+    user_db = MemoryUserDatabase(user)
+    cases = {
+        "wrong password": (EMAIL, "wrong-password"),
+        "unknown email": ("unknown@example.com", PASSWORD),
+    }
+    # As on startup
+    await password_hasher.hash_dummy()
+
+    samples: Dict[str, List[float]] = {name: [] for name in cases}
+    samples["hash (previous path)"] = []
+    for _ in range(iterations):
+        for name, (email, password) in cases.items():
+            credentials = OAuth2PasswordRequestForm(
+                username=email, password=password, scope=""
+            )
+            operation_started_at = time.perf_counter()
+            assert await user_db.authenticate(credentials) is None
+            samples[name].append(time.perf_counter() - operation_started_at)
+        operation_started_at = time.perf_counter()
+        await password_hasher.hash(PASSWORD)
+        samples["hash (previous path)"].append(
+            time.perf_counter() - operation_started_at
+        )
+    password_hasher.shutdown()
+
+    print_report({name: summarize(s, sum(s)) for name, s in samples.items()})
+    reference = samples["wrong password"]
+    failed = False
+    for name in ("unknown email", "hash (previous path)"):
+        t = welch_t(samples[name], reference)
+        print(f"{name} vs wrong password: t={t:.2f}")
+        failed = failed or (name == "unknown email" and abs(t) > threshold)
+    if failed:
+        sys.exit(f"Unknown emails are distinguishable, |t| > {threshold}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--threshold", type=float, default=4.5)
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations, args.threshold))
@@ -0,0 +1,114 @@
+"""
+Cost of the CPU-bound steps of the authentication hot paths.
+
+Measures the JWT encoding and decoding, the building of users from database
+rows, and the `Authenticator` chain resolving the current user from a JWT,
+a cookie or no credentials, against an in-memory user database.
+
+    python -m benchmarks.bench_micro --iterations 20000 --output micro.json
+    python -m benchmarks.bench_micro --baseline micro.json
+"""
+import argparse
+import asyncio
+import uuid
+
+import jwt
+from fastapi import Request, Response
+
+from app.core.auth import Authenticator
+from app.core.auth.cookie import CookieAuthentication
+from app.core.auth.jwt import JWTAuthentication
+from app.crud.crud_user import SQLAlchemyUserDatabase
+from app.db.base import Base
+from app.db.session import database
+from app.schemes.user import UserDB
+from app.utils import JWT_ALGORITHM, generate_jwt
+from benchmarks.common import (MemoryUserDatabase, add_report_arguments,
+                               measure, measure_sync, report)
+
+SECRET = "benchmark-secret"
+AUDIENCE = JWTAuthentication.token_audience
+
+
+async def main(args: argparse.Namespace) -> None:
+    iterations = args.iterations
+    user = UserDB(
+        id=uuid.uuid4(),
+        email="user@example.com",
+        hashed_password="$2b$12$" + "a" * 53,
+        is_active=True,
+        is_verified=True,
+    )
+    results = {}
+
+    data = {"user_id": str(user.id), "aud": AUDIENCE}
+    token = generate_jwt(data, 3600, SECRET)
+    results["generate_jwt"] = measure_sync(
+        lambda i: generate_jwt(data, 3600, SECRET), iterations
+    )
+    results["jwt.decode"] = measure_sync(
+        lambda i: jwt.decode(
+            token, SECRET, audience=AUDIENCE, algorithms=[JWT_ALGORITHM]
+        ),
+        iterations,
+    )
+
+    # Never connected: only builds users from rows
+    user_db = SQLAlchemyUserDatabase(
+        UserDB, database, Base.metadata.tables["usertable"]
+    )
+    row = user.dict(exclude={"oauth_accounts"})
+    rows = [{**row, "id": uuid.uuid4()} for _ in range(100)]
+    results["_make_users (1 row)"] = measure_sync(
+        lambda i: user_db._make_users([row]), iterations
+    )
+    results["_make_users (100 rows)"] = measure_sync(
+        lambda i: user_db._make_users(rows), max(1, iterations // 100)
+    )
+
+    jwt_backend = JWTAuthentication(SECRET, 3600)
+    cookie_backend = CookieAuthentication(SECRET, 3600)
+    authenticator = Authenticator(
+        [cookie_backend, jwt_backend], MemoryUserDatabase(user)
+    )
+    jwt_token = (await jwt_backend.get_login_response(user, Response()))[
+        "access_token"
+    ]
+    response = Response()
+    await cookie_backend.get_login_response(user, response)
+    cookie_token = response.headers["set-cookie"].split(";")[0].split("=", 1)[1]
+    get_current_active_user = authenticator.get_current_active_user
+    get_optional_current_user = authenticator.get_optional_current_user
+
+    def make_request() -> Request:
+        return Request({"type": "http", "headers": []})
+
+    async def resolve_jwt(i: int) -> None:
+        await get_current_active_user(
+            request=make_request(), cookie=None, jwt=jwt_token
+        )
+
+    async def resolve_cookie(i: int) -> None:
+        await get_current_active_user(
+            request=make_request(), cookie=cookie_token, jwt=None
+        )
+
+    async def resolve_anonymous(i: int) -> None:
+        await get_optional_current_user(request=make_request(), cookie=None, jwt=None)
+
+    results["Authenticator (JWT)"] = await measure(resolve_jwt, iterations)
+    results["Authenticator (cookie)"] = await measure(resolve_cookie, iterations)
+    results["Authenticator (anonymous)"] = await measure(
+        resolve_anonymous, iterations
+    )
+    report(results, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--iterations", type=int, default=20000)
+    add_report_arguments(parser)
+    args = parser.parse_args()
+    asyncio.run(main(args))
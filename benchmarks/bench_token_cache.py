@@ -0,0 +1,51 @@
+"""
+Token verification throughput, with and without the decoded token cache.
+
+Authenticates the same JWT repeatedly against an in-memory user database,
+so that only the token decoding and verification is measured.
+
+    python -m benchmarks.bench_token_cache --iterations 100000
+"""
+import argparse
+import asyncio
+import uuid
+
+from fastapi import Response
+
+from app.core.auth.cache import DecodedTokenCache
+from app.core.auth.jwt import JWTAuthentication
+from app.schemes.user import UserDB
+from benchmarks.common import MemoryUserDatabase, measure, print_report
+
+SECRET = "benchmark-secret"
+
+
+async def main(iterations: int) -> None:
+    user = UserDB(
+        id=uuid.uuid4(), email="user@example.com", hashed_password="", is_active=True
+    )
+    user_db = MemoryUserDatabase(user)
+
+    results = {}
+    for name, token_cache in (
+        ("jwt.decode", None),
+        ("cached", DecodedTokenCache()),
+    ):
+        backend = JWTAuthentication(SECRET, 3600, token_cache=token_cache)
+        login = await backend.get_login_response(user, Response())
+        token = login["access_token"]
+
+        async def authenticate(i: int) -> None:
+            assert await backend(token, user_db) is not None
+
+        results[name] = await measure(authenticate, iterations)
+        if token_cache is not None:
+            print(f"{name}: hit rate {token_cache.hit_rate:.4f}")
+    print_report(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=100000)
+    args = parser.parse_args()
+    asyncio.run(main(args.iterations))
@@ -0,0 +1,153 @@
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence
+
+from pydantic import UUID4
+
+from app.crud.base import BaseUserDatabase
+from app.schemes.user import UserDB
+
+Results = Dict[str, Dict[str, float]]
+
+
+class MemoryUserDatabase(BaseUserDatabase[UserDB]):
+    """User database holding a single user in memory."""
+
+    def __init__(self, user: UserDB):
+        super().__init__(UserDB)
+        self.user = user
+
+    async def get(self, id: UUID4) -> Optional[UserDB]:
+        return self.user if id == self.user.id else None
+
+    async def get_by_email(self, email: str) -> Optional[UserDB]:
+        return self.user if email == self.user.email else None
+
+
+def percentile(samples: Sequence[float], fraction: float) -> float:
+    """Nearest-rank percentile of a list of samples."""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples: Sequence[float], elapsed: float) -> Dict[str, float]:
+    """Throughput and latency percentiles, in operations/s and milliseconds."""
+    return {
+        "ops": len(samples) / elapsed if elapsed else 0.0,
+        "mean": statistics.mean(samples) * 1000,
+        "p50": percentile(samples, 0.50) * 1000,
+        "p95": percentile(samples, 0.95) * 1000,
+        "p99": percentile(samples, 0.99) * 1000,
+    }
+
+
+def print_report(results: Results) -> None:
+    width = max(len(name) for name in results)
+    print(
+        f"{'benchmark':<{width}}  {'ops/s':>10}  {'mean ms':>9}  "
+        f"{'p50 ms':>9}  {'p95 ms':>9}  {'p99 ms':>9}"
+    )
+    for name, result in results.items():
+        print(
+            f"{name:<{width}}  {result['ops']:>10.1f}  {result['mean']:>9.3f}  "
+            f"{result['p50']:>9.3f}  {result['p95']:>9.3f}  {result['p99']:>9.3f}"
+        )
+
+
+async def measure(
+    operation: Callable[[int], Awaitable[object]],
+    iterations: int,
+    concurrency: int = 1,
+) -> Dict[str, float]:
+    """
+    Await an operation and summarize its latencies.
+
+    :param operation: Coroutine function called with the iteration number.
+    :param iterations: Total number of calls.
+    :param concurrency: Number of concurrent callers, each calling the
+    operation sequentially.
+    """
+    samples: List[float] = []
+    numbers = iter(range(iterations))
+
+    async def worker() -> None:
+        for i in numbers:
+            operation_started_at = time.perf_counter()
+            await operation(i)
+            samples.append(time.perf_counter() - operation_started_at)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(samples, time.perf_counter() - started_at)
+
+
+def measure_sync(
+    operation: Callable[[int], object], iterations: int
+) -> Dict[str, float]:
+    """Call a function sequentially and summarize its latencies."""
+    samples: List[float] = []
+    started_at = time.perf_counter()
+    for i in range(iterations):
+        operation_started_at = time.perf_counter()
+        operation(i)
+        samples.append(time.perf_counter() - operation_started_at)
+    return summarize(samples, time.perf_counter() - started_at)
+
+
+def save_results(path: str, results: Results) -> None:
+    with open(path, "w") as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+
+
+def find_regressions(
+    results: Results, baseline_path: str, tolerance: float
+) -> List[str]:
+    """
+    Compare results to a baseline saved by `save_results`.
+
+    :param tolerance: Allowed relative increase of the p50 latency.
+    :return: A description of each benchmark slower than its baseline.
+    """
+    with open(baseline_path) as file:
+        baseline: Results = json.load(file)
+
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        if result["p50"] > reference["p50"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: p50 {result['p50']:.3f} ms, "
+                f"baseline {reference['p50']:.3f} ms"
+            )
+    return regressions
+
+
+def add_report_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--output", help="Save the results to this JSON file.")
+    parser.add_argument(
+        "--baseline", help="Fail when slower than the results of this JSON file."
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Allowed relative increase of the p50 latencies over the baseline.",
+    )
+
+
+def report(results: Results, args: argparse.Namespace) -> None:
+    """Print the results, save them and check them against a baseline."""
+    print_report(results)
+    if args.output:
+        save_results(args.output, results)
+    if args.baseline:
+        regressions = find_regressions(results, args.baseline, args.tolerance)
+        if regressions:
+            sys.exit("Regressions:\n" + "\n".join(regressions))
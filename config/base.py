@@ -11,6 +11,55 @@ class RabbitmqDsn(AnyUrl):
 
 class Base(BaseSettings):
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8
+    # Lifetime of the tokens of the JWT and cookie authentication backends
+    AUTH_TOKEN_LIFETIME_SECONDS: int = 3600
+    # Issue refresh tokens on JWT login, to keep AUTH_TOKEN_LIFETIME_SECONDS short
+    REFRESH_TOKENS_ENABLED: bool = False
+    REFRESH_TOKEN_LIFETIME_SECONDS: int = 60 * 60 * 24 * 30
+    # Throttle the login attempts per client IP and per email over a sliding
+    # window, and overall per process. The windows are kept per process,
+    # so each worker allows the full limits, unless they are stored in Redis
+    # with LOGIN_RATE_LIMIT_REDIS_URL. Enabling it requires
+    # LOGIN_RATE_LIMIT_TRUSTED_PROXIES
+    LOGIN_RATE_LIMIT_ENABLED: bool = False
+    LOGIN_RATE_LIMIT_WINDOW_SECONDS: int = 60
+    LOGIN_RATE_LIMIT_PER_IP: int = 60
+    LOGIN_RATE_LIMIT_PER_EMAIL: int = 10
+    LOGIN_RATE_LIMIT_GLOBAL_RATE: float = 100.0
+    LOGIN_RATE_LIMIT_GLOBAL_BURST: int = 200
+    LOGIN_RATE_LIMIT_REDIS_URL: Optional[str] = None
+    # Number of reverse proxies or load balancers in front of the service,
+    # 0 when the clients connect directly. The client IP is then read from
+    # LOGIN_RATE_LIMIT_FORWARDED_HEADER; with too low a number, all the
+    # clients behind a proxy share the proxy IP limit
+    LOGIN_RATE_LIMIT_TRUSTED_PROXIES: Optional[int] = None
+    LOGIN_RATE_LIMIT_FORWARDED_HEADER: str = "X-Forwarded-For"
+
+    @validator("LOGIN_RATE_LIMIT_TRUSTED_PROXIES", always=True)
+    def require_trusted_proxies(
+        cls, v: Optional[int], values: Dict[str, Any]
+    ) -> Optional[int]:
+        if v is None and values.get("LOGIN_RATE_LIMIT_ENABLED"):
+            raise ValueError(
+                "must be set when LOGIN_RATE_LIMIT_ENABLED, 0 without proxies"
+            )
+        return v
+
+    # "first" tries the backends in turn, "resolve_once" verifies every
+    # credential then loads the users with a single query
+    AUTH_STRATEGY: str = "first"
+    # Check the authentication tokens against the revoked ones
+    TOKEN_REVOCATION_ENABLED: bool = False
+    TOKEN_REVOCATION_SYNC_INTERVAL_SECONDS: float = 10.0
+    TOKEN_REVOCATION_CAPACITY: int = 100000
+    TOKEN_REVOCATION_ERROR_RATE: float = 0.001
+    # Opaque tokens backed by server-side sessions, under /database
+    DATABASE_AUTH_ENABLED: bool = False
+    DATABASE_AUTH_LIFETIME_SECONDS: int = 60 * 60 * 24 * 30
+    DATABASE_AUTH_CACHE_SIZE: int = 10000
+    DATABASE_AUTH_CACHE_TTL_SECONDS: float = 30
+    DATABASE_AUTH_TOUCH_INTERVAL_SECONDS: int = 300
+    DATABASE_AUTH_FLUSH_INTERVAL_SECONDS: float = 10
 
     SECRET_KEY: str = secrets.token_urlsafe(32)
     SERVER_NAME: str
@@ -48,6 +97,22 @@ class Base(BaseSettings):
             path=f"/{values.get('POSTGRES_DB') or ''}",
         )
 
+    # Pools of connections to the database, and to the replica if any
+    DATABASE_POOL_MIN_SIZE: int = 5
+    DATABASE_POOL_MAX_SIZE: int = 20
+    # Close the connections idle for longer, before the server or a proxy
+    # drops them; 0 keeps them open
+    DATABASE_POOL_MAX_INACTIVE_SECONDS: float = 300
+    # Cancel the statements running for longer, server side; 0 disables
+    DATABASE_STATEMENT_TIMEOUT_SECONDS: float = 30
+    # Look the users up on this read replica, except for this long after
+    # their writes, and for the rest of the requests writing them
+    SQLALCHEMY_REPLICA_DATABASE_URI: Optional[PostgresDsn] = None
+    DATABASE_REPLICA_STICKY_SECONDS: float = 5
+    # Read from the primary while the replica fails its health checks
+    DATABASE_REPLICA_CHECK_INTERVAL_SECONDS: float = 5
+    DATABASE_REPLICA_CHECK_TIMEOUT_SECONDS: float = 1
+
     RABBITMQ_USER: str
     RABBITMQ_PASSWORD: str
     RABBITMQ_HOST: str
@@ -64,12 +129,74 @@ class Base(BaseSettings):
             host=values.get("RABBITMQ_HOST"),  # type: ignore
         )
 
+    RABBITMQ_CHANNEL_POOL_SIZE: int = 4
+    RABBITMQ_BUFFER_SIZE: int = 10000
+    RABBITMQ_BATCH_SIZE: int = 100
+
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_POLL_INTERVAL_SECONDS: float = 1.0
+
+    # Run the after-hooks in the background instead of the request path
+    HOOKS_BACKGROUND_DISPATCH: bool = False
+    HOOKS_CONCURRENCY: int = 8
+    HOOKS_QUEUE_SIZE: int = 1000
+    HOOKS_MAX_RETRIES: int = 3
+
+    # Serve Prometheus metrics on /metrics, when prometheus_client is installed
+    METRICS_ENABLED: bool = True
+    # Send OpenTelemetry traces to this OTLP/HTTP collector endpoint,
+    # e.g. http://localhost:4318/v1/traces
+    TRACING_OTLP_ENDPOINT: Optional[str] = None
+
     FIRST_SUPERUSER: str
     FIRST_SUPERUSER_PASSWORD: str
     USERS_OPEN_REGISTRATION: bool = False
 
     EMAIL_RESET_TOKEN_EXPIRE_HOURS: int = 48
 
+    PASSWORD_HASHER_WORKERS: int = 4
+    PASSWORD_HASHER_QUEUE_SIZE: int = 64
+    PASSWORD_HASHER_USE_PROCESSES: bool = False
+    # The first scheme hashes new passwords; hashes of the other schemes,
+    # or with a lower cost, are upgraded on login
+    PASSWORD_HASH_SCHEMES: List[str] = ["bcrypt"]
+    PASSWORD_BCRYPT_ROUNDS: int = 12
+    PASSWORD_ARGON2_TIME_COST: int = 3
+    PASSWORD_ARGON2_MEMORY_COST: int = 65536
+    PASSWORD_ARGON2_PARALLELISM: int = 4
+    # Calibrate the cost of the first scheme at startup, so that verifying
+    # a password takes about this long on the current hardware
+    PASSWORD_HASH_TARGET_SECONDS: Optional[float] = None
+
+    # Cache the users for USER_CACHE_TTL_SECONDS, 0 disables the cache.
+    # Writes only invalidate the cache of their process: deployments with
+    # several workers need the shared USER_CACHE_REDIS_URL, or a user who is
+    # deactivated, deleted or demoted stays authorized on the other workers
+    # until the entries expire
+    USER_CACHE_TTL_SECONDS: int = 0
+    USER_CACHE_MAX_SIZE: int = 10000
+    USER_CACHE_REDIS_URL: Optional[str] = None
+
+    # Trust the user state embedded in authentication tokens. Changed claims
+    # are only revoked in the worker making the change: the other workers
+    # trust them until they are AUTH_CLAIMS_MAX_AGE_SECONDS old. The tokens
+    # of deactivated users, and of former superusers, are revoked everywhere
+    # after TOKEN_REVOCATION_SYNC_INTERVAL_SECONDS if TOKEN_REVOCATION_ENABLED
+    AUTH_CLAIMS_ENABLED: bool = False
+    AUTH_CLAIMS_MAX_AGE_SECONDS: int = 60
+
+    # Set AUTH_TOKEN_CACHE_SIZE to 0 to verify every token signature
+    AUTH_TOKEN_CACHE_SIZE: int = 10000
+
+    # Sign the authentication tokens with the rotating keys of JWT_KEYS_DIR
+    # instead of SECRET_KEY, and publish them at /.well-known/jwks.json
+    JWT_KEYS_DIR: Optional[str] = None
+    JWT_KEYS_ALGORITHM: str = "RS256"
+    JWT_KEYS_ACTIVATION_DELAY_SECONDS: int = 600
+    JWT_KEYS_OVERLAP_SECONDS: int = 3600
+    JWT_KEYS_RELOAD_INTERVAL_SECONDS: int = 60
+    JWKS_MAX_AGE_SECONDS: int = 300
+
     class Config:
         case_sensitive = True
         env_file = ".env"
@@ -0,0 +1,104 @@
+import asyncio
+import uuid
+from typing import Optional
+
+import httpx
+from fastapi import Depends, FastAPI, Response
+from pydantic import UUID4
+
+from app.api.singleton import FastAPIUsers
+from app.core.auth.cookie import CookieAuthentication
+from app.core.auth.jwt import JWTAuthentication
+from app.crud.base import BaseUserDatabase
+from app.schemes.user import User, UserCreate, UserDB, UserUpdate
+
+SECRET = "test-secret"
+
+
+class CountingUserDatabase(BaseUserDatabase[UserDB]):
+    """In-memory user database counting its lookups."""
+
+    def __init__(self, user: UserDB):
+        super().__init__(UserDB)
+        self.user = user
+        self.gets = 0
+
+    async def get(self, id: UUID4) -> Optional[UserDB]:
+        self.gets += 1
+        return self.user if id == self.user.id else None
+
+
+def make_user() -> UserDB:
+    return UserDB(
+        id=uuid.uuid4(),
+        email="admin@example.com",
+        hashed_password="",
+        is_active=True,
+        is_verified=True,
+        is_superuser=True,
+    )
+
+
+def make_app(user_db: CountingUserDatabase) -> FastAPI:
+    jwt_backend = JWTAuthentication(SECRET, 3600)
+    fastapi_users = FastAPIUsers(
+        user_db,
+        [CookieAuthentication(SECRET, 3600), jwt_backend],
+        User,
+        UserCreate,
+        UserUpdate,
+        UserDB,
+    )
+    app = FastAPI()
+    app.include_router(fastapi_users.get_users_router(), prefix="/users")
+
+    @app.get(
+        "/protected",
+        dependencies=[
+            Depends(fastapi_users.get_current_user),
+            Depends(fastapi_users.get_current_verified_user),
+            Depends(fastapi_users.get_current_superuser),
+        ],
+    )
+    async def protected(
+        user: UserDB = Depends(fastapi_users.get_current_active_user),
+        optional_user: Optional[UserDB] = Depends(
+            fastapi_users.get_optional_current_user
+        ),
+    ):
+        assert optional_user is user
+        return {"id": str(user.id)}
+
+    app.state.jwt_backend = jwt_backend
+    return app
+
+
+async def get_with_token(app: FastAPI, user: UserDB, *paths: str) -> None:
+    login = await app.state.jwt_backend.get_login_response(user, Response())
+    headers = {"Authorization": f"Bearer {login['access_token']}"}
+    async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+        for path in paths:
+            response = await client.get(path, headers=headers)
+            assert response.status_code == 200
+            assert response.json()["id"] == str(user.id)
+
+
+def test_several_dependencies_load_the_user_once():
+    user = make_user()
+    user_db = CountingUserDatabase(user)
+    app = make_app(user_db)
+
+    asyncio.run(get_with_token(app, user, "/protected"))
+    assert user_db.gets == 1
+
+    asyncio.run(get_with_token(app, user, "/protected", "/protected"))
+    assert user_db.gets == 3
+
+
+def test_get_own_user_loads_the_user_once():
+    user = make_user()
+    user_db = CountingUserDatabase(user)
+    app = make_app(user_db)
+
+    asyncio.run(get_with_token(app, user, f"/users/{user.id}"))
+    assert user_db.gets == 1
@@ -0,0 +1,65 @@
+import asyncio
+import time
+import uuid
+from typing import Dict, List
+
+import pytest
+from fastapi.security import OAuth2PasswordRequestForm
+
+from app.schemes.user import UserDB
+from app.security import (get_password_hash, make_password_context,
+                          password_hasher, pwd_context)
+from benchmarks.bench_login_timing import welch_t
+from benchmarks.common import MemoryUserDatabase
+
+EMAIL = "user@example.com"
+PASSWORD = "test-password"
+ITERATIONS = 200
+# |t| above it means the timings differ
+THRESHOLD = 4.5
+
+
+@pytest.fixture
+def low_cost_hasher():
+    options = pwd_context.to_dict()
+    password_hasher.configure(make_password_context(bcrypt_rounds=4).to_dict())
+    yield password_hasher
+    password_hasher.shutdown()
+    password_hasher.configure(options)
+
+
+async def measure_logins(user_db: MemoryUserDatabase) -> Dict[str, List[float]]:
+    cases = {
+        "wrong password": (EMAIL, "wrong-password"),
+        "unknown email": ("unknown@example.com", PASSWORD),
+    }
+    samples: Dict[str, List[float]] = {name: [] for name in cases}
+    # Interleaved, so that both cases share the same machine load
+    for _ in range(ITERATIONS):
+        for name, (email, password) in cases.items():
+            credentials = OAuth2PasswordRequestForm(
+                username=email, password=password, scope=""
+            )
+            started_at = time.perf_counter()
+            assert await user_db.authenticate(credentials) is None
+            samples[name].append(time.perf_counter() - started_at)
+    return samples
+
+
+def test_unknown_email_login_is_indistinguishable(low_cost_hasher):
+    user = UserDB(
+        id=uuid.uuid4(),
+        email=EMAIL,
+        hashed_password=get_password_hash(PASSWORD),
+        is_active=True,
+    )
+    user_db = MemoryUserDatabase(user)
+
+    async def run() -> Dict[str, List[float]]:
+        # As on startup
+        await low_cost_hasher.hash_dummy()
+        return await measure_logins(user_db)
+
+    samples = asyncio.run(run())
+    t = welch_t(samples["unknown email"], samples["wrong password"])
+    assert abs(t) < THRESHOLD